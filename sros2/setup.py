@@ -51,14 +51,25 @@ enhance the security of ROS 2 deployments.""",
             'sros2.verb = sros2.verb:VerbExtension',
         ],
         'sros2.verb': [
+            'analyze_permissions = sros2.verb.analyze_permissions:AnalyzePermissionsVerb',
+            'check_shared_artifacts = sros2.verb.check_shared_artifacts'
+            ':CheckSharedArtifactsVerb',
+            'compact_policy = sros2.verb.compact_policy:CompactPolicyVerb',
+            'create_crl = sros2.verb.create_crl:CreateCrlVerb',
             'create_key = sros2.verb.create_key:CreateKeyVerb',
             'create_keystore = sros2.verb.create_keystore:CreateKeystoreVerb',
             'create_permission = sros2.verb.create_permission'
             ':CreatePermissionVerb',
+            'diff_policy = sros2.verb.diff_policy:DiffPolicyVerb',
             'distribute_key = sros2.verb.distribute_key:DistributeKeyVerb',
             'generate_artifacts = sros2.verb.generate_artifacts:GenerateArtifactsVerb',
             'generate_policy = sros2.verb.generate_policy:GeneratePolicyVerb',
+            'import_keys = sros2.verb.import_keys:ImportKeysVerb',
             'list_keys = sros2.verb.list_keys:ListKeysVerb',
+            'merge_policy = sros2.verb.merge_policy:MergePolicyVerb',
+            'revoke = sros2.verb.revoke:RevokeVerb',
+            'rotate = sros2.verb.rotate:RotateVerb',
+            'verify = sros2.verb.verify:VerifyVerb',
         ],
     },
     package_data={
@@ -12,12 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import deque
 from collections import namedtuple
-import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import datetime
+import io
+import json
 import os
-import platform
-import shutil
-import subprocess
 import sys
 
 from lxml import etree
@@ -27,19 +30,63 @@ from rclpy.exceptions import InvalidNodeNameException
 from rclpy.validate_namespace import validate_namespace
 from rclpy.validate_node_name import validate_node_name
 
+from sros2.api.analyze import analyze_permissions
+from sros2.api.analyze import REPORT_VERSION as ANALYSIS_REPORT_VERSION
+from sros2.api.atomic import atomic_write
+from sros2.api.atomic import AtomicWriteBatch
+from sros2.api.crl import CRL_FILENAME
+from sros2.api.crl import revoke_certificates
+from sros2.api.crl import write_crl
+from sros2.api.crypto import DEFAULT_CURVE
+from sros2.api.crypto import get_crypto_backend
+from sros2.api.crypto import get_validity_days
+from sros2.api.distribute import export_keystore
+from sros2.api.distribute import import_keystore
+from sros2.api.domains import format_domains
+from sros2.api.domains import get_domains
+from sros2.api.domains import parse_domains
+from sros2.api.domains import set_domains
+from sros2.api.instrumentation import stage
+from sros2.api.keystore_index import find_identities
+from sros2.api.keystore_index import KeystoreIndex
+from sros2.api.manifest import journal_update
+from sros2.api.manifest import KeystoreManifest
+from sros2.api.openssl import (  # noqa: F401
+    check_openssl_version,
+    clear_openssl_toolchain_cache,
+    CommandError,
+    find_openssl_executable,
+    get_openssl_toolchain,
+    run_command,
+    run_shell_command,
+)
+from sros2.api.shared_artifacts import distribute_shared_artifact
+from sros2.api.shared_artifacts import find_stale_shared_artifacts
+from sros2.api.shared_artifacts import get_link_mode
+from sros2.api.shared_artifacts import install_shared_artifacts
+from sros2.api.verify import DEFAULT_EXPIRY_WINDOW_DAYS
+from sros2.api.verify import verify_keystore
 from sros2.policy import (
+    dump_policy,
+    get_compiled_schema,
+    get_compiled_template,
     get_policy_default,
     get_transport_default,
-    get_transport_schema,
-    get_transport_template,
+    iter_policy,
     load_policy,
 )
+from sros2.policy.compact import compact_policy_expressions
+from sros2.policy.diff import diff_policies
+from sros2.policy.diff import merge_policies
+from sros2.policy.model import PolicyModel
 
 HIDDEN_NODE_PREFIX = '_'
+VALIDITY_FORMAT = '%Y-%m-%dT%H:%M:%S'
 DOMAIN_ID_ENV = 'ROS_DOMAIN_ID'
 
 NodeName = namedtuple('NodeName', ('node', 'ns', 'fqn'))
 TopicInfo = namedtuple('Topic', ('fqn', 'type'))
+NodeEndpoints = namedtuple('NodeEndpoints', ('subscribers', 'publishers', 'services'))
 
 
 def get_node_names(*, node, include_hidden_nodes=False):
@@ -78,42 +125,30 @@ def get_service_info(node, node_name):
     return get_topics(node_name, node.get_service_names_and_types_by_node)
 
 
-def find_openssl_executable():
-    if platform.system() != 'Darwin':
-        return 'openssl'
-
-    brew_openssl_prefix_result = subprocess.run(
-        ['brew', '--prefix', 'openssl'],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    if brew_openssl_prefix_result.returncode:
-        raise RuntimeError('unable to find openssl from brew')
-    basepath = brew_openssl_prefix_result.stdout.decode().rstrip()
-    return os.path.join(basepath, 'bin', 'openssl')
-
-
-def check_openssl_version(openssl_executable):
-    openssl_version_string_result = subprocess.run(
-        [openssl_executable, 'version'],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    if openssl_version_string_result.returncode:
-        raise RuntimeError('unable to invoke command: "%s"' % openssl_executable)
-    version = openssl_version_string_result.stdout.decode().rstrip()
-    openssl_version_string_list = version.split(' ')
-    if openssl_version_string_list[0].lower() != 'openssl':
-        raise RuntimeError(
-            "expected version of the format 'OpenSSL "
-            "<MAJOR>.<MINOR>.<PATCH_number><PATCH_letter>  <DATE>'")
-    (major, minor, patch) = openssl_version_string_list[1].split('.')
-    major = int(major)
-    minor = int(minor)
-    if major < 1:
-        raise RuntimeError('need openssl 1.0.2 minimum')
-    if major == 1 and minor < 0:
-        raise RuntimeError('need openssl 1.0.2 minimum')
-    if major == 1 and minor == 0 and int(''.join(itertools.takewhile(str.isdigit, patch))) < 2:
-        raise RuntimeError('need openssl 1.0.2 minimum')
+def get_node_endpoints(node, node_name):
+    return NodeEndpoints(
+        subscribers=get_subscriber_info(node=node, node_name=node_name),
+        publishers=get_publisher_info(node=node, node_name=node_name),
+        services=get_service_info(node=node, node_name=node_name))
+
+
+def get_graph_snapshot(node, node_names):
+    """
+    Collect the endpoints of all the given nodes in one pass.
+
+    The nodes are queried one after the other: the graph queries of rclpy hold the GIL and
+    are not meant to be made concurrently on one node. Nodes that left the graph before being
+    queried are reported and left out of the snapshot.
+    Returns an ordered dictionary of `NodeEndpoints` keyed by `NodeName`.
+    """
+    snapshot = OrderedDict()
+    for node_name in node_names:
+        try:
+            snapshot[node_name] = get_node_endpoints(node, node_name)
+        except RuntimeError as e:
+            print("unable to query node '%s', skipping it: %s" % (node_name.fqn, e),
+                  file=sys.stderr)
+    return snapshot
 
 
 def create_ca_conf_file(path):
@@ -178,38 +213,32 @@ basicConstraints = CA:true
 """)
 
 
-def run_shell_command(cmd, in_path=None):
-    print('running command in path [%s]: %s' % (in_path, cmd))
-    subprocess.call(cmd, shell=True, cwd=in_path)
-
+def create_ecdsa_param_file(path, curve=DEFAULT_CURVE):
+    with stage('ecdsa_param'):
+        get_crypto_backend().create_ecdsa_param_file(path, curve)
 
-def create_ecdsa_param_file(path):
-    openssl_executable = find_openssl_executable()
-    check_openssl_version(openssl_executable)
-    run_shell_command('%s ecparam -name prime256v1 > %s' % (openssl_executable, path))
 
-
-def create_ca_key_cert(ecdsa_param_path, ca_conf_path, ca_key_path, ca_cert_path):
-    openssl_executable = find_openssl_executable()
-    check_openssl_version(openssl_executable)
-    run_shell_command(
-        '%s req -nodes -x509 -days 3650 -newkey ec:%s -keyout %s -out %s -config %s' %
-        (openssl_executable, ecdsa_param_path, ca_key_path, ca_cert_path, ca_conf_path))
+def create_ca_key_cert(
+        ecdsa_param_path, ca_conf_path, ca_key_path, ca_cert_path, validity_days=None):
+    with stage('ca'):
+        get_crypto_backend().create_ca_key_cert(
+            ecdsa_param_path, ca_conf_path, ca_key_path, ca_cert_path, validity_days)
 
 
 def create_governance_file(path, domain_id):
     # for this application we are only looking to authenticate and encrypt;
     # we do not need/want access control at this point.
     governance_xml_path = get_transport_default('dds', 'governance.xml')
-    governance_xml = etree.parse(governance_xml_path)
+    # without the blank text of the template, so that the domains set below get indented
+    governance_xml = etree.parse(
+        governance_xml_path, etree.XMLParser(remove_blank_text=True))
 
-    governance_xsd_path = get_transport_schema('dds', 'governance.xsd')
-    governance_xsd = etree.XMLSchema(etree.parse(governance_xsd_path))
+    governance_xsd = get_compiled_schema('governance.xsd', transport='dds')
 
-    domain_id_elements = governance_xml.findall(
-        'domain_access_rules/domain_rule/domains/id')
-    for domain_id_element in domain_id_elements:
-        domain_id_element.text = domain_id
+    # a single domain id, or a set of domains such as `0,3,10-20`
+    domains = parse_domains(domain_id)
+    for domains_element in governance_xml.findall('domain_access_rules/domain_rule/domains'):
+        set_domains(domains_element, domains)
 
     try:
         governance_xsd.assertValid(governance_xml)
@@ -221,74 +250,100 @@ def create_governance_file(path, domain_id):
 
 
 def create_signed_governance_file(signed_gov_path, gov_path, ca_cert_path, ca_key_path):
-    openssl_executable = find_openssl_executable()
-    check_openssl_version(openssl_executable)
-    run_shell_command(
-        '%s smime -sign -in %s -text -out %s -signer %s -inkey %s' %
-        (openssl_executable, gov_path, signed_gov_path, ca_cert_path, ca_key_path))
+    with stage('sign'):
+        get_crypto_backend().create_signed_file(
+            signed_gov_path, gov_path, ca_cert_path, ca_key_path)
+
 
+def create_keystore(keystore_path, curve=DEFAULT_CURVE, domains=None):
+    """
+    Create a keystore, or complete a partially created one.
 
-def create_keystore(keystore_path):
+    The ECDSA parameters of `curve` are written once at the root of the keystore; the CA key
+    and the keys of all the identities are generated on that curve.
+    The governance covers `domains`, e.g. `0,3,10-20`, `ROS_DOMAIN_ID` or 0 by default.
+    """
     if not os.path.exists(keystore_path):
         print('creating directory: %s' % keystore_path)
         os.makedirs(keystore_path, exist_ok=True)
     else:
         print('directory already exists: %s' % keystore_path)
 
-    ca_conf_path = os.path.join(keystore_path, 'ca_conf.cnf')
-    if not os.path.isfile(ca_conf_path):
-        print('creating CA file: %s' % ca_conf_path)
-        create_ca_conf_file(ca_conf_path)
-    else:
-        print('found CA conf file, not writing a new one!')
+    # all the files are moved in place at once, once they have all been created
+    with AtomicWriteBatch() as batch:
+        ca_conf_path = os.path.join(keystore_path, 'ca_conf.cnf')
+        if not os.path.isfile(ca_conf_path):
+            print('creating CA file: %s' % ca_conf_path)
+            create_ca_conf_file(batch.tmp_path(ca_conf_path))
+        else:
+            print('found CA conf file, not writing a new one!')
+
+        ecdsa_param_path = os.path.join(keystore_path, 'ecdsaparam')
+        if not os.path.isfile(ecdsa_param_path):
+            print('creating ECDSA param file: %s' % ecdsa_param_path)
+            create_ecdsa_param_file(batch.tmp_path(ecdsa_param_path), curve)
+        else:
+            print('found ECDSA param file, not writing a new one!')
+
+        ca_key_path = os.path.join(keystore_path, 'ca.key.pem')
+        ca_cert_path = os.path.join(keystore_path, 'ca.cert.pem')
+        if not (os.path.isfile(ca_key_path) and os.path.isfile(ca_cert_path)):
+            print('creating new CA key/cert pair')
+            create_ca_key_cert(
+                batch.get_path(ecdsa_param_path), batch.get_path(ca_conf_path),
+                batch.tmp_path(ca_key_path), batch.tmp_path(ca_cert_path))
+        else:
+            print('found CA key and cert, not creating new ones!')
+
+        # create governance file
+        gov_path = os.path.join(keystore_path, 'governance.xml')
+        if not os.path.isfile(gov_path):
+            print('creating governance file: %s' % gov_path)
+            if domains is None:
+                domains = os.getenv(DOMAIN_ID_ENV, '0')
+            create_governance_file(batch.tmp_path(gov_path), domains)
+        else:
+            print('found governance file, not creating a new one!')
+
+        # sign governance file
+        signed_gov_path = os.path.join(keystore_path, 'governance.p7s')
+        if not os.path.isfile(signed_gov_path):
+            print('creating signed governance file: %s' % signed_gov_path)
+            create_signed_governance_file(
+                batch.tmp_path(signed_gov_path), batch.get_path(gov_path),
+                batch.get_path(ca_cert_path), batch.get_path(ca_key_path))
+        else:
+            print('found signed governance file, not creating a new one!')
+
+        # create index file
+        index_path = os.path.join(keystore_path, 'index.txt')
+        if not os.path.isfile(index_path):
+            batch.write(index_path, '')
+
+        # create serial file
+        serial_path = os.path.join(keystore_path, 'serial')
+        if not os.path.isfile(serial_path):
+            batch.write(serial_path, '1000')
 
-    ecdsa_param_path = os.path.join(keystore_path, 'ecdsaparam')
-    if not os.path.isfile(ecdsa_param_path):
-        print('creating ECDSA param file: %s' % ecdsa_param_path)
-        create_ecdsa_param_file(ecdsa_param_path)
-    else:
-        print('found ECDSA param file, not writing a new one!')
+    print('all done! enjoy your keystore in %s' % keystore_path)
+    print('cheers!')
+    return True
 
-    ca_key_path = os.path.join(keystore_path, 'ca.key.pem')
-    ca_cert_path = os.path.join(keystore_path, 'ca.cert.pem')
-    if not (os.path.isfile(ca_key_path) and os.path.isfile(ca_cert_path)):
-        print('creating new CA key/cert pair')
-        create_ca_key_cert(ecdsa_param_path, ca_conf_path, ca_key_path, ca_cert_path)
-    else:
-        print('found CA key and cert, not creating new ones!')
 
-    # create governance file
+def get_keystore_domains(keystore_path):
+    """
+    Get the domains permissions are generated for by default, e.g. `0,3,10-20`.
+
+    `ROS_DOMAIN_ID` if set, the domains covered by the governance of the keystore otherwise.
+    """
+    domain_id = os.getenv(DOMAIN_ID_ENV)
+    if domain_id is not None:
+        return domain_id
     gov_path = os.path.join(keystore_path, 'governance.xml')
     if not os.path.isfile(gov_path):
-        print('creating governance file: %s' % gov_path)
-        domain_id = os.getenv(DOMAIN_ID_ENV, '0')
-        create_governance_file(gov_path, domain_id)
-    else:
-        print('found governance file, not creating a new one!')
-
-    # sign governance file
-    signed_gov_path = os.path.join(keystore_path, 'governance.p7s')
-    if not os.path.isfile(signed_gov_path):
-        print('creating signed governance file: %s' % signed_gov_path)
-        create_signed_governance_file(signed_gov_path, gov_path, ca_cert_path, ca_key_path)
-    else:
-        print('found signed governance file, not creating a new one!')
-
-    # create index file
-    index_path = os.path.join(keystore_path, 'index.txt')
-    if not os.path.isfile(index_path):
-        with open(index_path, 'a'):
-            pass
-
-    # create serial file
-    serial_path = os.path.join(keystore_path, 'serial')
-    if not os.path.isfile(serial_path):
-        with open(serial_path, 'w') as f:
-            f.write('1000')
-
-    print('all done! enjoy your keystore in %s' % keystore_path)
-    print('cheers!')
-    return True
+        return '0'
+    domains_element = etree.parse(gov_path).find('domain_access_rules/domain_rule/domains')
+    return format_domains(get_domains(domains_element))
 
 
 def is_valid_keystore(path):
@@ -329,106 +384,342 @@ commonName = %s
 
 
 def create_key_and_cert_req(root, relative_path, cnf_path, ecdsa_param_path, key_path, req_path):
-    key_relpath = os.path.join(relative_path, 'key.pem')
-    ecdsa_param_relpath = os.path.join(relative_path, 'ecdsaparam')
-    cnf_relpath = os.path.join(relative_path, 'request.cnf')
-    key_relpath = os.path.join(relative_path, 'key.pem')
-    req_relpath = os.path.join(relative_path, 'req.pem')
-    openssl_executable = find_openssl_executable()
-    check_openssl_version(openssl_executable)
-    run_shell_command(
-        '%s req -nodes -new -newkey ec:%s -config %s -keyout %s -out %s' %
-        (openssl_executable, ecdsa_param_relpath, cnf_relpath, key_relpath, req_relpath), root)
-
-
-def create_cert(root_path, relative_path):
-    req_relpath = os.path.join(relative_path, 'req.pem')
-    cert_relpath = os.path.join(relative_path, 'cert.pem')
-    openssl_executable = find_openssl_executable()
-    check_openssl_version(openssl_executable)
-    run_shell_command(
-        '%s ca -batch -create_serial -config ca_conf.cnf -days 3650 -in %s -out %s' %
-        (openssl_executable, req_relpath, cert_relpath), root_path)
-
-
-def create_permission_file(path, domain_id, policy_element):
-
-    permissions_xsl_path = get_transport_template('dds', 'permissions.xsl')
-    permissions_xsl = etree.XSLT(etree.parse(permissions_xsl_path))
-    permissions_xsd_path = get_transport_schema('dds', 'permissions.xsd')
-    permissions_xsd = etree.XMLSchema(etree.parse(permissions_xsd_path))
-
-    permissions_xml = permissions_xsl(policy_element)
-
-    domain_id_elements = permissions_xml.findall('permissions/grant/*/domains/id')
-    for domain_id_element in domain_id_elements:
-        domain_id_element.text = domain_id
+    with stage('csr'):
+        get_crypto_backend().create_key_and_cert_req(
+            root, relative_path, cnf_path, ecdsa_param_path, key_path, req_path)
+
+
+def create_cert(root_path, relative_path, req_path=None, cert_path=None, validity_days=None):
+    with stage('cert'):
+        get_crypto_backend().create_cert(
+            root_path, relative_path, req_path, cert_path, validity_days)
+
+
+def get_permissions_xml(domain_id, policy_element, validity=None):
+    """
+    Transform policy profiles into DDS permissions.
+
+    The grants cover the domains of the `domains` attribute of their profile if set,
+    `domain_id` otherwise; both are either a single domain id or a set of domains such as
+    `0,3,10-20`. They are valid for `validity`, a `(not_before, not_after)` pair, by default
+    from today on, see `get_default_permissions_validity`. Signed permissions follow the
+    validity of the certificate of their identity instead, see `create_permissions_from_xml`.
+    """
+    permissions_xsl = get_compiled_template('permissions.xsl', transport='dds')
+    permissions_xsd = get_compiled_schema('permissions.xsd', transport='dds')
+
+    not_before, not_after = validity or get_default_permissions_validity()
+    with stage('xslt'):
+        permissions_xml = permissions_xsl(
+            policy_element,
+            not_before=etree.XSLT.strparam(not_before.strftime(VALIDITY_FORMAT)),
+            not_after=etree.XSLT.strparam(not_after.strftime(VALIDITY_FORMAT)))
+
+    # parsed once per distinct set of domains, whatever the number of grants
+    domains_by_spec = {None: parse_domains(domain_id)}
+    domains_by_grant = {}
+    for profile in policy_element.iter('profile'):
+        spec = profile.get('domains')
+        if spec not in domains_by_spec:
+            domains_by_spec[spec] = parse_domains(spec)
+        name = profile.get('ns').rstrip('/') + '/' + profile.get('node')
+        domains_by_grant.setdefault(name, domains_by_spec[spec])
+    for grant_element in permissions_xml.iterfind('permissions/grant'):
+        domains = domains_by_grant.get(grant_element.get('name'), domains_by_spec[None])
+        for domains_element in grant_element.iterfind('*/domains'):
+            set_domains(domains_element, domains)
 
     try:
-        permissions_xsd.assertValid(permissions_xml)
+        with stage('xsd'):
+            permissions_xsd.assertValid(permissions_xml)
     except etree.DocumentInvalid as e:
         raise RuntimeError(str(e))
+    return permissions_xml
+
+
+def set_permissions_validity(permissions_xml, not_before, not_after):
+    for validity_element in permissions_xml.findall('permissions/grant/validity'):
+        validity_element.find('not_before').text = not_before.strftime(VALIDITY_FORMAT)
+        validity_element.find('not_after').text = not_after.strftime(VALIDITY_FORMAT)
+
+
+def get_default_permissions_validity():
+    """
+    Get the validity of permissions not tied to a certificate yet.
+
+    Permissions are valid from the start of the current day, for the validity configured for
+    permissions, or else for certificates, see `get_validity_days`.
+    """
+    not_before = datetime.datetime.now(datetime.timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0)
+    validity_days = get_validity_days('permissions') or get_validity_days('cert')
+    return not_before, not_before + datetime.timedelta(days=validity_days)
+
+
+def get_permissions_validity(cert_path):
+    """
+    Get the validity of the permissions of an identity, derived from its certificate.
+
+    Permissions are valid from the start of the validity of the certificate, for as long as
+    the certificate or for the validity configured for permissions, see `get_validity_days`.
+    """
+    cert_info = get_crypto_backend().get_certificate_info(cert_path)
+    validity_days = get_validity_days('permissions')
+    if validity_days is None:
+        return cert_info.not_before, cert_info.not_after
+    return (
+        cert_info.not_before,
+        cert_info.not_before + datetime.timedelta(days=validity_days))
+
+
+def split_permissions_xml(permissions_xml):
+    """
+    Split a permissions document into one document per grant.
+
+    Returns an ordered dictionary of the documents keyed by grant name. The grants are moved
+    out of the given document rather than copied. Of duplicate grants, i.e. of duplicate
+    profiles, the first one is kept as `get_policy_from_tree` and `PolicyModel` do.
+    """
+    dds_element = permissions_xml.getroot()
+    permissions_element = dds_element.find('permissions')
+    permissions_xmls = OrderedDict()
+    for grant_element in list(permissions_element):
+        if grant_element.get('name') in permissions_xmls:
+            continue
+        grant_dds_element = etree.Element(
+            dds_element.tag, attrib=dds_element.attrib, nsmap=dds_element.nsmap)
+        grant_permissions_element = etree.SubElement(grant_dds_element, 'permissions')
+        grant_permissions_element.append(grant_element)
+        permissions_xmls[grant_element.get('name')] = etree.ElementTree(grant_dds_element)
+    return permissions_xmls
+
+
+def get_permissions_xml_per_identity(domain_id, policy_tree, validity=None):
+    """
+    Generate the permissions of every profile of a policy in a single pass.
+
+    The whole policy is transformed and validated at once, then split per identity.
+    Each resulting document is identical to the one `get_permissions_xml` generates for the
+    corresponding profile alone.
+    """
+    return split_permissions_xml(get_permissions_xml(domain_id, policy_tree, validity))
 
-    with open(path, 'wb') as f:
-        f.write(etree.tostring(permissions_xml, pretty_print=True))
+
+def create_permission_file(path, domain_id, policy_element):
+    permissions_xml = get_permissions_xml(domain_id, policy_element)
+    write_permission_file(path, permissions_xml)
+
+
+def write_permission_file(path, permissions_xml):
+    with stage('write'):
+        atomic_write(path, etree.tostring(permissions_xml, pretty_print=True))
 
 
 def get_policy(name, policy_file_path):
-    policy_tree = load_policy(policy_file_path)
-    return get_policy_from_tree(name, policy_tree)
+    policy = PolicyModel(load_policy(policy_file_path))
+    return get_policy_from_tree(name, policy)
 
 
-def get_policy_from_tree(name, policy_tree):
+def get_policy_from_tree(name, policy):
+    """
+    Get a policy restricted to the profile of the given identity.
+
+    `policy` is either a policy tree or a `PolicyModel`; pass the latter when looking up many
+    identities so that the profiles get indexed only once. The policy is left untouched.
+    """
+    if not isinstance(policy, PolicyModel):
+        policy = PolicyModel(policy)
     ns, node = name.rsplit('/', 1)
     ns = '/' if not ns else ns
-    profile_element = policy_tree.find(
-        path='profiles/profile[@ns="{ns}"][@node="{node}"]'.format(
-            ns=ns,
-            node=node))
+    profile_element = policy.get_profile(ns, node)
     if profile_element is None:
         raise RuntimeError('unable to find profile "{name}"'.format(
             name=name
         ))
     profiles_element = etree.Element('profiles')
-    profiles_element.append(profile_element)
+    profiles_element.append(copy.deepcopy(profile_element))
     policy_element = etree.Element('policy')
     policy_element.append(profiles_element)
     return policy_element
 
 
+def _format_profile_name(key):
+    ns, node = key
+    return ns + ('' if ns.endswith('/') else '/') + node
+
+
+def _print_rules(prefix, key, rules):
+    name = _format_profile_name(key)
+    for rule in sorted(rules):
+        print('%s %s: %s' % (prefix, name, ' '.join(field for field in rule if field)))
+
+
+def diff_policy(old_policy_file_path, new_policy_file_path):
+    """
+    Print the profiles and rules added and removed from one policy file to another.
+
+    Returns whether the policies grant the same rules, see `diff_policies`.
+    """
+    diff = diff_policies(
+        load_policy(old_policy_file_path), load_policy(new_policy_file_path))
+    for key in diff.removed_profiles:
+        print('- %s' % _format_profile_name(key))
+    for key in diff.added_profiles:
+        print('+ %s' % _format_profile_name(key))
+    for key in sorted(diff.removed_rules.keys() | diff.added_rules.keys()):
+        _print_rules('-', key, diff.removed_rules.get(key, ()))
+        _print_rules('+', key, diff.added_rules.get(key, ()))
+    return not any(diff)
+
+
+def get_permissions_size(policy, domain_id='0'):
+    """Get the size in bytes of the permissions documents of all the profiles of a policy."""
+    return sum(
+        len(etree.tostring(permissions_xml, pretty_print=True))
+        for permissions_xml in get_permissions_xml_per_identity(domain_id, policy).values())
+
+
+def compact_policy_tree(policy, file=None):
+    """
+    Compact the expressions of a policy tree in place, see `sros2.policy.compact`.
+
+    Prints the number of expressions and the size of the permissions documents before and
+    after compaction to `file`, the standard output by default.
+    """
+    size_before = get_permissions_size(policy)
+    count_before, count_after = compact_policy_expressions(policy)
+    size_after = get_permissions_size(policy)
+    print('%d expressions compacted into %d, permissions from %d to %d bytes (-%.1f%%)' % (
+        count_before, count_after, size_before, size_after,
+        100 * (size_before - size_after) / size_before if size_before else 0), file=file)
+
+
+def _write_policy(policy, output_path):
+    if output_path == '-':
+        dump_policy(policy, sys.stdout)
+        return
+    stream = io.StringIO()
+    dump_policy(policy, stream)
+    atomic_write(output_path, stream.getvalue())
+
+
+def merge_policy(policy_file_paths, output_path='-', compact=False):
+    """
+    Merge policy files into one without duplicates, `-` writing it to the standard output.
+
+    The output may be one of the merged files, it is replaced atomically.
+    """
+    merged = merge_policies(load_policy(path) for path in policy_file_paths)
+    if compact:
+        compact_policy_tree(merged.policy, file=sys.stderr if output_path == '-' else None)
+    _write_policy(merged.policy, output_path)
+    if output_path != '-':
+        print('%d profiles merged into %s' % (len(merged), output_path))
+    return True
+
+
+def compact_policy(policy_file_path, output_path=None):
+    """
+    Compact the expressions of a policy file, see `compact_policy_tree`.
+
+    The policy file is replaced atomically unless another output path is given, `-` writing
+    the compacted policy to the standard output.
+    """
+    policy = load_policy(policy_file_path)
+    compact_policy_tree(policy, file=sys.stderr if output_path == '-' else None)
+    _write_policy(policy, policy_file_path if output_path is None else output_path)
+    return True
+
+
 def create_signed_permissions_file(
         permissions_path, signed_permissions_path, ca_cert_path, ca_key_path):
-
-    openssl_executable = find_openssl_executable()
-    check_openssl_version(openssl_executable)
-    run_shell_command(
-        '%s smime -sign -in %s -text -out %s -signer %s -inkey %s' %
-        (openssl_executable, permissions_path, signed_permissions_path, ca_cert_path, ca_key_path))
+    with stage('sign'):
+        get_crypto_backend().create_signed_file(
+            signed_permissions_path, permissions_path, ca_cert_path, ca_key_path)
 
 
 def create_permission(keystore_path, identity, policy_file_path):
     policy_element = get_policy(identity, policy_file_path)
     create_permissions_from_policy_element(keystore_path, identity, policy_element)
+    update_keystore_index(keystore_path, [identity])
     return True
 
 
-def create_permissions_from_policy_element(keystore_path, identity, policy_element):
-    domain_id = os.getenv(DOMAIN_ID_ENV, '0')
+def create_permissions_from_policy_element(
+        keystore_path, identity, policy_element, force=False, manifest=None, domain_id=None):
+    if domain_id is None:
+        domain_id = get_keystore_domains(keystore_path)
+    permissions_xml = get_permissions_xml(domain_id, policy_element)
+    return create_permissions_from_xml(
+        keystore_path, identity, permissions_xml, force=force, manifest=manifest)
+
+
+def create_permissions_from_xml(
+        keystore_path, identity, permissions_xml, force=False, manifest=None):
+    """
+    Write and sign the permissions of an identity.
+
+    The validity of the permissions is set according to the certificate of the identity, see
+    `get_permissions_validity`.
+    With the `manifest` of a batch, nothing is done if it records the identity was last signed
+    with the same permissions, governance and CA, unless `force` is set. Without, the
+    permissions are always signed and only recorded in the manifest journal, so that single
+    identities are provisioned without loading nor rewriting the manifest of the keystore.
+    Returns whether the permissions were regenerated.
+    """
     relative_path = os.path.normpath(identity.lstrip('/'))
     key_dir = os.path.join(keystore_path, relative_path)
-    print('key_dir %s' % key_dir)
     permissions_path = os.path.join(key_dir, 'permissions.xml')
-    create_permission_file(permissions_path, domain_id, policy_element)
-
     signed_permissions_path = os.path.join(key_dir, 'permissions.p7s')
-    keystore_ca_cert_path = os.path.join(keystore_path, 'ca.cert.pem')
-    keystore_ca_key_path = os.path.join(keystore_path, 'ca.key.pem')
-    create_signed_permissions_file(
-        permissions_path, signed_permissions_path,
-        keystore_ca_cert_path, keystore_ca_key_path)
 
+    # permissions follow the validity of the certificate, they change when it is re-issued
+    cert_path = os.path.join(key_dir, 'cert.pem')
+    if os.path.isfile(cert_path):
+        set_permissions_validity(permissions_xml, *get_permissions_validity(cert_path))
+
+    permissions_content = etree.tostring(permissions_xml, pretty_print=True)
+    inputs = None if manifest is None else manifest.get_permissions_inputs(permissions_content)
+    if (
+        manifest is not None and not force and manifest.is_up_to_date(identity, inputs) and
+        os.path.isfile(permissions_path) and os.path.isfile(signed_permissions_path)
+    ):
+        print("permissions of identity '%s' are up to date, not signing new ones!" % identity)
+        return False
+
+    print('key_dir %s' % key_dir)
+    # the permissions and their signature are moved in place together once both are written
+    with AtomicWriteBatch() as batch:
+        with stage('write'):
+            batch.write(permissions_path, permissions_content)
+
+        keystore_ca_cert_path = os.path.join(keystore_path, 'ca.cert.pem')
+        keystore_ca_key_path = os.path.join(keystore_path, 'ca.key.pem')
+        create_signed_permissions_file(
+            batch.get_path(permissions_path), batch.tmp_path(signed_permissions_path),
+            keystore_ca_cert_path, keystore_ca_key_path)
+
+    if manifest is None:
+        journal_update(keystore_path, identity, permissions_content)
+    else:
+        manifest.update(identity, inputs)
+    return True
 
-def create_key(keystore_path, identity):
+
+def create_key(keystore_path, identity, link_mode=None):
+    if not create_key_and_cert(keystore_path, identity, link_mode=link_mode):
+        return False
+    create_default_permissions(keystore_path, identity)
+    update_keystore_index(keystore_path, [identity])
+    return True
+
+
+def create_key_and_cert(keystore_path, identity, link_mode=None):
+    """
+    Create the key and certificate of an identity.
+
+    The keystore CA certificate and governance are copied, hard-linked or symlinked in the
+    identity directory depending on `link_mode`, see `get_link_mode`.
+    """
     if not is_valid_keystore(keystore_path):
         print("'%s' is not a valid keystore " % keystore_path)
         return False
@@ -440,51 +731,48 @@ def create_key(keystore_path, identity):
     key_dir = os.path.join(keystore_path, relative_path)
     os.makedirs(key_dir, exist_ok=True)
 
-    # copy the CA cert in there
-    keystore_ca_cert_path = os.path.join(keystore_path, 'ca.cert.pem')
-    dest_identity_ca_cert_path = os.path.join(key_dir, 'identity_ca.cert.pem')
-    dest_permissions_ca_cert_path = os.path.join(key_dir, 'permissions_ca.cert.pem')
-    shutil.copyfile(keystore_ca_cert_path, dest_identity_ca_cert_path)
-    shutil.copyfile(keystore_ca_cert_path, dest_permissions_ca_cert_path)
-
-    # copy the governance file in there
-    keystore_governance_path = os.path.join(keystore_path, 'governance.p7s')
-    dest_governance_path = os.path.join(key_dir, 'governance.p7s')
-    shutil.copyfile(keystore_governance_path, dest_governance_path)
-
-    ecdsa_param_path = os.path.join(key_dir, 'ecdsaparam')
-    if not os.path.isfile(ecdsa_param_path):
-        print('creating ECDSA param file: %s' % ecdsa_param_path)
-        create_ecdsa_param_file(ecdsa_param_path)
-    else:
-        print('found ECDSA param file, not writing a new one!')
-
-    cnf_path = os.path.join(key_dir, 'request.cnf')
-    if not os.path.isfile(cnf_path):
-        create_request_file(cnf_path, identity)
-    else:
-        print('config file exists, not creating a new one: %s' % cnf_path)
+    # all the files of the identity are moved in place at once, once they have all been created
+    with AtomicWriteBatch() as batch:
+        # copy the CA cert and the governance file in there
+        with stage('copy'):
+            install_shared_artifacts(keystore_path, key_dir, link_mode, batch=batch)
+
+        # keys are generated on the curve of the keystore, identities share its parameters
+        ecdsa_param_path = os.path.join(keystore_path, 'ecdsaparam')
+
+        cnf_path = os.path.join(key_dir, 'request.cnf')
+        if not os.path.isfile(cnf_path):
+            create_request_file(batch.tmp_path(cnf_path), identity)
+        else:
+            print('config file exists, not creating a new one: %s' % cnf_path)
+
+        key_path = os.path.join(key_dir, 'key.pem')
+        req_path = os.path.join(key_dir, 'req.pem')
+        if not os.path.isfile(key_path) or not os.path.isfile(req_path):
+            print('creating key and cert request')
+            create_key_and_cert_req(
+                keystore_path,
+                relative_path,
+                batch.get_path(cnf_path),
+                ecdsa_param_path,
+                batch.tmp_path(key_path), batch.tmp_path(req_path))
+        else:
+            print('found key and cert req; not creating new ones!')
+
+        cert_path = os.path.join(key_dir, 'cert.pem')
+        if not os.path.isfile(cert_path):
+            print('creating cert')
+            create_cert(
+                keystore_path, relative_path, batch.get_path(req_path),
+                batch.tmp_path(cert_path))
+        else:
+            print('found cert; not creating a new one!')
 
-    key_path = os.path.join(key_dir, 'key.pem')
-    req_path = os.path.join(key_dir, 'req.pem')
-    if not os.path.isfile(key_path) or not os.path.isfile(req_path):
-        print('creating key and cert request')
-        create_key_and_cert_req(
-            keystore_path,
-            relative_path,
-            cnf_path,
-            ecdsa_param_path,
-            key_path, req_path)
-    else:
-        print('found key and cert req; not creating new ones!')
+    return True
 
-    cert_path = os.path.join(key_dir, 'cert.pem')
-    if not os.path.isfile(cert_path):
-        print('creating cert')
-        create_cert(keystore_path, relative_path)
-    else:
-        print('found cert; not creating a new one!')
 
+def create_default_permissions(
+        keystore_path, identity, force=False, manifest=None, domain_id=None):
     # create a wildcard permissions file for this node which can be overridden
     # later using a policy if desired
     policy_file_path = get_policy_default('policy.xml')
@@ -495,28 +783,364 @@ def create_key(keystore_path, identity):
     profile_element.attrib['ns'] = ns
     profile_element.attrib['node'] = node
 
+    return create_permissions_from_policy_element(
+        keystore_path, identity, policy_element, force=force, manifest=manifest,
+        domain_id=domain_id)
+
+
+def update_keystore_index(keystore_path, identities, jobs=None):
+    with stage('index'), KeystoreIndex(keystore_path) as index:
+        if not index.exists:
+            # index the whole keystore at once rather than only the given identities
+            index.rebuild(jobs=jobs)
+        else:
+            index.update_identities(identities, jobs=jobs)
+
+
+def list_keys(
+        keystore_path, prefix=None, expiring_before=None, rebuild_index=False, jobs=None,
+        long=False):
+    """
+    List the identities of a keystore, optionally filtered by namespace prefix or expiry.
+
+    The identities are looked up in the keystore index, which is built on first use.
+    """
+    if not is_valid_keystore(keystore_path):
+        print("'%s' is not a valid keystore " % keystore_path)
+        return False
+    with KeystoreIndex(keystore_path) as index:
+        if rebuild_index or not index.exists:
+            count = index.rebuild(jobs=jobs)
+            print('indexed %d identities' % count, file=sys.stderr)
+        for record in index.query(prefix=prefix, expiring_before=expiring_before):
+            if long:
+                print('%s %s %s' % (record.name, record.serial, record.not_after))
+            else:
+                print(record.name)
+    return True
+
+
+def find_expiring_identities(keystore_path, within_days, prefix=None):
+    """Look up the identities whose certificate expires within a number of days."""
+    deadline = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        days=within_days)
+    with KeystoreIndex(keystore_path) as index:
+        if not index.exists:
+            index.rebuild()
+        return [
+            record.name for record in index.query(
+                prefix=prefix, expiring_before=deadline.strftime(VALIDITY_FORMAT))]
+
+
+def reissue_identity(keystore_path, identity, rekey=False, validity_days=None, manifest=None):
+    """
+    Issue a new certificate to an identity, and sign its permissions again accordingly.
+
+    The existing key and certificate request are reused unless `rekey` is set.
+    """
+    relative_path = os.path.normpath(identity.lstrip('/'))
+    key_dir = os.path.join(keystore_path, relative_path)
+    cnf_path = os.path.join(key_dir, 'request.cnf')
+    key_path = os.path.join(key_dir, 'key.pem')
+    req_path = os.path.join(key_dir, 'req.pem')
+    cert_path = os.path.join(key_dir, 'cert.pem')
+    if not os.path.isfile(cnf_path):
+        raise RuntimeError('unable to find the key of identity "%s"' % identity)
+    print("re-issuing certificate of identity '%s'" % identity)
+
+    with AtomicWriteBatch() as batch:
+        if rekey or not (os.path.isfile(key_path) and os.path.isfile(req_path)):
+            create_key_and_cert_req(
+                keystore_path, relative_path, cnf_path,
+                os.path.join(keystore_path, 'ecdsaparam'),
+                batch.tmp_path(key_path), batch.tmp_path(req_path))
+        create_cert(
+            keystore_path, relative_path, batch.get_path(req_path), batch.tmp_path(cert_path),
+            validity_days)
+
     permissions_path = os.path.join(key_dir, 'permissions.xml')
-    domain_id = os.getenv(DOMAIN_ID_ENV, '0')
-    create_permission_file(permissions_path, domain_id, policy_element)
+    if not os.path.isfile(permissions_path):
+        return create_default_permissions(keystore_path, identity, manifest=manifest)
+    return create_permissions_from_xml(
+        keystore_path, identity, etree.parse(permissions_path), manifest=manifest)
 
-    signed_permissions_path = os.path.join(key_dir, 'permissions.p7s')
-    keystore_ca_key_path = os.path.join(keystore_path, 'ca.key.pem')
-    create_signed_permissions_file(
-        permissions_path, signed_permissions_path,
-        keystore_ca_cert_path, keystore_ca_key_path)
 
+def rotate(
+        keystore_path, within_days=30, identities=[], rekey=False, validity_days=None, jobs=1,
+        dry_run=False):
+    """
+    Renew the certificates and permissions of identities in parallel.
+
+    Unless identities are given, the ones whose certificate expires within `within_days` are
+    looked up in the keystore index. Other identities are left untouched.
+    """
+    if not is_valid_keystore(keystore_path):
+        print("'%s' is not a valid keystore " % keystore_path)
+        return False
+    if not identities:
+        identities = find_expiring_identities(keystore_path, within_days)
+    print('%d identities to renew' % len(identities))
+    if dry_run:
+        for identity in identities:
+            print(identity)
+        return True
+
+    manifest = KeystoreManifest(keystore_path, journal=True)
+    failures = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+            futures = [
+                (identity, executor.submit(
+                    reissue_identity, keystore_path, identity, rekey, validity_days, manifest))
+                for identity in identities]
+            for identity, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    failures.append(identity)
+                    print('failed to renew identity "%s": %s' % (identity, e), file=sys.stderr)
+    finally:
+        manifest.save()
+        update_keystore_index(keystore_path, identities, jobs=jobs)
+
+    print('%d identities renewed' % (len(identities) - len(failures)))
+    if failures:
+        print('%d out of %d identities could not be renewed' % (
+            len(failures), len(identities)), file=sys.stderr)
+        return False
     return True
 
 
-def list_keys(keystore_path):
-    for name in os.listdir(keystore_path):
-        if os.path.isdir(os.path.join(keystore_path, name)):
-            print(name)
+def check_shared_artifacts(keystore_path, fix=False, jobs=None, link_mode=None):
+    """
+    Report the identity copies of the keystore CA certificate, governance and CRL that are stale.
+
+    With `fix`, stale files are replaced according to `link_mode`.
+    Returns whether all the files were, or now are, up to date.
+    """
+    if not is_valid_keystore(keystore_path):
+        print("'%s' is not a valid keystore " % keystore_path)
+        return False
+    stale_artifacts = find_stale_shared_artifacts(keystore_path, jobs=jobs)
+    for identity, filename, reason in stale_artifacts:
+        print('%s: %s is %s' % (identity, filename, reason))
+    if not fix:
+        return not stale_artifacts
+    for identity in OrderedDict((identity, None) for identity, _, _ in stale_artifacts):
+        install_shared_artifacts(
+            keystore_path, os.path.join(keystore_path, identity.lstrip('/')), link_mode)
+    print('%d files fixed' % len(stale_artifacts))
     return True
 
 
-def distribute_key(source_keystore_path, taget_keystore_path):
-    raise NotImplementedError()
+def verify(
+        keystore_path, expiry_window_days=DEFAULT_EXPIRY_WINDOW_DAYS, jobs=None,
+        report_path=None):
+    """
+    Verify a keystore and the artifacts of all its identities.
+
+    The report is written as JSON to `report_path` if given, `-` being the standard output.
+    Returns whether no problem was found.
+    """
+    if not is_valid_keystore(keystore_path):
+        print("'%s' is not a valid keystore " % keystore_path)
+        return False
+    report = verify_keystore(keystore_path, expiry_window_days=expiry_window_days, jobs=jobs)
+    if report_path == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        for error in report['errors']:
+            print('keystore: %s' % error)
+        for entry in report['identities']:
+            for error in entry['errors']:
+                print('%s: %s' % (entry['identity'], error))
+        print('%d out of %d identities failed verification' % (
+            report['failed_identity_count'], report['identity_count']))
+        if report_path is not None:
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+    return not report['errors'] and not report['failed_identity_count']
+
+
+def _iter_permissions_xmls(path):
+    if os.path.isdir(path):
+        if not is_valid_keystore(path):
+            raise RuntimeError("'%s' is not a valid keystore" % path)
+        for identity in find_identities(path):
+            permissions_path = os.path.join(path, identity.lstrip('/'), 'permissions.xml')
+            if os.path.isfile(permissions_path):
+                yield etree.parse(permissions_path)
+        return
+    document = etree.parse(path)
+    if document.getroot().tag == 'policy':
+        yield get_permissions_xml(os.getenv(DOMAIN_ID_ENV, '0'), load_policy(path))
+    else:
+        yield document
+
+
+def analyze(paths, max_size=None, max_rules=None, max_redundant=None, report_path=None):
+    """
+    Report the size, rule counts and unreachable rules of DDS permissions grants.
+
+    Each path is a permissions document, a policy file whose permissions are generated first,
+    or a keystore whose identities are all analyzed. Grants over budget are reported as
+    errors, see `sros2.api.analyze.analyze_permissions`. The report is written as JSON to
+    `report_path` if given, `-` being the standard output.
+    Returns whether no grant is over budget.
+    """
+    grants = []
+    for path in paths:
+        for permissions_xml in _iter_permissions_xmls(path):
+            grants.extend(analyze_permissions(
+                permissions_xml, max_size=max_size, max_rules=max_rules,
+                max_redundant=max_redundant))
+    report = {
+        'version': ANALYSIS_REPORT_VERSION,
+        'budget': {'max_size': max_size, 'max_rules': max_rules, 'max_redundant': max_redundant},
+        'grant_count': len(grants),
+        'total_size': sum(entry['size'] for entry in grants),
+        'failed_grant_count': sum(1 for entry in grants if entry['errors']),
+        'grants': grants,
+    }
+    if report_path == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        for entry in grants:
+            print('%s: %d bytes, %d publish and %d subscribe rules' % (
+                entry['grant'], entry['size'], entry['publish_rule_count'],
+                entry['subscribe_rule_count']))
+            for finding in ('duplicates', 'redundant', 'shadowed'):
+                for description in entry[finding]:
+                    print('  %s: %s' % (finding, description))
+            for error in entry['errors']:
+                print('  over budget: %s' % error)
+        print('%d out of %d grants over budget, %d bytes in total' % (
+            report['failed_grant_count'], report['grant_count'], report['total_size']))
+        if report_path is not None:
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+    return not report['failed_grant_count']
+
+
+def publish_crl(keystore_path, revoked=None, days=None, link_mode=None, jobs=None):
+    """
+    Issue the keystore CRL and install it into all the identities.
+
+    See `write_crl` for the meaning of `revoked`.
+    """
+    with stage('crl'):
+        write_crl(keystore_path, revoked=revoked, days=days)
+    installed_count = distribute_shared_artifact(
+        keystore_path, CRL_FILENAME, link_mode=link_mode, jobs=jobs)
+    print('%s installed into %d identities' % (CRL_FILENAME, installed_count))
+
+
+def revoke(keystore_path, identities, days=None, link_mode=None, jobs=None):
+    """
+    Revoke the certificates of identities, and publish the updated CRL.
+
+    The revocations are appended to the current CRL, the CA database is not scanned again.
+    """
+    if not is_valid_keystore(keystore_path):
+        print("'%s' is not a valid keystore " % keystore_path)
+        return False
+    serials = []
+    for identity in identities:
+        cert_path = os.path.join(keystore_path, identity.lstrip('/'), 'cert.pem')
+        if not os.path.isfile(cert_path):
+            print('unable to find the certificate of identity "%s"' % identity, file=sys.stderr)
+            return False
+        serials.append(get_crypto_backend().get_certificate_info(cert_path).serial)
+    revoked = revoke_certificates(keystore_path, serials)
+    print('%d certificates revoked' % len(revoked))
+    publish_crl(keystore_path, revoked=revoked, days=days, link_mode=link_mode, jobs=jobs)
+    return True
+
+
+def create_crl(keystore_path, full=False, days=None, link_mode=None, jobs=None):
+    """
+    Issue the keystore CRL again, e.g. before the current one expires, and publish it.
+
+    Unless `full` is set, the entries of the current CRL are carried over.
+    """
+    if not is_valid_keystore(keystore_path):
+        print("'%s' is not a valid keystore " % keystore_path)
+        return False
+    publish_crl(
+        keystore_path, revoked=None if full else [], days=days, link_mode=link_mode, jobs=jobs)
+    return True
+
+
+ARCHIVE_COMPRESSIONS = (
+    ('.tar.gz', 'gz'), ('.tgz', 'gz'), ('.tar.bz2', 'bz2'), ('.tar.xz', 'xz'), ('.tar', ''))
+
+
+def distribute_key(
+        source_keystore_path, taget_keystore_path, identities=[], prefixes=[],
+        compression=None):
+    """
+    Export identities of a keystore, with the public CA material only, to another keystore.
+
+    The target is a keystore directory, which is updated incrementally, a tar archive path,
+    or `-` to stream the archive to the standard output, e.g. to pipe it to a remote machine
+    running `import_keys`. Identities are selected by name or namespace prefix, all of them
+    by default. The CA private key is never exported.
+    """
+    if not is_valid_keystore(source_keystore_path):
+        print("'%s' is not a valid keystore " % source_keystore_path)
+        return False
+    if taget_keystore_path == '-':
+        export_keystore(
+            source_keystore_path, sys.stdout.buffer, identities, prefixes,
+            'gz' if compression is None else compression)
+        sys.stdout.flush()
+        return True
+
+    for suffix, suffix_compression in ARCHIVE_COMPRESSIONS:
+        if taget_keystore_path.endswith(suffix):
+            with AtomicWriteBatch() as batch:
+                with open(batch.tmp_path(taget_keystore_path), 'wb') as f:
+                    count = export_keystore(
+                        source_keystore_path, f, identities, prefixes,
+                        suffix_compression if compression is None else compression)
+            print('%d identities exported to %s' % (count, taget_keystore_path))
+            return True
+
+    # stream the archive through a pipe straight into the target keystore
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(read_fd, 'rb') as reader, ThreadPoolExecutor(max_workers=1) as executor:
+        def export():
+            with os.fdopen(write_fd, 'wb') as writer:
+                return export_keystore(
+                    source_keystore_path, writer, identities, prefixes,
+                    '' if compression is None else compression)
+        future = executor.submit(export)
+        try:
+            summary = import_keystore(taget_keystore_path, reader)
+        except Exception:
+            # unblock the exporter; if it failed first, its error is the one to report
+            reader.close()
+            error = future.exception()
+            if error is not None and not isinstance(error, BrokenPipeError):
+                raise error
+            raise
+        count = future.result()
+    print('%d identities distributed to %s: %d files written, %d unchanged' % (
+        count, taget_keystore_path, summary.written, summary.unchanged))
+    return True
+
+
+def import_keys(keystore_path, archive_path):
+    """Install the identities of an archive written by `distribute_key`, `-` being stdin."""
+    if archive_path == '-':
+        summary = import_keystore(keystore_path, sys.stdin.buffer)
+    else:
+        with open(archive_path, 'rb') as f:
+            summary = import_keystore(keystore_path, f)
+    print('%d files written, %d unchanged' % (summary.written, summary.unchanged))
+    return True
 
 
 def get_keystore_path_from_env():
@@ -527,27 +1151,128 @@ def get_keystore_path_from_env():
     return root_keystore_path
 
 
-def generate_artifacts(keystore_path=None, identity_names=[], policy_files=[]):
+def provision_identity(
+        keystore_path, identity, permissions_xmls=[], force=False, manifest=None,
+        link_mode=None, domain_id=None):
+    """
+    Create the key of an identity and sign its permissions.
+
+    The wildcard default permissions are only used if no permissions are given.
+    Returns whether the permissions of the identity were regenerated.
+    """
+    if not create_key_and_cert(keystore_path, identity, link_mode=link_mode):
+        raise RuntimeError('unable to create key for identity "%s"' % identity)
+    if not permissions_xmls:
+        return create_default_permissions(
+            keystore_path, identity, force=force, manifest=manifest, domain_id=domain_id)
+    rebuilt = False
+    for permissions_xml in permissions_xmls:
+        rebuilt |= create_permissions_from_xml(
+            keystore_path, identity, permissions_xml, force=force, manifest=manifest)
+    return rebuilt
+
+
+def provision_identity_from_policy(
+        keystore_path, identity, domain_id, policy_element, force=False, manifest=None,
+        link_mode=None):
+    permissions_xml = get_permissions_xml(domain_id, policy_element)
+    return provision_identity(
+        keystore_path, identity, [permissions_xml], force, manifest, link_mode)
+
+
+def generate_artifacts(
+        keystore_path=None, identity_names=[], policy_files=[], jobs=1, force=False,
+        stream=False, link_mode=None, domains=None):
+    """
+    Create keys and permissions for the given identities and the profiles of policy files.
+
+    With `stream`, policy files are parsed incrementally and each profile is provisioned as
+    soon as it has been read, instead of transforming each policy file as a whole upfront.
+    Permissions cover `domains`, e.g. `0,3,10-20`, unless set per profile, see
+    `get_permissions_xml`; by default the domains of the keystore, see `get_keystore_domains`.
+    """
     if keystore_path is None:
         keystore_path = get_keystore_path_from_env()
         if keystore_path is None:
             return False
     if not is_valid_keystore(keystore_path):
         print('%s is not a valid keystore, creating new keystore' % keystore_path)
-        create_keystore(keystore_path)
+        create_keystore(keystore_path, domains=domains)
+
+    jobs = max(jobs, 1)
+    link_mode = get_link_mode(link_mode)
+    domain_id = get_keystore_domains(keystore_path) if domains is None else domains
+    # journaled so that an interrupted run resumes where it stopped
+    manifest = KeystoreManifest(keystore_path, journal=True)
+    provisioned = OrderedDict()
+    failures = []
+    pending = deque()
+
+    def wait_for_oldest():
+        identity, future = pending.popleft()
+        try:
+            rebuilt = future.result()
+        except Exception as e:
+            failures.append(identity)
+            print('failed to provision identity "%s": %s' % (identity, e), file=sys.stderr)
+        else:
+            provisioned[identity] = provisioned.get(identity, False) or rebuilt
+
+    def submit(executor, identity, function, *args):
+        # bound the work in flight, and never handle an identity in two workers at once
+        while pending and (
+            len(pending) >= 2 * jobs or any(identity == other for other, _ in pending)
+        ):
+            wait_for_oldest()
+        pending.append((identity, executor.submit(function, *args)))
 
-    # create keys for all provided identities
-    for identity in identity_names:
-        if not create_key(keystore_path, identity):
-            return False
-    for policy_file in policy_files:
-        policy_tree = load_policy(policy_file)
-        profiles_element = policy_tree.find('profiles')
-        for profile in profiles_element:
-            identity_name = profile.get('ns').rstrip('/') + '/' + profile.get('node')
-            if not create_key(keystore_path, identity_name):
-                return False
-            policy_element = get_policy_from_tree(identity_name, policy_tree)
-            create_permissions_from_policy_element(
-                keystore_path, identity_name, policy_element)
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            if stream:
+                for policy_file in policy_files:
+                    streamed = set()
+                    for policy_element in iter_policy(policy_file):
+                        profile = policy_element.find('profiles/profile')
+                        identity = profile.get('ns').rstrip('/') + '/' + profile.get('node')
+                        # the first of duplicate profiles wins, see `split_permissions_xml`
+                        if identity in streamed:
+                            continue
+                        streamed.add(identity)
+                        submit(
+                            executor, identity, provision_identity_from_policy,
+                            keystore_path, identity, domain_id, policy_element, force, manifest,
+                            link_mode)
+                while pending:
+                    wait_for_oldest()
+                identities = OrderedDict(
+                    (identity, []) for identity in identity_names
+                    if identity not in provisioned and identity not in failures)
+            else:
+                # group the permissions per identity, each identity is handled by one worker
+                identities = OrderedDict((identity, []) for identity in identity_names)
+                for policy_file in policy_files:
+                    with stage('load_policy'):
+                        policy_tree = load_policy(policy_file)
+                    permissions_xmls = get_permissions_xml_per_identity(domain_id, policy_tree)
+                    for identity, permissions_xml in permissions_xmls.items():
+                        identities.setdefault(identity, []).append(permissions_xml)
+
+            for identity, permissions_xmls in identities.items():
+                submit(
+                    executor, identity, provision_identity,
+                    keystore_path, identity, permissions_xmls, force, manifest, link_mode,
+                    domain_id)
+            while pending:
+                wait_for_oldest()
+    finally:
+        manifest.save()
+        update_keystore_index(keystore_path, list(provisioned), jobs=jobs)
+
+    rebuilt_count = sum(provisioned.values())
+    print('%d identities rebuilt, %d up to date' % (
+        rebuilt_count, len(provisioned) - rebuilt_count))
+    if failures:
+        print('%d out of %d identities could not be provisioned' % (
+            len(failures), len(provisioned) + len(failures)), file=sys.stderr)
+        return False
     return True
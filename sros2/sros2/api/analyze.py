@@ -0,0 +1,172 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import fnmatch
+import re
+
+from lxml import etree
+
+from sros2.api.domains import get_domains
+
+REPORT_VERSION = 1
+RULE_KINDS = ('publish', 'subscribe')
+WILDCARD_CHARACTERS = frozenset('*?[]\\')
+
+
+class _RuleSection:
+    """The expressions of one kind, e.g. publish, of an allow or deny rule of a grant."""
+
+    def __init__(self, qualifier, domains):
+        self.qualifier = qualifier
+        self.domains = domains
+        self.expressions = set()
+        self.patterns = []
+        self._regex = None
+
+    def add(self, expression):
+        self.expressions.add(expression)
+        if not WILDCARD_CHARACTERS.isdisjoint(expression):
+            self.patterns.append(expression)
+            self._regex = None
+
+    def find_cover(self, expression, exclude_self=False):
+        """Get an expression of the section matching all the names `expression` matches."""
+        if not exclude_self and expression in self.expressions:
+            return expression
+        if not self.patterns:
+            return None
+        if not WILDCARD_CHARACTERS.isdisjoint(expression):
+            # only a trailing `*` after a literal prefix is known to cover another pattern
+            for pattern in self.patterns:
+                prefix = pattern[:-1]
+                if (
+                    pattern.endswith('*') and WILDCARD_CHARACTERS.isdisjoint(prefix) and
+                    expression.startswith(prefix) and pattern != expression
+                ):
+                    return pattern
+            return None
+        if self._regex is None:
+            self._regex = re.compile('|'.join(fnmatch.translate(p) for p in self.patterns))
+        if not self._regex.match(expression):
+            return None
+        for pattern in self.patterns:
+            if fnmatch.fnmatchcase(expression, pattern):
+                return pattern
+        return None
+
+
+def _covers_domains(outer, inner):
+    return all(
+        any(low <= inner_low and inner_high <= high for low, high in outer)
+        for inner_low, inner_high in inner)
+
+
+def analyze_grant(grant, size=None):
+    """
+    Count the rules of a DDS permissions grant and find its duplicate and unreachable rules.
+
+    Rules are evaluated in document order and the first one matching a topic decides, as the
+    DDS Security specification mandates. An expression whose topics an earlier rule of the
+    grant already matches on the same domains is unreachable: it is reported as shadowed if
+    the earlier rule has the other qualifier, e.g. an ALLOW after a DENY, as redundant
+    otherwise. Returns the report entry of the grant.
+    """
+    entry = {
+        'grant': grant.get('name'),
+        'size': size,
+        'publish_rule_count': 0,
+        'subscribe_rule_count': 0,
+        'duplicates': [],
+        'redundant': [],
+        'shadowed': [],
+        'errors': [],
+    }
+    sections = {kind: [] for kind in RULE_KINDS}
+    for rule in grant.iterchildren('allow_rule', 'deny_rule'):
+        qualifier = 'ALLOW' if rule.tag == 'allow_rule' else 'DENY'
+        domains_element = rule.find('domains')
+        domains = [] if domains_element is None else get_domains(domains_element)
+        for kind in RULE_KINDS:
+            section = _RuleSection(qualifier, domains)
+            for topic in rule.iterfind(kind + '/topics/topic'):
+                # empty expressions grant nothing
+                expression = (topic.text or '').strip()
+                if not expression:
+                    continue
+                entry[kind + '_rule_count'] += 1
+                description = "%s %s '%s'" % (qualifier, kind, expression)
+                if expression in section.expressions:
+                    entry['duplicates'].append(description)
+                    continue
+                section.add(expression)
+            for expression in sorted(section.expressions):
+                description = "%s %s '%s'" % (qualifier, kind, expression)
+                for earlier in sections[kind]:
+                    if not _covers_domains(earlier.domains, domains):
+                        continue
+                    cover = earlier.find_cover(expression)
+                    if cover is not None:
+                        kind_of_finding = (
+                            'redundant' if earlier.qualifier == qualifier else 'shadowed')
+                        entry[kind_of_finding].append("%s, matched by %s '%s'" % (
+                            description, earlier.qualifier, cover))
+                        break
+                else:
+                    cover = section.find_cover(expression, exclude_self=True)
+                    if cover is not None:
+                        entry['redundant'].append("%s, matched by %s '%s'" % (
+                            description, qualifier, cover))
+            sections[kind].append(section)
+    return entry
+
+
+def _check_budget(entry, max_size, max_rules, max_redundant):
+    if max_size is not None and entry['size'] > max_size:
+        entry['errors'].append('document size %d exceeds %d bytes' % (entry['size'], max_size))
+    rule_count = entry['publish_rule_count'] + entry['subscribe_rule_count']
+    if max_rules is not None and rule_count > max_rules:
+        entry['errors'].append('%d rules exceed %d' % (rule_count, max_rules))
+    redundant_count = (
+        len(entry['duplicates']) + len(entry['redundant']) + len(entry['shadowed']))
+    if max_redundant is not None and redundant_count > max_redundant:
+        entry['errors'].append('%d duplicate, redundant or shadowed rules exceed %d' % (
+            redundant_count, max_redundant))
+
+
+def analyze_permissions(permissions_xml, max_size=None, max_rules=None, max_redundant=None):
+    """
+    Analyze the grants of a DDS permissions document, see `analyze_grant`.
+
+    The size of a grant is the size of the permissions document holding only that grant, as
+    deployed to its identity. Grants exceeding a budget, i.e. `max_size` bytes, `max_rules`
+    publish and subscribe rules or `max_redundant` duplicate, redundant and shadowed rules,
+    have errors. Returns the report entries of the grants.
+    """
+    dds_element = (
+        permissions_xml.getroot() if isinstance(permissions_xml, etree._ElementTree)
+        else permissions_xml)
+    grants = dds_element.findall('permissions/grant')
+    entries = []
+    for grant in grants:
+        if len(grants) == 1:
+            document = dds_element
+        else:
+            document = etree.Element(
+                dds_element.tag, attrib=dds_element.attrib, nsmap=dds_element.nsmap)
+            etree.SubElement(document, 'permissions').append(copy.deepcopy(grant))
+        entry = analyze_grant(grant, size=len(etree.tostring(document, pretty_print=True)))
+        _check_budget(entry, max_size, max_rules, max_redundant)
+        entries.append(entry)
+    return entries
@@ -0,0 +1,107 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+
+FSYNC_ENV = 'SROS2_FSYNC'
+
+
+def is_fsync_enabled():
+    return os.getenv(FSYNC_ENV, '1') != '0'
+
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_directory(path):
+    # directories cannot be opened, hence synced, on Windows
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AtomicWriteBatch:
+    """
+    Write a set of files to temporary paths, then move them in place together.
+
+    Files are written to, or by any tool given, the path returned by `tmp_path`. They replace
+    their final path when the batch is committed, which happens when leaving the batch
+    context without error; on error they are discarded. Either way no final path is ever left
+    truncated. Before the files are moved in place they are synced to disk, then each of
+    their directories is synced once, so that a batch of files of the same directory costs a
+    single directory sync. Syncing can be disabled with `SROS2_FSYNC=0`.
+    """
+
+    def __init__(self, fsync=None):
+        self.fsync = is_fsync_enabled() if fsync is None else fsync
+        self._paths = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def tmp_path(self, path):
+        tmp_path = '%s.tmp.%d.%d' % (path, os.getpid(), threading.get_ident())
+        self._paths.append((tmp_path, path))
+        return tmp_path
+
+    def get_path(self, path):
+        """Get where the content of a file currently is: its temporary path if pending."""
+        for tmp_path, final_path in self._paths:
+            if final_path == path:
+                return tmp_path
+        return path
+
+    def write(self, path, content):
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(self.tmp_path(path), mode) as f:
+            f.write(content)
+
+    def commit(self):
+        paths, self._paths = self._paths, []
+        if self.fsync:
+            for tmp_path, _ in paths:
+                if not os.path.islink(tmp_path):
+                    fsync_path(tmp_path)
+        for tmp_path, path in paths:
+            os.replace(tmp_path, path)
+        if self.fsync:
+            for directory in sorted({os.path.dirname(os.path.abspath(p)) for _, p in paths}):
+                fsync_directory(directory)
+
+    def abort(self):
+        paths, self._paths = self._paths, []
+        for tmp_path, _ in paths:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+
+
+def atomic_write(path, content):
+    with AtomicWriteBatch() as batch:
+        batch.write(path, content)
@@ -0,0 +1,256 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+import datetime
+import os
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives import serialization
+except ImportError:
+    x509 = None
+
+from sros2.api.atomic import atomic_write
+from sros2.api.atomic import AtomicWriteBatch
+from sros2.api.atomic import is_fsync_enabled
+from sros2.api.crypto import CA_DATABASE_LOCK
+from sros2.api.crypto import format_serial
+
+CRL_FILENAME = 'crl.pem'
+CRL_NUMBER_FILENAME = 'crlnumber'
+# revocations not applied to the CA database `index.txt` yet, one `<serial>\t<date>` per line
+REVOCATION_JOURNAL_FILENAME = 'index.txt.journal'
+# same as `default_crl_days` of the keystore CA configuration
+DEFAULT_CRL_DAYS = 30
+# serials looked up one by one in the CA database, above which every entry is parsed instead
+_LOOKUP_MAX_SERIALS = 64
+
+RevokedCertificate = namedtuple('RevokedCertificate', ('serial', 'revocation_date'))
+
+
+def _parse_index_time(value):
+    # UTCTime or GeneralizedTime, as written in the CA database by `openssl ca`; sliced
+    # rather than parsed with strptime, which dominates reading large databases otherwise
+    if len(value) == 13:
+        year = int(value[:2])
+        value = ('19' if year >= 50 else '20') + value
+    return datetime.datetime(
+        int(value[:4]), int(value[4:6]), int(value[6:8]), int(value[8:10]),
+        int(value[10:12]), int(value[12:14]), tzinfo=datetime.timezone.utc)
+
+
+def _format_index_time(value):
+    return value.strftime('%y%m%d%H%M%SZ' if value.year < 2050 else '%Y%m%d%H%M%SZ')
+
+
+def _read_revocation_journal(root_path):
+    journal = {}
+    journal_path = os.path.join(root_path, REVOCATION_JOURNAL_FILENAME)
+    if not os.path.isfile(journal_path):
+        return journal
+    with open(journal_path) as f:
+        for line in f:
+            try:
+                serial, revocation_date = line.rstrip('\n').split('\t')
+                journal[int(serial, 16)] = _parse_index_time(revocation_date)
+            except ValueError:
+                # the last entry may have been cut short
+                break
+    return journal
+
+
+def _find_index_statuses(root_path, serials):
+    # the status of the entries of `serials` in the CA database, e.g. `V` for valid
+    with open(os.path.join(root_path, 'index.txt')) as f:
+        content = f.read()
+    statuses = {}
+    if len(serials) <= _LOOKUP_MAX_SERIALS:
+        # serials are written as `openssl ca` does, only the fourth field is a bare number
+        for serial in serials:
+            field = '\t%s\t' % format_serial(serial)
+            position = content.find(field)
+            while position >= 0:
+                fields = content[content.rfind('\n', 0, position) + 1:].split('\t', 4)
+                if len(fields) > 4 and fields[3] == field.strip('\t'):
+                    statuses[serial] = fields[0]
+                    break
+                position = content.find(field, position + 1)
+        if len(statuses) == len(serials):
+            return statuses
+    # otherwise, e.g. serials formatted differently, every entry is parsed
+    for line in content.splitlines():
+        fields = line.split('\t')
+        if len(fields) >= 4 and int(fields[3], 16) in serials:
+            statuses[int(fields[3], 16)] = fields[0]
+    return statuses
+
+
+def _apply_revocation_journal(root_path):
+    # fold the journal into the CA database, e.g. for `openssl ca` to see the revocations
+    journal = _read_revocation_journal(root_path)
+    journal_path = os.path.join(root_path, REVOCATION_JOURNAL_FILENAME)
+    if journal:
+        index_path = os.path.join(root_path, 'index.txt')
+        with open(index_path) as f:
+            lines = f.readlines()
+        for i, line in enumerate(lines):
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 4 or fields[0] != 'V':
+                continue
+            revocation_date = journal.get(int(fields[3], 16))
+            if revocation_date is not None:
+                fields[0] = 'R'
+                fields[2] = _format_index_time(revocation_date)
+                lines[i] = '\t'.join(fields) + '\n'
+        atomic_write(index_path, ''.join(lines))
+    if os.path.isfile(journal_path):
+        os.remove(journal_path)
+
+
+def read_revoked_certificates(root_path):
+    """Get the revoked certificates of the CA database (`index.txt`) of a keystore."""
+    journal = _read_revocation_journal(root_path)
+    revoked = []
+    with open(os.path.join(root_path, 'index.txt')) as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if fields[0] != 'R':
+                continue
+            # the revocation field may be followed by a reason, e.g. `<date>,keyCompromise`
+            serial = int(fields[3], 16)
+            journal.pop(serial, None)
+            revoked.append(RevokedCertificate(
+                serial=serial,
+                revocation_date=_parse_index_time(fields[2].split(',')[0])))
+    revoked.extend(RevokedCertificate(*entry) for entry in journal.items())
+    return revoked
+
+
+def revoke_certificates(root_path, serials, revocation_date=None):
+    """
+    Mark certificates as revoked in the CA database of a keystore, as `openssl ca -revoke` does.
+
+    `serials` are hexadecimal strings. Certificates already revoked are left untouched.
+    The certificates are looked up by serial and their revocations appended to a journal,
+    rather than the whole database being rewritten; the journal is applied to the database
+    when a full CRL is issued, see `write_crl`.
+    Returns the newly revoked certificates as a list of `RevokedCertificate`.
+    """
+    if revocation_date is None:
+        revocation_date = datetime.datetime.now(datetime.timezone.utc)
+    revocation_date = revocation_date.replace(microsecond=0)
+    serials = {int(serial, 16) for serial in serials}
+    revoked = []
+    with CA_DATABASE_LOCK:
+        statuses = _find_index_statuses(root_path, serials)
+        unknown = serials - set(statuses)
+        if unknown:
+            raise RuntimeError('certificates not issued by the keystore CA: %s' % ', '.join(
+                sorted(format_serial(serial) for serial in unknown)))
+        journal = _read_revocation_journal(root_path)
+        revoked = [
+            RevokedCertificate(serial, revocation_date) for serial in sorted(serials)
+            if statuses[serial] == 'V' and serial not in journal]
+        if revoked:
+            with open(os.path.join(root_path, REVOCATION_JOURNAL_FILENAME), 'a') as f:
+                f.write(''.join(
+                    '%s\t%s\n' % (format_serial(entry.serial), _format_index_time(
+                        entry.revocation_date))
+                    for entry in revoked))
+                f.flush()
+                if is_fsync_enabled():
+                    os.fsync(f.fileno())
+    return revoked
+
+
+def _read_crl_entries(crl_path, ca_cert):
+    """
+    Get the revoked certificates of a CRL issued by the keystore CA.
+
+    Returns None if the CRL cannot be extended, i.e. it is not a CRL of the current CA.
+    """
+    try:
+        with open(crl_path, 'rb') as f:
+            crl = x509.load_pem_x509_crl(f.read())
+    except (OSError, ValueError):
+        return None
+    if crl.issuer != ca_cert.subject or not crl.is_signature_valid(ca_cert.public_key()):
+        return None
+    return list(crl)
+
+
+def _read_crl_number(root_path):
+    crl_number_path = os.path.join(root_path, CRL_NUMBER_FILENAME)
+    if not os.path.isfile(crl_number_path):
+        return 1
+    with open(crl_number_path) as f:
+        return int(f.read().strip(), 16)
+
+
+def write_crl(root_path, revoked=None, days=None):
+    """
+    Issue the certificate revocation list `crl.pem` of a keystore.
+
+    With `revoked`, the list of certificates revoked since the current CRL was issued, the
+    entries of the current CRL are carried over as they are and `revoked` appended to them,
+    without reading the CA database. Otherwise, or if there is no current CRL to extend, the
+    CRL lists all the revoked certificates of the CA database. Either way the CRL number is
+    bumped, as `openssl ca -gencrl` does.
+    """
+    if x509 is None:
+        raise RuntimeError('issuing a CRL requires the cryptography python package')
+    if days is None:
+        days = DEFAULT_CRL_DAYS
+    with open(os.path.join(root_path, 'ca.cert.pem'), 'rb') as f:
+        ca_cert = x509.load_pem_x509_certificate(f.read())
+    with open(os.path.join(root_path, 'ca.key.pem'), 'rb') as f:
+        ca_key = serialization.load_pem_private_key(f.read(), password=None)
+    hash_algorithm = hashes.SHA384() if ca_key.curve.key_size > 256 else hashes.SHA256()
+    crl_path = os.path.join(root_path, CRL_FILENAME)
+
+    with CA_DATABASE_LOCK:
+        entries = None
+        if revoked is not None:
+            entries = _read_crl_entries(crl_path, ca_cert)
+        if entries is None:
+            # the whole database is read anyway, bring it up to date
+            _apply_revocation_journal(root_path)
+            revoked = read_revoked_certificates(root_path)
+            entries = []
+        entries.extend(
+            x509.RevokedCertificateBuilder().serial_number(entry.serial).revocation_date(
+                entry.revocation_date).build()
+            for entry in revoked)
+
+        crl_number = _read_crl_number(root_path)
+        this_update = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        # given upfront, adding the entries one by one copies them each time
+        builder = x509.CertificateRevocationListBuilder(revoked_certificates=entries)
+        crl = builder.issuer_name(
+            ca_cert.subject
+        ).last_update(
+            this_update
+        ).next_update(
+            this_update + datetime.timedelta(days=days)
+        ).add_extension(
+            x509.CRLNumber(crl_number), critical=False
+        ).sign(ca_key, hash_algorithm)
+
+        with AtomicWriteBatch() as batch:
+            batch.write(crl_path, crl.public_bytes(serialization.Encoding.PEM))
+            batch.write(
+                os.path.join(root_path, CRL_NUMBER_FILENAME),
+                format_serial(crl_number + 1) + '\n')
@@ -0,0 +1,406 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+import datetime
+import os
+import random
+import threading
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.serialization import pkcs7
+    from cryptography.x509.oid import NameOID
+except ImportError:
+    x509 = None
+
+from sros2.api.openssl import run_openssl_command
+
+CRYPTO_BACKEND_ENV = 'SROS2_CRYPTO_BACKEND'
+CERT_VALIDITY_DAYS = 3650
+
+# overrides of the validity of each type of artifact, in days
+VALIDITY_DAYS_ENV = {
+    'ca': 'SROS2_CA_VALIDITY_DAYS',
+    'cert': 'SROS2_CERT_VALIDITY_DAYS',
+    'permissions': 'SROS2_PERMISSIONS_VALIDITY_DAYS',
+}
+
+CertificateInfo = namedtuple('CertificateInfo', ('serial', 'not_before', 'not_after'))
+
+# serializes the updates of the keystore CA database (`serial` and `index.txt`)
+CA_DATABASE_LOCK = threading.Lock()
+
+# what `openssl ecparam -name <curve>` writes out, for the curves keys can be generated on
+# Ed25519 is not offered: the DDS Security authentication plugins only support ECDSA and RSA
+EC_PARAMETERS_PEM = {
+    'prime256v1': b"""\
+-----BEGIN EC PARAMETERS-----
+BggqhkjOPQMBBw==
+-----END EC PARAMETERS-----
+""",
+    'secp384r1': b"""\
+-----BEGIN EC PARAMETERS-----
+BgUrgQQAIg==
+-----END EC PARAMETERS-----
+""",
+}
+EC_CURVE_CLASSES = {
+    'prime256v1': 'SECP256R1',
+    'secp384r1': 'SECP384R1',
+}
+PRIME256V1_PARAMETERS_PEM = EC_PARAMETERS_PEM['prime256v1']
+DEFAULT_CURVE = 'prime256v1'
+
+
+class OpenSSLBackend:
+    """Generate keys, certificates and signatures by invoking the openssl executable."""
+
+    NAME = 'openssl'
+
+    def create_ecdsa_param_file(self, path, curve=DEFAULT_CURVE):
+        _check_curve(curve)
+        run_openssl_command(['ecparam', '-name', curve, '-out', path])
+
+    def create_ca_key_cert(
+            self, ecdsa_param_path, ca_conf_path, ca_key_path, ca_cert_path,
+            validity_days=None):
+        run_openssl_command([
+            'req', '-nodes', '-x509', '-days', get_validity_days('ca', validity_days),
+            '-newkey', 'ec:' + ecdsa_param_path, '-keyout', ca_key_path, '-out', ca_cert_path,
+            '-config', ca_conf_path])
+
+    def create_key_and_cert_req(
+            self, root, relative_path, cnf_path, ecdsa_param_path, key_path, req_path):
+        ecdsa_param_relpath = os.path.relpath(ecdsa_param_path, root)
+        cnf_relpath = os.path.relpath(cnf_path, root)
+        key_relpath = os.path.relpath(key_path, root)
+        req_relpath = os.path.relpath(req_path, root)
+        run_openssl_command([
+            'req', '-nodes', '-new', '-newkey', 'ec:' + ecdsa_param_relpath, '-config',
+            cnf_relpath, '-keyout', key_relpath, '-out', req_relpath], root)
+
+    def create_cert(
+            self, root_path, relative_path, req_path=None, cert_path=None, validity_days=None):
+        req_path, cert_path = _get_cert_paths(root_path, relative_path, req_path, cert_path)
+        req_relpath = os.path.relpath(req_path, root_path)
+        cert_relpath = os.path.relpath(cert_path, root_path)
+        with CA_DATABASE_LOCK:
+            run_openssl_command([
+                'ca', '-batch', '-create_serial', '-config', 'ca_conf.cnf', '-days',
+                get_validity_days('cert', validity_days), '-in', req_relpath, '-out',
+                cert_relpath], root_path)
+
+    def create_signed_file(self, signed_path, path, ca_cert_path, ca_key_path):
+        run_openssl_command([
+            'smime', '-sign', '-in', path, '-text', '-out', signed_path, '-signer',
+            ca_cert_path, '-inkey', ca_key_path])
+
+    def get_certificate_info(self, cert_path):
+        output = run_openssl_command(
+            ['x509', '-noout', '-serial', '-startdate', '-enddate', '-in', cert_path])
+        fields = dict(line.split('=', 1) for line in output.decode().splitlines() if '=' in line)
+        not_before, not_after = (
+            datetime.datetime.strptime(
+                ' '.join(fields[name].split()), '%b %d %H:%M:%S %Y %Z'
+            ).replace(tzinfo=datetime.timezone.utc)
+            for name in ('notBefore', 'notAfter'))
+        return CertificateInfo(
+            serial=fields['serial'].strip(), not_before=not_before, not_after=not_after)
+
+
+class CryptographyBackend:
+    """
+    Generate keys, certificates and signatures in-process.
+
+    Artifacts are interchangeable with the ones of the openssl backend: keys are unencrypted
+    PKCS#8, certificates are issued out of the keystore CA database (`serial` and `index.txt`)
+    and signed files are detached S/MIME documents.
+    """
+
+    NAME = 'cryptography'
+
+    def __init__(self):
+        if x509 is None:
+            raise RuntimeError(
+                "the '%s' crypto backend requires the cryptography python package" % self.NAME)
+
+    def create_ecdsa_param_file(self, path, curve=DEFAULT_CURVE):
+        _check_curve(curve)
+        with open(path, 'wb') as f:
+            f.write(EC_PARAMETERS_PEM[curve])
+
+    def create_ca_key_cert(
+            self, ecdsa_param_path, ca_conf_path, ca_key_path, ca_cert_path,
+            validity_days=None):
+        private_key = ec.generate_private_key(_load_curve(ecdsa_param_path))
+        subject = _read_distinguished_name(ca_conf_path)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = x509.CertificateBuilder().subject_name(
+            subject
+        ).issuer_name(
+            subject
+        ).public_key(
+            private_key.public_key()
+        ).serial_number(
+            x509.random_serial_number()
+        ).not_valid_before(
+            now
+        ).not_valid_after(
+            now + datetime.timedelta(days=get_validity_days('ca', validity_days))
+        ).add_extension(
+            x509.BasicConstraints(ca=True, path_length=None), critical=False
+        ).sign(private_key, hashes.SHA256())
+        _write_private_key(ca_key_path, private_key)
+        _write_cert(ca_cert_path, cert)
+
+    def create_key_and_cert_req(
+            self, root, relative_path, cnf_path, ecdsa_param_path, key_path, req_path):
+        private_key = ec.generate_private_key(_load_curve(ecdsa_param_path))
+        csr = x509.CertificateSigningRequestBuilder().subject_name(
+            _read_distinguished_name(cnf_path)
+        ).sign(private_key, hashes.SHA256())
+        _write_private_key(key_path, private_key)
+        with open(req_path, 'wb') as f:
+            f.write(csr.public_bytes(serialization.Encoding.PEM))
+
+    def create_cert(
+            self, root_path, relative_path, req_path=None, cert_path=None, validity_days=None):
+        req_path, cert_path = _get_cert_paths(root_path, relative_path, req_path, cert_path)
+        validity_days = get_validity_days('cert', validity_days)
+        with open(req_path, 'rb') as f:
+            csr = x509.load_pem_x509_csr(f.read())
+        if not csr.is_signature_valid:
+            raise RuntimeError('invalid signature on certificate request "%s"' % req_path)
+        ca_key, ca_cert = _load_key_and_cert(
+            os.path.join(root_path, 'ca.key.pem'), os.path.join(root_path, 'ca.cert.pem'))
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with CA_DATABASE_LOCK:
+            cert = x509.CertificateBuilder().subject_name(
+                csr.subject
+            ).issuer_name(
+                ca_cert.subject
+            ).public_key(
+                csr.public_key()
+            ).serial_number(
+                _allocate_serial(root_path)
+            ).not_valid_before(
+                now
+            ).not_valid_after(
+                now + datetime.timedelta(days=validity_days)
+            ).add_extension(
+                x509.BasicConstraints(ca=False, path_length=None), critical=False
+            ).sign(ca_key, hashes.SHA256())
+            _record_issued_cert(root_path, cert)
+        _write_cert(cert_path, cert)
+
+    def create_signed_file(self, signed_path, path, ca_cert_path, ca_key_path):
+        with open(path, 'rb') as f:
+            content = f.read()
+        ca_key, ca_cert = _load_key_and_cert(ca_key_path, ca_cert_path)
+        signed_content = pkcs7.PKCS7SignatureBuilder().set_data(
+            content
+        ).add_signer(
+            ca_cert, ca_key, hashes.SHA256()
+        ).sign(
+            serialization.Encoding.SMIME,
+            [pkcs7.PKCS7Options.Text, pkcs7.PKCS7Options.DetachedSignature])
+        with open(signed_path, 'wb') as f:
+            f.write(signed_content)
+
+    def get_certificate_info(self, cert_path):
+        with open(cert_path, 'rb') as f:
+            cert = x509.load_pem_x509_certificate(f.read())
+        return CertificateInfo(
+            serial=format_serial(cert.serial_number),
+            not_before=get_certificate_not_before(cert),
+            not_after=get_certificate_not_after(cert))
+
+
+def _check_curve(curve):
+    if curve not in EC_PARAMETERS_PEM:
+        raise RuntimeError("unsupported curve '%s', expected one of: %s" % (
+            curve, ', '.join(sorted(EC_PARAMETERS_PEM))))
+
+
+# curve of each parameters file, the file being shared by all the keys of a keystore
+_curves = {}
+_curves_lock = threading.Lock()
+
+
+def _load_curve(ecdsa_param_path):
+    stat = os.stat(ecdsa_param_path)
+    key = (os.path.abspath(ecdsa_param_path), stat.st_mtime_ns, stat.st_size)
+    with _curves_lock:
+        curve = _curves.get(key)
+    if curve is not None:
+        return curve
+    with open(ecdsa_param_path, 'rb') as f:
+        content = f.read()
+    for name, parameters in EC_PARAMETERS_PEM.items():
+        if content.strip() == parameters.strip():
+            curve = getattr(ec, EC_CURVE_CLASSES[name])()
+            break
+    else:
+        raise RuntimeError('unsupported ECDSA parameters in "%s"' % ecdsa_param_path)
+    with _curves_lock:
+        _curves[key] = curve
+    return curve
+
+
+def _get_cert_paths(root_path, relative_path, req_path, cert_path):
+    if req_path is None:
+        req_path = os.path.join(root_path, relative_path, 'req.pem')
+    if cert_path is None:
+        cert_path = os.path.join(root_path, relative_path, 'cert.pem')
+    return req_path, cert_path
+
+
+def _read_distinguished_name(cnf_path):
+    # only the commonName of the [ req_distinguished_name ] section is used by sros2
+    section = None
+    with open(cnf_path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line.startswith('['):
+                section = line.strip('[] ')
+            elif section == 'req_distinguished_name' and '=' in line:
+                key, value = (token.strip() for token in line.split('=', 1))
+                if key == 'commonName':
+                    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, value)])
+    raise RuntimeError('no commonName found in "%s"' % cnf_path)
+
+
+def _load_key_and_cert(key_path, cert_path):
+    with open(key_path, 'rb') as f:
+        key = serialization.load_pem_private_key(f.read(), password=None)
+    with open(cert_path, 'rb') as f:
+        cert = x509.load_pem_x509_certificate(f.read())
+    return key, cert
+
+
+def _write_private_key(path, private_key):
+    with open(path, 'wb') as f:
+        f.write(private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()))
+
+
+def _write_cert(path, cert):
+    with open(path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+
+
+def format_serial(serial):
+    serial = '%X' % serial
+    return serial if len(serial) % 2 == 0 else '0' + serial
+
+
+def _allocate_serial(root_path):
+    # same bookkeeping as `openssl ca -create_serial`
+    serial_path = os.path.join(root_path, 'serial')
+    if os.path.isfile(serial_path):
+        with open(serial_path) as f:
+            serial = int(f.read().strip(), 16)
+    else:
+        serial = random.SystemRandom().getrandbits(63)
+    # never leave a truncated serial file behind
+    with open(serial_path + '.new', 'w') as f:
+        f.write(format_serial(serial + 1) + '\n')
+    os.replace(serial_path + '.new', serial_path)
+    return serial
+
+
+def get_validity_days(artifact_type, validity_days=None):
+    """
+    Get the validity in days of a type of artifact: `ca`, `cert` or `permissions`.
+
+    Unless given, it is read from the environment, e.g. SROS2_CERT_VALIDITY_DAYS. Certificates
+    default to CERT_VALIDITY_DAYS, permissions to None, i.e. the validity of the certificate
+    of their identity.
+    """
+    if validity_days is None:
+        value = os.getenv(VALIDITY_DAYS_ENV[artifact_type])
+        if value:
+            try:
+                validity_days = int(value)
+            except ValueError:
+                raise RuntimeError('invalid %s: %s' % (VALIDITY_DAYS_ENV[artifact_type], value))
+        elif artifact_type != 'permissions':
+            validity_days = CERT_VALIDITY_DAYS
+    if validity_days is not None and validity_days <= 0:
+        raise RuntimeError('invalid validity of %d days' % validity_days)
+    return validity_days
+
+
+def get_certificate_not_before(cert):
+    not_before = getattr(cert, 'not_valid_before_utc', None)
+    if not_before is None:
+        not_before = cert.not_valid_before.replace(tzinfo=datetime.timezone.utc)
+    return not_before
+
+
+def get_certificate_not_after(cert):
+    not_after = getattr(cert, 'not_valid_after_utc', None)
+    if not_after is None:
+        not_after = cert.not_valid_after.replace(tzinfo=datetime.timezone.utc)
+    return not_after
+
+
+def _record_issued_cert(root_path, cert):
+    # append an entry to the CA database in the format used by `openssl ca`
+    not_after = get_certificate_not_after(cert)
+    subject = ''.join(
+        '/CN=%s' % attribute.value.replace('/', '\\/')
+        for attribute in cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME))
+    with open(os.path.join(root_path, 'index.txt'), 'a') as f:
+        f.write('V\t%s\t\t%s\tunknown\t%s\n' % (
+            not_after.strftime('%y%m%d%H%M%SZ'), format_serial(cert.serial_number), subject))
+
+
+_crypto_backend_classes = {
+    OpenSSLBackend.NAME: OpenSSLBackend,
+    CryptographyBackend.NAME: CryptographyBackend,
+}
+_crypto_backends = {}
+
+
+def get_crypto_backend_names():
+    return sorted(_crypto_backend_classes.keys())
+
+
+def get_default_crypto_backend_name():
+    """
+    Get the name of the crypto backend set by `SROS2_CRYPTO_BACKEND`, `openssl` by default.
+
+    The in-process `cryptography` backend is opt-in: it numbers certificates differently in
+    the CA database, so existing keystores keep being handled by the openssl executable.
+    """
+    return os.getenv(CRYPTO_BACKEND_ENV) or OpenSSLBackend.NAME
+
+
+def get_crypto_backend(name=None):
+    if name is None:
+        name = get_default_crypto_backend_name()
+    if name not in _crypto_backend_classes:
+        raise RuntimeError('unknown crypto backend "%s", expected one of: %s' % (
+            name, ', '.join(get_crypto_backend_names())))
+    if name not in _crypto_backends:
+        _crypto_backends[name] = _crypto_backend_classes[name]()
+    return _crypto_backends[name]
@@ -0,0 +1,41 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Minimal DER reading, for the few structures sros2 handles at the byte level."""
+
+OCTET_STRING = 0x04
+SET = 0x31
+CONTEXT_0 = 0xa0
+
+
+def read_element(data, offset):
+    """Read the element at `offset`, returns its tag, content offset and end offset."""
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7f
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    if offset + length > len(data):
+        raise ValueError('truncated DER element')
+    return tag, offset, offset + length
+
+
+def iter_elements(data, start, end):
+    """Iterate over the elements of a sequence or set, with their offset."""
+    while start < end:
+        tag, content_start, content_end = read_element(data, start)
+        yield tag, start, content_start, content_end
+        start = content_end
@@ -0,0 +1,163 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+import os
+import posixpath
+import stat
+import tarfile
+
+from sros2.api.atomic import AtomicWriteBatch
+from sros2.api.keystore_index import find_identities
+
+# the public CA material a keystore being distributed needs
+KEYSTORE_EXPORT_FILES = ('ca.cert.pem', 'governance.xml', 'governance.p7s', 'crl.pem')
+# the files an identity needs at runtime, e.g. neither its certificate request nor its config
+IDENTITY_EXPORT_FILES = (
+    'cert.pem', 'key.pem', 'identity_ca.cert.pem', 'permissions_ca.cert.pem', 'governance.p7s',
+    'permissions.xml', 'permissions.p7s', 'crl.pem')
+# never leave the keystore they were created in
+PRIVATE_FILES = ('ca.key.pem',)
+COMPRESSIONS = ('gz', 'bz2', 'xz', '')
+
+ImportSummary = namedtuple('ImportSummary', ('written', 'unchanged'))
+
+
+def select_identities(keystore_path, identities=(), prefixes=()):
+    """
+    Get the names of the identities of a keystore matching names or namespace prefixes.
+
+    Without any name or prefix, all the identities of the keystore are selected.
+    """
+    if not identities and not prefixes:
+        return list(find_identities(keystore_path))
+    selected = []
+    for identity in identities:
+        if not os.path.isfile(os.path.join(keystore_path, identity.lstrip('/'), 'cert.pem')):
+            raise RuntimeError('unable to find the certificate of identity "%s"' % identity)
+        selected.append(identity)
+    for prefix in prefixes:
+        prefix = '/' + prefix.strip('/')
+        prefix_path = os.path.join(keystore_path, prefix.lstrip('/'))
+        if os.path.isfile(os.path.join(prefix_path, 'cert.pem')):
+            selected.append(prefix)
+        selected.extend(
+            prefix.rstrip('/') + identity for identity in find_identities(prefix_path))
+    # in order, without duplicates
+    return list(dict.fromkeys(selected))
+
+
+def _add_file(tar, path, arcname):
+    if os.path.basename(arcname) in PRIVATE_FILES:
+        raise RuntimeError("refusing to export '%s'" % arcname)
+    # shared files may be links to the keystore files, always export their content
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.size = st.st_size
+        tarinfo.mtime = st.st_mtime
+        tarinfo.mode = stat.S_IMODE(st.st_mode)
+        tar.addfile(tarinfo, f)
+
+
+def export_keystore(keystore_path, stream, identities=(), prefixes=(), compression='gz'):
+    """
+    Write the public CA material and the selected identities of a keystore as a tar stream.
+
+    The archive is written to `stream` as it is produced, nothing is staged on disk; `stream`
+    may be a pipe or a socket. Identities are selected by `select_identities`.
+    Returns the number of identities exported.
+    """
+    if compression not in COMPRESSIONS:
+        raise RuntimeError("invalid compression '%s', expected one of: %s" % (
+            compression, ', '.join(c or "''" for c in COMPRESSIONS)))
+    selected = select_identities(keystore_path, identities, prefixes)
+    mode = 'w|' + compression
+    with tarfile.open(fileobj=stream, mode=mode, format=tarfile.PAX_FORMAT) as tar:
+        for filename in KEYSTORE_EXPORT_FILES:
+            path = os.path.join(keystore_path, filename)
+            if os.path.isfile(path):
+                _add_file(tar, path, filename)
+        for identity in selected:
+            relative_path = identity.strip('/')
+            key_dir = os.path.join(keystore_path, relative_path)
+            for filename in IDENTITY_EXPORT_FILES:
+                path = os.path.join(key_dir, filename)
+                if os.path.isfile(path):
+                    _add_file(tar, path, posixpath.join(relative_path, filename))
+    return len(selected)
+
+
+def _check_member(member):
+    name = posixpath.normpath(member.name)
+    if (
+        not member.isfile() or name.startswith('/') or name == '..' or
+        name.startswith('../') or posixpath.basename(name) in PRIVATE_FILES
+    ):
+        raise RuntimeError("unexpected archive member '%s'" % member.name)
+    return name
+
+
+def _is_unchanged(path, content):
+    try:
+        if os.path.getsize(path) != len(content):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == content
+    except OSError:
+        return False
+
+
+def import_keystore(keystore_path, stream):
+    """
+    Install the files of an archive written by `export_keystore` into a keystore.
+
+    The archive is read sequentially from `stream`. Files whose content is unchanged are left
+    untouched, the others are replaced atomically one directory at a time; files and
+    identities the archive does not contain are kept. Returns an `ImportSummary`.
+    """
+    written = 0
+    unchanged = 0
+    batch = None
+    batch_directory = None
+    try:
+        with tarfile.open(fileobj=stream, mode='r|*') as tar:
+            for member in tar:
+                name = _check_member(member)
+                path = os.path.join(keystore_path, *name.split('/'))
+                content = tar.extractfile(member).read()
+                if _is_unchanged(path, content):
+                    unchanged += 1
+                    continue
+                directory = os.path.dirname(path)
+                if directory != batch_directory:
+                    if batch is not None:
+                        batch.commit()
+                    os.makedirs(directory, exist_ok=True)
+                    batch = AtomicWriteBatch()
+                    batch_directory = directory
+                # created with their final mode, so keys are never readable by others
+                fd = os.open(
+                    batch.tmp_path(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                    member.mode & 0o777)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                written += 1
+        if batch is not None:
+            batch.commit()
+    except BaseException:
+        if batch is not None:
+            batch.abort()
+        raise
+    return ImportSummary(written=written, unchanged=unchanged)
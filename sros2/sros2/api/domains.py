@@ -0,0 +1,78 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from lxml import etree
+
+# the upper bound of an `id_range` without `max`, which is open-ended; domain ids are a `long`
+UNBOUNDED_DOMAIN_ID = 2 ** 31 - 1
+
+
+def parse_domains(spec):
+    """
+    Parse a set of DDS domains, e.g. `0,3,10-20`, into a sorted list of `(min, max)` ranges.
+
+    Domain ids are non-negative integers, as the DDS Security schemas require. Overlapping
+    and adjacent ranges are merged.
+    """
+    ranges = []
+    for item in str(spec).split(','):
+        bounds = item.split('-')
+        try:
+            if len(bounds) > 2:
+                raise ValueError()
+            low, high = int(bounds[0]), int(bounds[-1])
+        except ValueError:
+            raise RuntimeError("invalid domains '%s', expected e.g. '0,3,10-20'" % spec)
+        if not 0 <= low <= high:
+            raise RuntimeError("invalid domains '%s': '%s' is not a range" % (spec, item.strip()))
+        ranges.append((low, high))
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def format_domains(domains):
+    return ','.join(
+        str(low) if low == high else '%d-%d' % (low, high) for low, high in domains)
+
+
+def set_domains(domains_element, domains):
+    """Replace the content of a governance or permissions `domains` element."""
+    for child in list(domains_element):
+        domains_element.remove(child)
+    domains_element.text = None
+    for low, high in domains:
+        if low == high:
+            etree.SubElement(domains_element, 'id').text = str(low)
+        else:
+            id_range_element = etree.SubElement(domains_element, 'id_range')
+            etree.SubElement(id_range_element, 'min').text = str(low)
+            etree.SubElement(id_range_element, 'max').text = str(high)
+
+
+def get_domains(domains_element):
+    """Get the ranges of a governance or permissions `domains` element, see `set_domains`."""
+    ranges = []
+    for child in domains_element.iterchildren(tag=etree.Element):
+        if child.tag == 'id':
+            ranges.append('%d' % int(child.text))
+        elif child.tag == 'id_range':
+            low = child.findtext('min', '0')
+            high = child.findtext('max', str(UNBOUNDED_DOMAIN_ID))
+            ranges.append('%d-%d' % (int(low), int(high)))
+    return parse_domains(','.join(ranges))
@@ -0,0 +1,120 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+from contextlib import contextmanager
+import json
+import sys
+import threading
+import time
+
+StageEvent = namedtuple('StageEvent', ('stage', 'start', 'duration', 'thread'))
+
+_listeners = []
+_listeners_lock = threading.Lock()
+
+
+def add_listener(listener):
+    """
+    Register a callable to be called with a `StageEvent` at the end of every stage.
+
+    Listeners may be called from several threads at once.
+    """
+    with _listeners_lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _listeners_lock:
+        _listeners.remove(listener)
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the provisioning pipeline, e.g. `sign`, and notify the listeners."""
+    if not _listeners:
+        yield
+        return
+    start = time.time()
+    counter = time.perf_counter()
+    try:
+        yield
+    finally:
+        event = StageEvent(
+            stage=name, start=start, duration=time.perf_counter() - counter,
+            thread=threading.current_thread().name)
+        for listener in list(_listeners):
+            listener(event)
+
+
+@contextmanager
+def listening(listener):
+    add_listener(listener)
+    try:
+        yield listener
+    finally:
+        remove_listener(listener)
+
+
+def _percentile(sorted_values, percentile):
+    index = int(round(percentile / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class StageStatistics:
+    """Listener aggregating the durations of the stages."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = {}
+
+    def __call__(self, event):
+        with self._lock:
+            self._durations.setdefault(event.stage, []).append(event.duration)
+
+    def summary(self):
+        """Get the count, total, p50 and p99 durations in seconds of each stage, by stage."""
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self._durations.items()}
+        return {
+            name: {
+                'count': len(values),
+                'total': sum(values),
+                'p50': _percentile(values, 50),
+                'p99': _percentile(values, 99),
+            }
+            for name, values in durations.items()
+        }
+
+    def print_summary(self, file=sys.stderr):
+        summary = self.summary()
+        print('%-12s %8s %10s %10s %10s' % ('stage', 'count', 'total s', 'p50 ms', 'p99 ms'),
+              file=file)
+        for name, stats in sorted(summary.items(), key=lambda item: -item[1]['total']):
+            print('%-12s %8d %10.3f %10.3f %10.3f' % (
+                name, stats['count'], stats['total'], 1000 * stats['p50'], 1000 * stats['p99']),
+                file=file)
+
+
+class JsonEventWriter:
+    """Listener writing every event as a line of JSON."""
+
+    def __init__(self, stream):
+        self._lock = threading.Lock()
+        self._stream = stream
+
+    def __call__(self, event):
+        line = json.dumps(event._asdict(), sort_keys=True)
+        with self._lock:
+            self._stream.write(line + '\n')
@@ -0,0 +1,141 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sqlite3
+
+from sros2.api.crypto import get_crypto_backend
+from sros2.api.manifest import hash_file
+
+KEYSTORE_INDEX_FILENAME = 'keystore_index.db'
+
+IdentityRecord = namedtuple(
+    'IdentityRecord', ('name', 'path', 'serial', 'not_after', 'permissions_hash'))
+
+
+def get_identity_record(keystore_path, identity):
+    relative_path = os.path.normpath(identity.lstrip('/'))
+    key_dir = os.path.join(keystore_path, relative_path)
+    serial = None
+    not_after = None
+    cert_path = os.path.join(key_dir, 'cert.pem')
+    if os.path.isfile(cert_path):
+        cert_info = get_crypto_backend().get_certificate_info(cert_path)
+        serial = cert_info.serial
+        not_after = cert_info.not_after.strftime('%Y-%m-%dT%H:%M:%S')
+    return IdentityRecord(
+        name=identity,
+        path=relative_path,
+        serial=serial,
+        not_after=not_after,
+        permissions_hash=hash_file(os.path.join(key_dir, 'permissions.xml')))
+
+
+def find_identities(keystore_path):
+    """Walk the keystore for the names of all the identities holding a certificate."""
+    for path, directories, filenames in os.walk(keystore_path):
+        directories[:] = sorted(d for d in directories if not d.startswith('.'))
+        if path != keystore_path and 'cert.pem' in filenames:
+            relative_path = os.path.relpath(path, keystore_path)
+            yield '/' + '/'.join(relative_path.split(os.sep))
+
+
+class KeystoreIndex:
+    """
+    SQLite index of the identities of a keystore.
+
+    Records the certificate serial and expiry, and the hash of the permissions, of each
+    identity so that listing and filtering identities does not require walking the keystore.
+    Identities are keyed by name and also indexed by expiry, so both namespace prefix and
+    expiry queries are logarithmic in the number of identities.
+    """
+
+    def __init__(self, keystore_path):
+        self.keystore_path = keystore_path
+        self.path = os.path.join(keystore_path, KEYSTORE_INDEX_FILENAME)
+        self.exists = os.path.isfile(self.path)
+        self._connection = sqlite3.connect(self.path, timeout=60)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS identities ('
+                ' name TEXT PRIMARY KEY,'
+                ' path TEXT NOT NULL,'
+                ' serial TEXT,'
+                ' not_after TEXT,'
+                ' permissions_hash TEXT)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS identities_not_after ON identities (not_after)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def update(self, records):
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO identities VALUES (?, ?, ?, ?, ?)', records)
+
+    def _get_records(self, identities, jobs=None):
+        if len(identities) <= 1:
+            return [get_identity_record(self.keystore_path, i) for i in identities]
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(
+                lambda identity: get_identity_record(self.keystore_path, identity),
+                identities))
+
+    def update_identities(self, identities, jobs=None):
+        self.update(self._get_records(identities, jobs=jobs))
+
+    def rebuild(self, jobs=None):
+        """Re-scan all the identities of the keystore, reading their certificates in parallel."""
+        records = self._get_records(list(find_identities(self.keystore_path)), jobs=jobs)
+        with self._connection:
+            self._connection.execute('DELETE FROM identities')
+            self._connection.executemany(
+                'INSERT INTO identities VALUES (?, ?, ?, ?, ?)', records)
+        self.exists = True
+        return len(records)
+
+    def query(self, prefix=None, expiring_before=None):
+        """
+        Get the records of the identities matching all the given filters, sorted by name.
+
+        `prefix` is a namespace, e.g. `/fleet/robot42`, and `expiring_before` an ISO 8601 date
+        or date and time, in UTC.
+        """
+        conditions = []
+        parameters = []
+        prefix = (prefix or '').rstrip('/')
+        if prefix:
+            # '0' is the character right after '/', this is a range scan of the primary key
+            conditions.append('(name = ? OR (name >= ? AND name < ?))')
+            parameters.extend([prefix, prefix + '/', prefix + '0'])
+        if expiring_before:
+            conditions.append('not_after < ?')
+            parameters.append(expiring_before)
+        statement = 'SELECT * FROM identities'
+        if conditions:
+            statement += ' WHERE ' + ' AND '.join(conditions)
+        statement += ' ORDER BY name'
+        return [
+            IdentityRecord(*row) for row in self._connection.execute(statement, parameters)]
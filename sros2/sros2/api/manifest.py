@@ -0,0 +1,146 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import sys
+import threading
+
+from sros2.api.atomic import atomic_write, is_fsync_enabled
+
+MANIFEST_FILENAME = 'manifest.json'
+JOURNAL_SUFFIX = '.journal'
+MANIFEST_VERSION = 1
+
+
+def hash_content(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_file(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        return hash_content(f.read())
+
+
+def get_keystore_inputs(keystore_path):
+    return {
+        'ca_cert': hash_file(os.path.join(keystore_path, 'ca.cert.pem')),
+        'governance': hash_file(os.path.join(keystore_path, 'governance.p7s')),
+    }
+
+
+def get_permissions_inputs(keystore_inputs, permissions_content):
+    inputs = dict(keystore_inputs)
+    inputs['permissions'] = hash_content(permissions_content)
+    return inputs
+
+
+def _write_journal_entry(journal, identity, inputs, batch=False):
+    entry = {'identity': identity, 'inputs': inputs}
+    if batch:
+        # only the entries of a batch left behind mean it was interrupted
+        entry['batch'] = True
+    journal.write(json.dumps(entry, sort_keys=True) + '\n')
+    journal.flush()
+    if is_fsync_enabled():
+        os.fsync(journal.fileno())
+
+
+def journal_update(keystore_path, identity, permissions_content):
+    """
+    Record the inputs of a single identity without loading or rewriting the manifest.
+
+    The update is appended to the journal, which the next `KeystoreManifest` of the keystore
+    replays and folds into the manifest when saved; the cost does not depend on the number of
+    identities of the keystore.
+    """
+    inputs = get_permissions_inputs(get_keystore_inputs(keystore_path), permissions_content)
+    with open(os.path.join(keystore_path, MANIFEST_FILENAME) + JOURNAL_SUFFIX, 'a') as f:
+        _write_journal_entry(f, identity, inputs)
+
+
+class KeystoreManifest:
+    """
+    Content hashes of the inputs the artifacts of each identity were generated from.
+
+    An identity whose permissions document, governance and CA certificate hash the same as
+    the last time its permissions were signed does not need to be regenerated.
+    The manifest can be shared by several threads, it is only written to disk by `save`.
+    With `journal`, each update is also appended to a journal file right away, so that a batch
+    interrupted before the manifest is saved can be resumed: the updates of a journal left
+    behind are replayed when the manifest is loaded. Journaling stops once saved.
+    """
+
+    def __init__(self, keystore_path, journal=False):
+        self.path = os.path.join(keystore_path, MANIFEST_FILENAME)
+        self.journal_path = self.path + JOURNAL_SUFFIX
+        self._lock = threading.Lock()
+        self._identities = {}
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                self._identities = manifest['identities']
+        self.resumed_count = self._replay_journal()
+        self._journal = open(self.journal_path, 'a') if journal else None
+        self._keystore_inputs = get_keystore_inputs(keystore_path)
+
+    def get_permissions_inputs(self, permissions_content):
+        return get_permissions_inputs(self._keystore_inputs, permissions_content)
+
+    def is_up_to_date(self, identity, inputs):
+        with self._lock:
+            return self._identities.get(identity) == inputs
+
+    def _replay_journal(self):
+        if not os.path.isfile(self.journal_path):
+            return 0
+        count = 0
+        batch_count = 0
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last entry may have been cut short
+                    break
+                self._identities[entry['identity']] = entry['inputs']
+                count += 1
+                batch_count += bool(entry.get('batch'))
+        if batch_count:
+            print('resuming from %s: %d identities already provisioned' % (
+                self.journal_path, batch_count), file=sys.stderr)
+        return count
+
+    def update(self, identity, inputs):
+        with self._lock:
+            self._identities[identity] = inputs
+            if self._journal is not None:
+                _write_journal_entry(self._journal, identity, inputs, batch=True)
+
+    def save(self):
+        """Write the manifest, then discard the journal whose updates it now contains."""
+        with self._lock:
+            content = json.dumps(
+                {'version': MANIFEST_VERSION, 'identities': self._identities},
+                indent=2, sort_keys=True)
+            atomic_write(self.path, content)
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if os.path.isfile(self.journal_path):
+                os.remove(self.journal_path)
@@ -0,0 +1,175 @@
+# Copyright 2016-2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+import itertools
+import os
+import platform
+import shlex
+import subprocess
+import threading
+import warnings
+
+OpenSSLToolchain = namedtuple('OpenSSLToolchain', ('executable', 'version'))
+
+MAX_PROCESSES_ENV = 'SROS2_MAX_PROCESSES'
+
+_toolchain = None
+_toolchain_lock = threading.Lock()
+_process_slots = None
+_process_slots_lock = threading.Lock()
+
+
+class CommandError(RuntimeError):
+    """A command could not be run, or exited with a non-zero status."""
+
+    def __init__(self, argv, returncode, stderr, cwd=None):
+        self.argv = list(argv)
+        self.returncode = returncode
+        self.stderr = stderr
+        self.cwd = cwd
+        command = ' '.join(shlex.quote(str(arg)) for arg in self.argv)
+        if returncode is None:
+            message = 'unable to run command: %s' % command
+        else:
+            message = 'command exited with status %d: %s' % (returncode, command)
+        if cwd is not None:
+            message += ' (in %s)' % cwd
+        if stderr.strip():
+            message += '\n' + stderr.strip()
+        super().__init__(message)
+
+
+def find_openssl_executable():
+    if platform.system() != 'Darwin':
+        return 'openssl'
+
+    brew_openssl_prefix_result = subprocess.run(
+        ['brew', '--prefix', 'openssl'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if brew_openssl_prefix_result.returncode:
+        raise RuntimeError('unable to find openssl from brew')
+    basepath = brew_openssl_prefix_result.stdout.decode().rstrip()
+    return os.path.join(basepath, 'bin', 'openssl')
+
+
+def check_openssl_version(openssl_executable):
+    openssl_version_string_result = subprocess.run(
+        [openssl_executable, 'version'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if openssl_version_string_result.returncode:
+        raise RuntimeError('unable to invoke command: "%s"' % openssl_executable)
+    version = openssl_version_string_result.stdout.decode().rstrip()
+    openssl_version_string_list = version.split(' ')
+    if openssl_version_string_list[0].lower() != 'openssl':
+        raise RuntimeError(
+            "expected version of the format 'OpenSSL "
+            "<MAJOR>.<MINOR>.<PATCH_number><PATCH_letter>  <DATE>'")
+    (major, minor, patch) = openssl_version_string_list[1].split('.')
+    major = int(major)
+    minor = int(minor)
+    if major < 1:
+        raise RuntimeError('need openssl 1.0.2 minimum')
+    if major == 1 and minor < 0:
+        raise RuntimeError('need openssl 1.0.2 minimum')
+    if major == 1 and minor == 0 and int(''.join(itertools.takewhile(str.isdigit, patch))) < 2:
+        raise RuntimeError('need openssl 1.0.2 minimum')
+    return (major, minor, patch)
+
+
+def get_openssl_toolchain():
+    """
+    Get the openssl executable and its version.
+
+    Locating and probing the executable is done once per process, the result is shared by
+    every subsequent openssl invocation.
+    """
+    global _toolchain
+    with _toolchain_lock:
+        if _toolchain is None:
+            openssl_executable = find_openssl_executable()
+            version = check_openssl_version(openssl_executable)
+            _toolchain = OpenSSLToolchain(executable=openssl_executable, version=version)
+        return _toolchain
+
+
+def clear_openssl_toolchain_cache():
+    global _toolchain
+    with _toolchain_lock:
+        _toolchain = None
+
+
+def get_max_processes():
+    """Get how many subprocesses may run at once, `SROS2_MAX_PROCESSES` or the CPU count."""
+    max_processes = os.getenv(MAX_PROCESSES_ENV)
+    if max_processes:
+        try:
+            max_processes = int(max_processes)
+        except ValueError:
+            max_processes = 0
+        if max_processes < 1:
+            raise RuntimeError('%s must be a positive number, got: %s' % (
+                MAX_PROCESSES_ENV, os.getenv(MAX_PROCESSES_ENV)))
+        return max_processes
+    return os.cpu_count() or 1
+
+
+def _get_process_slots():
+    global _process_slots
+    with _process_slots_lock:
+        if _process_slots is None:
+            _process_slots = threading.BoundedSemaphore(get_max_processes())
+        return _process_slots
+
+
+def run_command(argv, cwd=None):
+    """
+    Run a command without a shell, returns its standard output.
+
+    Arguments are passed as they are, so paths may contain spaces or any other character.
+    However many threads run commands, at most `get_max_processes` subprocesses run at
+    once; bulk operations are thus bounded by the pool of threads they run in and by the
+    CPU count. Raises `CommandError`, with the standard error of the command, on failure.
+    """
+    argv = [str(arg) for arg in argv]
+    with _get_process_slots():
+        try:
+            result = subprocess.run(
+                argv, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE)
+        except OSError as e:
+            raise CommandError(argv, None, str(e), cwd)
+    if result.returncode:
+        raise CommandError(
+            argv, result.returncode, result.stderr.decode(errors='replace'), cwd)
+    return result.stdout
+
+
+def run_openssl_command(args, cwd=None):
+    """Run the openssl executable, see `run_command`."""
+    return run_command([get_openssl_toolchain().executable] + list(args), cwd)
+
+
+def run_shell_command(cmd, in_path=None):
+    """Run a shell command line, deprecated in favor of `run_command`."""
+    warnings.warn(
+        'run_shell_command is deprecated, use run_command with a list of arguments instead',
+        DeprecationWarning, stacklevel=2)
+    print('running command in path [%s]: %s' % (in_path, cmd))
+    result = subprocess.run(cmd, shell=True, cwd=in_path, stderr=subprocess.PIPE)
+    if result.returncode:
+        raise CommandError(
+            [cmd], result.returncode, result.stderr.decode(errors='replace'), in_path)
@@ -0,0 +1,178 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+import sys
+import threading
+
+from sros2.api.atomic import AtomicWriteBatch
+from sros2.api.keystore_index import find_identities
+from sros2.api.manifest import hash_file
+
+LINK_MODE_ENV = 'SROS2_LINK_MODE'
+LINK_MODES = ('copy', 'hardlink', 'symlink')
+DEFAULT_LINK_MODE = 'copy'
+
+# files of each identity directory and the keystore file each of them is a copy of
+SHARED_ARTIFACTS = (
+    ('identity_ca.cert.pem', 'ca.cert.pem'),
+    ('permissions_ca.cert.pem', 'ca.cert.pem'),
+    ('governance.p7s', 'governance.p7s'),
+)
+# shared files only installed once the keystore has them
+OPTIONAL_SHARED_ARTIFACTS = (
+    ('crl.pem', 'crl.pem'),
+)
+
+StaleArtifact = namedtuple('StaleArtifact', ('identity', 'filename', 'reason'))
+
+_fallback_reported = threading.Event()
+
+
+def get_link_mode(link_mode=None):
+    if link_mode is None:
+        link_mode = os.getenv(LINK_MODE_ENV, DEFAULT_LINK_MODE)
+    if link_mode not in LINK_MODES:
+        raise RuntimeError("invalid link mode '%s', expected one of: %s" % (
+            link_mode, ', '.join(LINK_MODES)))
+    return link_mode
+
+
+def get_shared_artifacts(keystore_path):
+    return SHARED_ARTIFACTS + tuple(
+        (filename, source_filename) for filename, source_filename in OPTIONAL_SHARED_ARTIFACTS
+        if os.path.isfile(os.path.join(keystore_path, source_filename)))
+
+
+def install_shared_artifact(source_path, path, link_mode, batch=None):
+    """
+    Replace a file with a copy of, or a link to, a keystore file.
+
+    Links that cannot be created, e.g. on filesystems without link support or across devices,
+    fall back to copies. The file is replaced as part of `batch` if given, see
+    `AtomicWriteBatch`, right away otherwise.
+    """
+    if batch is None:
+        with AtomicWriteBatch() as batch:
+            install_shared_artifact(source_path, path, link_mode, batch)
+        return
+    tmp_path = batch.tmp_path(path)
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        if link_mode == 'symlink':
+            # relative, so that the keystore can be moved around
+            os.symlink(os.path.relpath(source_path, os.path.dirname(path)), tmp_path)
+        elif link_mode == 'hardlink':
+            os.link(source_path, tmp_path)
+    except (OSError, NotImplementedError) as e:
+        if not _fallback_reported.is_set():
+            _fallback_reported.set()
+            print('unable to %s shared keystore files, copying them instead: %s' % (
+                link_mode, e), file=sys.stderr)
+        link_mode = 'copy'
+    if link_mode == 'copy':
+        shutil.copyfile(source_path, tmp_path)
+
+
+def install_shared_artifacts(keystore_path, key_dir, link_mode=None, batch=None):
+    link_mode = get_link_mode(link_mode)
+    if batch is None:
+        with AtomicWriteBatch() as batch:
+            install_shared_artifacts(keystore_path, key_dir, link_mode, batch)
+        return
+    for filename, source_filename in get_shared_artifacts(keystore_path):
+        install_shared_artifact(
+            os.path.join(keystore_path, source_filename), os.path.join(key_dir, filename),
+            link_mode, batch)
+
+
+def _check_shared_artifact(path, source_path, source_hash):
+    if os.path.islink(path) and not os.path.exists(path):
+        return 'dangling'
+    if not os.path.exists(path):
+        return 'missing'
+    if os.path.samefile(path, source_path):
+        return None
+    if hash_file(path) != source_hash:
+        return 'stale'
+    return None
+
+
+def get_shared_artifact_hashes(keystore_path):
+    """Get the shared files of identities with the keystore file and hash it should match."""
+    return {
+        filename: (source_filename, hash_file(os.path.join(keystore_path, source_filename)))
+        for filename, source_filename in get_shared_artifacts(keystore_path)
+    }
+
+
+def find_stale_identity_artifacts(keystore_path, identity, shared_artifact_hashes):
+    """
+    Find the files of an identity which differ from the keystore file they should be a copy of.
+
+    `shared_artifact_hashes` are as returned by `get_shared_artifact_hashes`.
+    Returns a list of `StaleArtifact`.
+    """
+    key_dir = os.path.join(keystore_path, identity.lstrip('/'))
+    stale_artifacts = []
+    for filename, (source_filename, source_hash) in shared_artifact_hashes.items():
+        reason = _check_shared_artifact(
+            os.path.join(key_dir, filename), os.path.join(keystore_path, source_filename),
+            source_hash)
+        if reason is not None:
+            stale_artifacts.append(StaleArtifact(identity, filename, reason))
+    return stale_artifacts
+
+
+def find_stale_shared_artifacts(keystore_path, jobs=None):
+    """
+    Find the identity files which differ from the keystore file they should be a copy of.
+
+    Links resolving to the keystore file are up to date by construction, regular copies are
+    compared by content. Returns a list of `StaleArtifact` sorted by identity.
+    """
+    shared_artifact_hashes = get_shared_artifact_hashes(keystore_path)
+
+    def check_identity(identity):
+        return find_stale_identity_artifacts(keystore_path, identity, shared_artifact_hashes)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(check_identity, find_identities(keystore_path))
+        return [stale_artifact for result in results for stale_artifact in result]
+
+
+def distribute_shared_artifact(keystore_path, filename, link_mode=None, jobs=None):
+    """
+    Install a keystore file, e.g. a new CRL, into all the identities of a keystore.
+
+    Identities whose file is a link resolving to the keystore file already are skipped.
+    Returns the number of files installed.
+    """
+    link_mode = get_link_mode(link_mode)
+    source_filename = dict(SHARED_ARTIFACTS + OPTIONAL_SHARED_ARTIFACTS)[filename]
+    source_path = os.path.join(keystore_path, source_filename)
+
+    def install(identity):
+        path = os.path.join(keystore_path, identity.lstrip('/'), filename)
+        if os.path.exists(path) and os.path.samefile(path, source_path):
+            return False
+        install_shared_artifact(source_path, path, link_mode)
+        return True
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return sum(executor.map(install, find_identities(keystore_path)))
@@ -0,0 +1,282 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import os
+
+try:
+    from cryptography import x509
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+except ImportError:
+    x509 = None
+
+from sros2.api import der
+from sros2.api.crypto import get_certificate_not_after
+from sros2.api.der import iter_elements
+from sros2.api.der import read_element
+from sros2.api.keystore_index import find_identities
+from sros2.api.shared_artifacts import find_stale_identity_artifacts
+from sros2.api.shared_artifacts import get_shared_artifact_hashes
+
+REPORT_VERSION = 1
+# identities verified by a worker at once
+CHUNK_SIZE = 256
+DEFAULT_EXPIRY_WINDOW_DAYS = 30
+
+IDENTITY_FILES = (
+    'cert.pem', 'key.pem', 'identity_ca.cert.pem', 'permissions_ca.cert.pem', 'governance.p7s',
+    'permissions.xml', 'permissions.p7s')
+
+# DER encoded object identifiers of the CMS structures sros2 signs
+_MESSAGE_DIGEST_OID = bytes.fromhex('2a864886f70d010904')
+_DIGEST_ALGORITHMS = {
+    bytes.fromhex('608648016503040201'): 'SHA256',
+    bytes.fromhex('608648016503040202'): 'SHA384',
+    bytes.fromhex('608648016503040203'): 'SHA512',
+}
+
+
+def _split_smime(signed_content):
+    # a detached S/MIME document: the signed MIME part, then the PKCS#7 signature
+    signed_content = signed_content.replace(b'\r\n', b'\n')
+    header, _, body = signed_content.partition(b'\n\n')
+    boundary = None
+    for parameter in header.replace(b'\n', b' ').split(b';'):
+        key, _, value = parameter.strip().partition(b'=')
+        if key.lower() == b'boundary':
+            boundary = value.strip(b'"')
+    if boundary is None:
+        raise ValueError('not a multipart/signed document')
+    delimiter = b'\n--' + boundary
+    parts = (b'\n' + body).split(delimiter)
+    if len(parts) < 4 or not parts[3].startswith(b'--'):
+        raise ValueError('malformed multipart/signed document')
+    signed_part = parts[1][1:]
+    _, _, signature = parts[2][1:].partition(b'\n\n')
+    return signed_part, base64.b64decode(b''.join(signature.split()))
+
+
+def _parse_signature(signature_der):
+    # ContentInfo > [0] SignedData > signerInfos > SignerInfo
+    _, start, end = read_element(signature_der, 0)
+    content = list(iter_elements(signature_der, start, end))[1]
+    _, start, end = read_element(signature_der, content[2])
+    signer_infos = list(iter_elements(signature_der, start, end))[-1]
+    signer_infos = list(iter_elements(signature_der, signer_infos[2], signer_infos[3]))
+    if len(signer_infos) != 1:
+        raise ValueError('expected a single signer')
+    signer_info = list(iter_elements(signature_der, signer_infos[0][2], signer_infos[0][3]))
+
+    # SignerInfo: version, sid, digestAlgorithm, [0] signedAttrs, signatureAlgorithm, signature
+    digest_algorithm = signer_info[2]
+    _, _, start, end = next(
+        iter_elements(signature_der, digest_algorithm[2], digest_algorithm[3]))
+    hash_algorithm = _DIGEST_ALGORITHMS.get(signature_der[start:end])
+    signed_attributes = signer_info[3]
+    signature = signer_info[5]
+    if (
+        hash_algorithm is None or signed_attributes[0] != der.CONTEXT_0 or
+        signature[0] != der.OCTET_STRING
+    ):
+        raise ValueError('unsupported signature')
+    return getattr(hashes, hash_algorithm)(), signed_attributes, signature
+
+
+def verify_smime(signed_content, ca_cert):
+    """
+    Verify a detached S/MIME document signed by a CA, as written by `openssl smime -sign`.
+
+    Returns the content of the signed MIME part, raises ValueError if the document is not
+    signed by the CA, was altered or is malformed.
+    """
+    signed_part, signature_der = _split_smime(signed_content)
+    try:
+        hash_algorithm, signed_attributes, signature = _parse_signature(signature_der)
+    except (IndexError, StopIteration):
+        raise ValueError('malformed signature')
+
+    message_digest = None
+    try:
+        attributes = iter_elements(signature_der, signed_attributes[2], signed_attributes[3])
+        for _, _, start, end in attributes:
+            attribute_type, attribute_values = list(iter_elements(signature_der, start, end))
+            if signature_der[attribute_type[2]:attribute_type[3]] == _MESSAGE_DIGEST_OID:
+                _, start, end = read_element(signature_der, attribute_values[2])
+                message_digest = signature_der[start:end]
+    except IndexError:
+        raise ValueError('malformed signed attributes')
+    digest = hashes.Hash(hash_algorithm)
+    digest.update(signed_part.replace(b'\n', b'\r\n'))
+    if message_digest != digest.finalize():
+        raise ValueError('content does not match its signature')
+
+    # the signature covers the signed attributes encoded as a SET rather than [0]
+    _, header_start, _, end = signed_attributes
+    encoded_attributes = bytes((der.SET,)) + signature_der[header_start + 1:end]
+    signature = signature_der[signature[2]:signature[3]]
+    try:
+        ca_cert.public_key().verify(signature, encoded_attributes, ec.ECDSA(hash_algorithm))
+    except InvalidSignature:
+        raise ValueError('not signed by the keystore CA')
+
+    # strip the MIME headers of the signed part
+    return signed_part.partition(b'\n\n')[2]
+
+
+def _verify_signed_file(signed_path, path, ca_cert):
+    with open(signed_path, 'rb') as f:
+        signed_content = f.read()
+    with open(path, 'rb') as f:
+        content = f.read()
+    try:
+        if verify_smime(signed_content, ca_cert) != content.replace(b'\r\n', b'\n'):
+            return 'signed content of %s differs from %s' % (
+                os.path.basename(signed_path), os.path.basename(path))
+    except ValueError as e:
+        return 'invalid %s: %s' % (os.path.basename(signed_path), e)
+    return None
+
+
+def _load_cert(path):
+    with open(path, 'rb') as f:
+        return x509.load_pem_x509_certificate(f.read())
+
+
+def _public_bytes(public_key):
+    return public_key.public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+
+
+def _check_expiry(cert, deadline):
+    not_after = get_certificate_not_after(cert)
+    if not_after < deadline:
+        return 'certificate expires on %s' % not_after.strftime('%Y-%m-%dT%H:%M:%SZ'), not_after
+    return None, not_after
+
+
+def verify_identity(keystore_path, identity, ca_cert, deadline, shared_artifact_hashes):
+    """
+    Check the artifacts of an identity, returns its report entry.
+
+    The copies of the keystore CA certificate, governance and CRL of the identity must match
+    the keystore files, see `get_shared_artifact_hashes`, and its governance must be signed by
+    the keystore CA as well.
+    """
+    key_dir = os.path.join(keystore_path, identity.lstrip('/'))
+    errors = []
+    entry = {'identity': identity, 'not_after': None, 'errors': errors}
+    missing = [name for name in IDENTITY_FILES if not os.path.isfile(os.path.join(key_dir, name))]
+    if missing:
+        errors.append('missing %s' % ', '.join(missing))
+        return entry
+
+    try:
+        cert = _load_cert(os.path.join(key_dir, 'cert.pem'))
+    except ValueError as e:
+        errors.append('invalid cert.pem: %s' % e)
+        return entry
+    try:
+        cert.verify_directly_issued_by(ca_cert)
+    except (ValueError, TypeError, InvalidSignature):
+        errors.append('certificate is not issued by the keystore CA')
+    error, not_after = _check_expiry(cert, deadline)
+    entry['not_after'] = not_after.strftime('%Y-%m-%dT%H:%M:%SZ')
+    if error:
+        errors.append(error)
+
+    try:
+        with open(os.path.join(key_dir, 'key.pem'), 'rb') as f:
+            key = serialization.load_pem_private_key(f.read(), password=None)
+        if _public_bytes(key.public_key()) != _public_bytes(cert.public_key()):
+            errors.append('private key does not match the certificate')
+    except (ValueError, TypeError) as e:
+        errors.append('invalid key.pem: %s' % e)
+
+    error = _verify_signed_file(
+        os.path.join(key_dir, 'permissions.p7s'), os.path.join(key_dir, 'permissions.xml'),
+        ca_cert)
+    if error:
+        errors.append(error)
+
+    error = _verify_signed_file(
+        os.path.join(key_dir, 'governance.p7s'), os.path.join(keystore_path, 'governance.xml'),
+        ca_cert)
+    if error:
+        errors.append(error)
+    for _, filename, reason in find_stale_identity_artifacts(
+            keystore_path, identity, shared_artifact_hashes):
+        errors.append('%s is %s' % (filename, reason))
+    return entry
+
+
+def _verify_identities(keystore_path, identities, deadline):
+    ca_cert = _load_cert(os.path.join(keystore_path, 'ca.cert.pem'))
+    shared_artifact_hashes = get_shared_artifact_hashes(keystore_path)
+    return [
+        verify_identity(keystore_path, identity, ca_cert, deadline, shared_artifact_hashes)
+        for identity in identities]
+
+
+def verify_keystore(keystore_path, expiry_window_days=DEFAULT_EXPIRY_WINDOW_DAYS, jobs=None):
+    """
+    Check the CA, governance and the artifacts of all the identities of a keystore.
+
+    Identities are checked in chunks by a pool of `jobs` worker processes, verification being
+    CPU bound, or in this process if `jobs` is 1. Certificates expiring within
+    `expiry_window_days` are reported as errors. Returns the report as a dictionary.
+    """
+    if x509 is None:
+        raise RuntimeError('verifying a keystore requires the cryptography python package')
+    now = datetime.datetime.now(datetime.timezone.utc)
+    deadline = now + datetime.timedelta(days=expiry_window_days)
+
+    ca_cert = _load_cert(os.path.join(keystore_path, 'ca.cert.pem'))
+    keystore_errors = []
+    error, ca_not_after = _check_expiry(ca_cert, deadline)
+    if error:
+        keystore_errors.append('CA ' + error)
+    error = _verify_signed_file(
+        os.path.join(keystore_path, 'governance.p7s'),
+        os.path.join(keystore_path, 'governance.xml'), ca_cert)
+    if error:
+        keystore_errors.append(error)
+
+    identities = list(find_identities(keystore_path))
+    chunks = [
+        identities[start:start + CHUNK_SIZE] for start in range(0, len(identities), CHUNK_SIZE)]
+    if jobs == 1 or len(chunks) <= 1:
+        results = [_verify_identities(keystore_path, chunk, deadline) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(
+                _verify_identities, [keystore_path] * len(chunks), chunks,
+                [deadline] * len(chunks)))
+    identities = [entry for result in results for entry in result]
+
+    return {
+        'version': REPORT_VERSION,
+        'keystore': os.path.abspath(keystore_path),
+        'date': now.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'expiry_window_days': expiry_window_days,
+        'ca_not_after': ca_not_after.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'errors': keystore_errors,
+        'identity_count': len(identities),
+        'failed_identity_count': sum(1 for entry in identities if entry['errors']),
+        'identities': identities,
+    }
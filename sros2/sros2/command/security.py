@@ -12,16 +12,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from contextlib import ExitStack
+
 from ros2cli.command import add_subparsers
 from ros2cli.command import CommandExtension
 from ros2cli.verb import get_verb_extensions
 
+from sros2.api.instrumentation import JsonEventWriter
+from sros2.api.instrumentation import listening
+from sros2.api.instrumentation import StageStatistics
+
 
 class SecurityCommand(CommandExtension):
     """Various security related sub-commands."""
 
     def add_arguments(self, parser, cli_name):
         self._subparser = parser
+        parser.add_argument(
+            '--profile', action='store_true',
+            help='print the count, total and p50/p99 durations of each provisioning stage')
+        parser.add_argument(
+            '--profile-events', metavar='PATH',
+            help='write the timing of every provisioning stage to a file as JSON lines')
         # get verb extensions and let them add their arguments
         verb_extensions = get_verb_extensions('sros2.verb')
         add_subparsers(parser, cli_name, '_verb', verb_extensions, required=False)
@@ -33,5 +45,17 @@ class SecurityCommand(CommandExtension):
             return 0
         extension = getattr(args, '_verb')
 
-        # call the verb's main method
-        return extension.main(args=args)
+        with ExitStack() as stack:
+            statistics = None
+            if args.profile:
+                statistics = stack.enter_context(listening(StageStatistics()))
+            if args.profile_events:
+                events_file = stack.enter_context(open(args.profile_events, 'w'))
+                stack.enter_context(listening(JsonEventWriter(events_file)))
+
+            # call the verb's main method
+            ret = extension.main(args=args)
+
+        if statistics is not None:
+            statistics.print_summary()
+        return ret
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import os
+import threading
 
 from lxml import etree
 
@@ -20,6 +22,20 @@ import pkg_resources
 
 POLICY_VERSION = '0.1.0'
 
+XINCLUDE_NAMESPACES = (
+    'http://www.w3.org/2001/XInclude',
+    'http://www.w3.org/2003/XInclude',
+)
+XML_BASE_ATTRIBUTE = '{http://www.w3.org/XML/1998/namespace}base'
+# inclusions of the profiles of another policy file, these can be streamed recursively
+STREAMABLE_XPOINTERS = (
+    'xpointer(/policy/profiles/*)',
+    'xpointer(/policy/profiles/profile)',
+)
+
+_compiled_artifacts = {}
+_compiled_artifacts_lock = threading.Lock()
+
 
 def get_policy_default(name):
     return pkg_resources.resource_filename(
@@ -57,27 +73,133 @@ def get_transport_template(transport, name):
         resource_name=os.path.join('policy', 'templates', transport, name))
 
 
+def _get_compiled_artifact(compile_artifact, get_artifact_path, name, transport):
+    key = (compile_artifact, transport, name)
+    with _compiled_artifacts_lock:
+        artifact = _compiled_artifacts.get(key)
+        if artifact is None:
+            artifact = compile_artifact(etree.parse(get_artifact_path()))
+            _compiled_artifacts[key] = artifact
+    return artifact
+
+
+def get_compiled_schema(name, transport=None):
+    """
+    Get a compiled XML schema of the policy, or of the given transport.
+
+    Schemas are compiled on first use and cached for the lifetime of the process.
+    Compiled artifacts are never modified after creation and can be shared across threads.
+    """
+    return _get_compiled_artifact(
+        etree.XMLSchema,
+        lambda: (
+            get_policy_schema(name) if transport is None
+            else get_transport_schema(transport, name)),
+        name, transport)
+
+
+def get_compiled_template(name, transport=None):
+    """
+    Get a compiled XSL transform of the policy, or of the given transport.
+
+    Templates are cached the same way as schemas, see `get_compiled_schema`.
+    """
+    return _get_compiled_artifact(
+        etree.XSLT,
+        lambda: (
+            get_policy_template(name) if transport is None
+            else get_transport_template(transport, name)),
+        name, transport)
+
+
+def clear_compiled_artifacts():
+    with _compiled_artifacts_lock:
+        _compiled_artifacts.clear()
+
+
 def load_policy(policy_file_path):
     if not os.path.isfile(policy_file_path):
         raise FileNotFoundError("policy file '%s' does not exist" % policy_file_path)
     policy = etree.parse(policy_file_path)
     policy.xinclude()
     try:
-        policy_xsd_path = get_policy_schema('policy.xsd')
-        policy_xsd = etree.XMLSchema(etree.parse(policy_xsd_path))
+        policy_xsd = get_compiled_schema('policy.xsd')
         policy_xsd.assertValid(policy)
     except etree.DocumentInvalid as e:
         raise RuntimeError(str(e))
     return policy
 
 
+def iter_policy(policy_file_path):
+    """
+    Stream the profiles of a policy file.
+
+    Yields one policy element per profile, each holding a single profile with its XIncludes
+    resolved and validated against the policy schema. Profiles included from other policy
+    files are streamed the same way. Elements are discarded once yielded, so memory use does
+    not depend on the size of the policy.
+    """
+    if not os.path.isfile(policy_file_path):
+        raise FileNotFoundError("policy file '%s' does not exist" % policy_file_path)
+    policy_file_path = os.path.abspath(policy_file_path)
+    version = None
+    depth = 0
+    for event, element in etree.iterparse(policy_file_path, events=('start', 'end')):
+        if event == 'start':
+            if depth == 0:
+                if element.tag != 'policy':
+                    raise RuntimeError(
+                        "expected a 'policy' root element in '%s'" % policy_file_path)
+                version = element.get('version')
+            depth += 1
+            continue
+        depth -= 1
+        # only the children of the policy/profiles element are of interest
+        if depth != 2:
+            continue
+        if element.tag == 'profile':
+            yield _resolve_profiles(version, policy_file_path, element)
+        elif etree.QName(element).namespace in XINCLUDE_NAMESPACES:
+            href = element.get('href')
+            if href and element.get('xpointer') in STREAMABLE_XPOINTERS:
+                yield from iter_policy(
+                    os.path.join(os.path.dirname(policy_file_path), href))
+            else:
+                policy = _resolve_profiles(version, policy_file_path, element)
+                for profile in list(policy.find('profiles')):
+                    yield _wrap_profiles(version, [profile])
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+def _wrap_profiles(version, profiles):
+    policy = etree.Element('policy')
+    # left out if missing, for the schema to reject the policy as `load_policy` does
+    if version is not None:
+        policy.attrib['version'] = version
+    profiles_element = etree.SubElement(policy, 'profiles')
+    profiles_element.extend(profiles)
+    return policy
+
+
+def _resolve_profiles(version, policy_file_path, element):
+    policy = _wrap_profiles(version, [copy.deepcopy(element)])
+    policy.base = policy_file_path
+    etree.ElementTree(policy).xinclude()
+    del policy.attrib[XML_BASE_ATTRIBUTE]
+    try:
+        get_compiled_schema('policy.xsd').assertValid(policy)
+    except etree.DocumentInvalid as e:
+        raise RuntimeError(str(e))
+    return policy
+
+
 def dump_policy(policy, stream):
-    policy_xsl_path = get_policy_template('policy.xsl')
-    policy_xsl = etree.XSLT(etree.parse(policy_xsl_path))
+    policy_xsl = get_compiled_template('policy.xsl')
     policy = policy_xsl(policy)
     try:
-        policy_xsd_path = get_policy_schema('policy.xsd')
-        policy_xsd = etree.XMLSchema(etree.parse(policy_xsd_path))
+        policy_xsd = get_compiled_schema('policy.xsd')
         policy_xsd.assertValid(policy)
     except etree.DocumentInvalid as e:
         raise RuntimeError(str(e))
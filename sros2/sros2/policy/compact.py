@@ -0,0 +1,124 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compaction of the expressions of a policy into fnmatch bracket expressions.
+
+Expressions differing in a single character, e.g. `~get_parameters` and `~set_parameters`,
+are merged into one expression matching exactly the same names, `~[gs]et_parameters`.
+Unlike `*` and `?`, a bracket expression only matches the characters it lists, so the names
+a compacted policy grants are exactly the names the original policy grants.
+"""
+
+import string
+
+from lxml import etree
+
+# the characters bracket expressions are made of; name separators and the characters the
+# permissions transform interprets, e.g. a leading `/` or `~`, are never merged
+MERGEABLE_CHARACTERS = frozenset(string.ascii_letters + string.digits + '_')
+WILDCARD_CHARACTERS = frozenset('*?[]\\')
+# separates the characters of each position of an expression being compacted
+_SEPARATOR = '\x00'
+
+
+def _format_characters(characters):
+    if len(characters) == 1:
+        return characters
+    # runs of three or more consecutive characters are written as ranges, e.g. `0-9`
+    runs = []
+    for character in characters:
+        if runs and ord(character) == ord(runs[-1][-1]) + 1:
+            runs[-1] += character
+        else:
+            runs.append(character)
+    return '[%s]' % ''.join(
+        run[0] + '-' + run[-1] if len(run) > 2 else run for run in runs)
+
+
+def _merge_position(patterns, position):
+    # patterns equal but at `position` are merged, the characters at position being joined
+    merged = {}
+    for pattern in patterns:
+        characters = pattern[position] if position < len(pattern) else None
+        if characters is None or not MERGEABLE_CHARACTERS.issuperset(characters):
+            merged.setdefault(_SEPARATOR.join(pattern), (pattern, None))
+            continue
+        key = (
+            len(pattern), _SEPARATOR.join(pattern[:position]),
+            _SEPARATOR.join(pattern[position + 1:]))
+        entry = merged.get(key)
+        if entry is None:
+            merged[key] = (pattern, set(characters))
+        else:
+            entry[1].update(characters)
+    result = []
+    for pattern, characters in merged.values():
+        if characters is not None and len(characters) > len(pattern[position]):
+            pattern = (
+                pattern[:position] + (''.join(sorted(characters)),) + pattern[position + 1:])
+        result.append(pattern)
+    return result
+
+
+def compact_expressions(expressions):
+    """
+    Merge expressions into as few fnmatch expressions as possible, matching the same names.
+
+    Expressions already containing wildcards are kept as they are. Returns a sorted list.
+    """
+    kept = set()
+    patterns = set()
+    for expression in expressions:
+        if WILDCARD_CHARACTERS.isdisjoint(expression):
+            patterns.add(tuple(expression))
+        else:
+            kept.add(expression)
+    patterns = list(patterns)
+    # merging at one position may make patterns equal at another, repeat until stable
+    while True:
+        count = len(patterns)
+        for position in range(max((len(p) for p in patterns), default=0)):
+            patterns = _merge_position(patterns, position)
+        if len(patterns) == count:
+            break
+    kept.update(''.join(_format_characters(c) for c in pattern) for pattern in patterns)
+    return sorted(kept)
+
+
+def compact_policy_expressions(policy):
+    """
+    Compact the expressions of every permission group of a policy tree, in place.
+
+    Returns the numbers of expressions before and after compaction.
+    """
+    root = policy.getroot() if isinstance(policy, etree._ElementTree) else policy
+    before_count = 0
+    after_count = 0
+    for permissions in root.iterfind('profiles/profile/*'):
+        permission_type = permissions.tag[:-1]
+        elements = list(permissions.iterchildren(permission_type))
+        # empty expressions grant nothing, they are dropped
+        original_expressions = [(element.text or '').strip() for element in elements]
+        original_expressions = [expression for expression in original_expressions if expression]
+        before_count += len(original_expressions)
+        expressions = compact_expressions(original_expressions)
+        after_count += len(expressions)
+        if len(expressions) == len(elements):
+            continue
+        for element in elements:
+            permissions.remove(element)
+        for expression in expressions:
+            etree.SubElement(permissions, permission_type).text = expression
+    return before_count, after_count
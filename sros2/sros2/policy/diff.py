@@ -0,0 +1,120 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+
+from lxml import etree
+
+from sros2.policy.model import PolicyModel
+from sros2.policy.model import RULE_TYPES
+
+# a rule of a profile, e.g. `('topic', 'publish', 'ALLOW', 'chatter')`; the `domains` of a
+# profile are a rule of their own, e.g. `('domains', None, None, '5,7')`
+Rule = namedtuple('Rule', ('permission_type', 'rule_type', 'rule_qualifier', 'expression'))
+DOMAINS_PERMISSION_TYPE = 'domains'
+# rules by `(ns, node)` profile key, profiles only in one of the policies are listed separately
+PolicyDiff = namedtuple(
+    'PolicyDiff', ('added_profiles', 'removed_profiles', 'added_rules', 'removed_rules'))
+
+
+def _get_root(policy):
+    if isinstance(policy, PolicyModel):
+        policy = policy.policy
+    return policy.getroot() if isinstance(policy, etree._ElementTree) else policy
+
+
+def get_policy_rules(policy):
+    """
+    Normalize a policy into a set of `Rule` per profile, keyed by `(ns, node)`.
+
+    Permission groups granting several rule types, e.g. `<topics publish="ALLOW"
+    subscribe="ALLOW">`, yield one rule per type, and duplicate profiles, permission groups
+    and expressions are folded together, so equivalent policies have equal rule sets.
+    The `domains` attribute of a profile, if set, is a rule as well, so that profiles granted
+    on other domains differ. `policy` is a policy tree or a `PolicyModel`.
+    """
+    rules = {}
+    for profile in _get_root(policy).iterfind('profiles/profile'):
+        profile_rules = rules.setdefault((profile.get('ns'), profile.get('node')), set())
+        domains = profile.get('domains')
+        if domains is not None:
+            profile_rules.add(
+                Rule(DOMAINS_PERMISSION_TYPE, None, None, ''.join(domains.split())))
+        for permissions in profile.iterchildren(tag=etree.Element):
+            permission_type = permissions.tag[:-1]
+            qualifiers = [
+                (rule_type, permissions.get(rule_type))
+                for rule_type in RULE_TYPES.get(permission_type, ())
+                if permissions.get(rule_type) is not None]
+            for element in permissions.iterchildren(permission_type):
+                # empty expressions grant nothing
+                expression = (element.text or '').strip()
+                if not expression:
+                    continue
+                for rule_type, rule_qualifier in qualifiers:
+                    profile_rules.add(
+                        Rule(permission_type, rule_type, rule_qualifier, expression))
+    return rules
+
+
+def diff_policies(old_policy, new_policy):
+    """
+    Compare two policies, returns a `PolicyDiff` from `old_policy` to `new_policy`.
+
+    Rules are compared as hashed sets, so the cost is linear in the number of rules.
+    Profiles present in only one of the policies have all their rules listed as added or
+    removed; profiles whose rules are unchanged are left out.
+    """
+    old_rules = get_policy_rules(old_policy)
+    new_rules = get_policy_rules(new_policy)
+    added_rules = {}
+    removed_rules = {}
+    for key, rules in new_rules.items():
+        added = rules - old_rules.get(key, set())
+        if added:
+            added_rules[key] = added
+    for key, rules in old_rules.items():
+        removed = rules - new_rules.get(key, set())
+        if removed:
+            removed_rules[key] = removed
+    return PolicyDiff(
+        added_profiles=[key for key in new_rules if key not in old_rules],
+        removed_profiles=[key for key in old_rules if key not in new_rules],
+        added_rules=added_rules,
+        removed_rules=removed_rules)
+
+
+def merge_policies(policies):
+    """
+    Merge policies into a new `PolicyModel`, without duplicate profiles or expressions.
+
+    The merged policy grants the union of the rules of `policies`, see `get_policy_rules`.
+    Profiles keep the `domains` they are given, policies giving a profile different domains
+    cannot be merged.
+    """
+    merged = PolicyModel()
+    for policy in policies:
+        for (ns, node), rules in get_policy_rules(policy).items():
+            profile = merged.add_profile(ns, node)
+            for rule in rules:
+                if rule.permission_type != DOMAINS_PERMISSION_TYPE:
+                    merged.add_expression(ns, node, *rule)
+                    continue
+                domains = profile.get('domains')
+                if domains is not None and domains != rule.expression:
+                    raise RuntimeError(
+                        "conflicting domains '%s' and '%s' of profile '%s' in '%s'" % (
+                            domains, rule.expression, node, ns))
+                profile.attrib['domains'] = rule.expression
+    return merged
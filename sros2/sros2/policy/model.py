@@ -0,0 +1,141 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from lxml import etree
+
+from sros2.policy import POLICY_VERSION
+
+RULE_TYPES = {
+    'topic': ('publish', 'subscribe'),
+    'service': ('reply', 'request'),
+    'action': ('call', 'execute'),
+}
+
+
+class PolicyModel:
+    """
+    Indexed view of a policy document.
+
+    Profiles are indexed by `(ns, node)` and the permission groups of each profile, e.g.
+    `<topics publish="ALLOW">`, by `(ns, node, permission_type, rule_type, rule_qualifier)`.
+    Lookups are constant time; edits made through the model keep the indexes in sync with the
+    underlying tree. As with XPath lookups, the first matching element wins on duplicates.
+    """
+
+    def __init__(self, policy=None):
+        if policy is None:
+            policy = etree.Element('policy')
+            policy.attrib['version'] = POLICY_VERSION
+            etree.SubElement(policy, 'profiles')
+        self.policy = policy
+        root = policy.getroot() if isinstance(policy, etree._ElementTree) else policy
+        self._profiles_element = root.find('profiles')
+        self._profiles = {}
+        self._permissions = {}
+        # expressions of the permission groups expressions were added to, by group element
+        self._expressions = {}
+        for profile in self._profiles_element.iterchildren('profile'):
+            self._index_profile(profile)
+
+    def _index_profile(self, profile):
+        key = (profile.get('ns'), profile.get('node'))
+        if key in self._profiles:
+            return
+        self._profiles[key] = profile
+        profile_permissions = self._permissions[key] = {}
+        for permissions in profile.iterchildren(tag=etree.Element):
+            permission_type = permissions.tag[:-1]
+            for rule_type in RULE_TYPES.get(permission_type, ()):
+                rule_qualifier = permissions.get(rule_type)
+                if rule_qualifier is not None:
+                    profile_permissions.setdefault(
+                        (permission_type, rule_type, rule_qualifier), permissions)
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def __contains__(self, key):
+        return key in self._profiles
+
+    def profiles(self):
+        """Iterate over `((ns, node), profile)` pairs in document order."""
+        for profile in self._profiles_element.iterchildren('profile'):
+            key = (profile.get('ns'), profile.get('node'))
+            if self._profiles.get(key) is profile:
+                yield key, profile
+
+    def get_profile(self, ns, node):
+        return self._profiles.get((ns, node))
+
+    def add_profile(self, ns, node):
+        """Get the profile of a node, creating it if it does not exist yet."""
+        profile = self._profiles.get((ns, node))
+        if profile is None:
+            profile = etree.SubElement(self._profiles_element, 'profile')
+            profile.attrib['ns'] = ns
+            profile.attrib['node'] = node
+            self._profiles[(ns, node)] = profile
+            self._permissions[(ns, node)] = {}
+        return profile
+
+    def remove_profile(self, ns, node):
+        profile = self._profiles.pop((ns, node), None)
+        if profile is None:
+            return None
+        self._profiles_element.remove(profile)
+        for permissions in self._permissions.pop((ns, node)).values():
+            self._expressions.pop(permissions, None)
+        # a duplicate of the removed profile, if any, becomes the indexed one
+        for duplicate in self._profiles_element.iterchildren('profile'):
+            if (duplicate.get('ns'), duplicate.get('node')) == (ns, node):
+                self._index_profile(duplicate)
+                break
+        return profile
+
+    def get_permissions(
+            self, ns, node, permission_type, rule_type, rule_qualifier, create=False):
+        """
+        Get the permission group of a profile for the given rule.
+
+        If `create` is set, missing profiles and permission groups are added to the policy.
+        """
+        key = (permission_type, rule_type, rule_qualifier)
+        permissions = self._permissions.get((ns, node), {}).get(key)
+        if permissions is None and create:
+            profile = self.add_profile(ns, node)
+            permissions = etree.SubElement(profile, permission_type + 's')
+            permissions.attrib[rule_type] = rule_qualifier
+            self._permissions[(ns, node)][key] = permissions
+        return permissions
+
+    def add_expression(
+            self, ns, node, permission_type, rule_type, rule_qualifier, expression):
+        """
+        Add an expression, e.g. a topic name, to the permission group of a profile.
+
+        The profile and the permission group are created if needed. Expressions the group has
+        already are not added again, which takes constant time.
+        Returns whether the expression was added.
+        """
+        permissions = self.get_permissions(
+            ns, node, permission_type, rule_type, rule_qualifier, create=True)
+        expressions = self._expressions.get(permissions)
+        if expressions is None:
+            expressions = self._expressions[permissions] = {
+                element.text for element in permissions.iterchildren(permission_type)}
+        if expression in expressions:
+            return False
+        expressions.add(expression)
+        etree.SubElement(permissions, permission_type).text = expression
+        return True
@@ -7,13 +7,18 @@
  <xsl:strip-space elements="*"/>
 
 
+<!-- the validity of the grants, see sros2.api.get_permissions_xml -->
+<xsl:param name="not_before" select="'2013-10-26T00:00:00'"/>
+<xsl:param name="not_after" select="'2023-10-26T22:45:30'"/>
+
 <xsl:variable name="template_validity">
   <validity>
-    <not_before>2013-10-26T00:00:00</not_before>
-    <not_after>2023-10-26T22:45:30</not_after>
+    <not_before><xsl:value-of select="$not_before"/></not_before>
+    <not_after><xsl:value-of select="$not_after"/></not_after>
   </validity>
 </xsl:variable>
 
+<!-- replaced by the domains of each grant once transformed, see sros2.api.domains -->
 <xsl:variable name="template_domains">
   <domains>
     <id>0</id>
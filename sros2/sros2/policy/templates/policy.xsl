@@ -26,9 +26,17 @@
   </xsl:copy>
 </xsl:template>
 
-<!-- prune duplicate expressions -->
-<xsl:template match="topic[. = preceding-sibling::topic]"/>
-<xsl:template match="service[. = preceding-sibling::service]"/>
-<xsl:template match="action[. = preceding-sibling::action]"/>
+<!-- prune duplicate expressions, looked up by key rather than by scanning the preceding
+     siblings so that large permission groups are not pruned in quadratic time -->
+<xsl:key name="expressions" match="topic|service|action"
+ use="concat(generate-id(..), '|', name(), '|', .)"/>
+<xsl:template match="topic|service|action">
+  <xsl:if test="generate-id() = generate-id(
+    key('expressions', concat(generate-id(..), '|', name(), '|', .))[1])">
+    <xsl:copy>
+      <xsl:apply-templates select="node()|@*"/>
+    </xsl:copy>
+  </xsl:if>
+</xsl:template>
 
 </xsl:stylesheet>
@@ -0,0 +1,50 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from argcomplete.completers import FilesCompleter
+except ImportError:
+    def FilesCompleter(*, allowednames, directories):
+        return None
+
+from sros2.api import analyze
+from sros2.verb import VerbExtension
+
+
+class AnalyzePermissionsVerb(VerbExtension):
+    """Report the size and rules of permissions grants, failing if they exceed a budget."""
+
+    def add_arguments(self, parser, cli_name):
+        arg = parser.add_argument(
+            'PATHS', nargs='+',
+            help='paths of permissions xml files, policy xml files or keystores')
+        arg.completer = FilesCompleter(allowednames=('xml'), directories=True)
+        parser.add_argument(
+            '--max-size', type=int, metavar='BYTES',
+            help='fail if the permissions document of a grant is larger')
+        parser.add_argument(
+            '--max-rules', type=int, metavar='COUNT',
+            help='fail if a grant has more publish and subscribe rules')
+        parser.add_argument(
+            '--max-redundant', type=int, metavar='COUNT',
+            help='fail if a grant has more duplicate, redundant or shadowed rules')
+        parser.add_argument(
+            '-o', '--report', metavar='PATH',
+            help='write a JSON report to this file, - for the standard output')
+
+    def main(self, *, args):
+        success = analyze(
+            args.PATHS, max_size=args.max_size, max_rules=args.max_rules,
+            max_redundant=args.max_redundant, report_path=args.report)
+        return 0 if success else 1
@@ -0,0 +1,44 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from argcomplete.completers import DirectoriesCompleter
+except ImportError:
+    def DirectoriesCompleter():
+        return None
+
+from sros2.api import check_shared_artifacts
+from sros2.api.shared_artifacts import LINK_MODES
+from sros2.verb import VerbExtension
+
+
+class CheckSharedArtifactsVerb(VerbExtension):
+    """Check the keystore CA certificate, governance and CRL of identities are up to date."""
+
+    def add_arguments(self, parser, cli_name):
+        arg = parser.add_argument('ROOT', help='root path of keystore')
+        arg.completer = DirectoriesCompleter()
+        parser.add_argument(
+            '--fix', action='store_true', help='replace the stale files')
+        parser.add_argument(
+            '--link-mode', choices=LINK_MODES,
+            help='how to replace the stale files (default: $SROS2_LINK_MODE or copy)')
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=None,
+            help='number of identities to check in parallel')
+
+    def main(self, *, args):
+        success = check_shared_artifacts(
+            args.ROOT, fix=args.fix, jobs=args.jobs, link_mode=args.link_mode)
+        return 0 if success else 1
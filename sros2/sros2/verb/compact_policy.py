@@ -0,0 +1,38 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from argcomplete.completers import FilesCompleter
+except ImportError:
+    def FilesCompleter(*, allowednames, directories):
+        return None
+
+from sros2.api import compact_policy
+from sros2.verb import VerbExtension
+
+
+class CompactPolicyVerb(VerbExtension):
+    """Merge the expressions of a policy file into wildcard expressions granting the same names."""
+
+    def add_arguments(self, parser, cli_name):
+        arg = parser.add_argument('POLICY_FILE_PATH', help='path of the policy xml file')
+        arg.completer = FilesCompleter(allowednames=('xml'), directories=False)
+        parser.add_argument(
+            '-o', '--output', metavar='PATH',
+            help='path of the compacted policy xml file, - for the standard output '
+                 '(default: replace the policy file)')
+
+    def main(self, *, args):
+        success = compact_policy(args.POLICY_FILE_PATH, args.output)
+        return 0 if success else 1
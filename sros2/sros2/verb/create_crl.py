@@ -0,0 +1,50 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from argcomplete.completers import DirectoriesCompleter
+except ImportError:
+    def DirectoriesCompleter():
+        return None
+
+from sros2.api import create_crl
+from sros2.api.shared_artifacts import LINK_MODES
+from sros2.verb import VerbExtension
+
+
+class CreateCrlVerb(VerbExtension):
+    """Issue the certificate revocation list of a keystore again and publish it."""
+
+    def add_arguments(self, parser, cli_name):
+        arg = parser.add_argument('ROOT', help='root path of keystore')
+        arg.completer = DirectoriesCompleter()
+        parser.add_argument(
+            '--full', action='store_true',
+            help='list all the revoked certificates of the CA database, instead of carrying '
+                 'over the entries of the current CRL')
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='validity of the CRL (default: 30)')
+        parser.add_argument(
+            '--link-mode', choices=LINK_MODES,
+            help='how to install the CRL into the identities '
+                 '(default: $SROS2_LINK_MODE or copy)')
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=None,
+            help='number of identities to install the CRL into in parallel')
+
+    def main(self, *, args):
+        success = create_crl(
+            args.ROOT, full=args.full, days=args.days, link_mode=args.link_mode, jobs=args.jobs)
+        return 0 if success else 1
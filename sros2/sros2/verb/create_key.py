@@ -19,6 +19,7 @@ except ImportError:
         return None
 
 from sros2.api import create_key
+from sros2.api.shared_artifacts import LINK_MODES
 from sros2.verb import VerbExtension
 
 
@@ -29,7 +30,11 @@ class CreateKeyVerb(VerbExtension):
         arg = parser.add_argument('ROOT', help='root path of keystore')
         arg.completer = DirectoriesCompleter()
         parser.add_argument('NAME', help='key name, aka ROS node name')
+        parser.add_argument(
+            '--link-mode', choices=LINK_MODES,
+            help='how the keystore CA certificate and governance are shared with the key '
+                 '(default: $SROS2_LINK_MODE or copy)')
 
     def main(self, *, args):
-        success = create_key(args.ROOT, args.NAME)
+        success = create_key(args.ROOT, args.NAME, link_mode=args.link_mode)
         return 0 if success else 1
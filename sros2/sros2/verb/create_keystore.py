@@ -19,6 +19,7 @@ except ImportError:
         return None
 
 from sros2.api import create_keystore
+from sros2.api.crypto import DEFAULT_CURVE, EC_PARAMETERS_PEM
 from sros2.verb import VerbExtension
 
 
@@ -28,7 +29,14 @@ class CreateKeystoreVerb(VerbExtension):
     def add_arguments(self, parser, cli_name):
         arg = parser.add_argument('ROOT', help='root path of keystore')
         arg.completer = DirectoriesCompleter()
+        parser.add_argument(
+            '--curve', choices=sorted(EC_PARAMETERS_PEM), default=DEFAULT_CURVE,
+            help='elliptic curve of the keys of the keystore (default: %(default)s)')
+        parser.add_argument(
+            '--domains', metavar='DOMAINS',
+            help='DDS domains the governance covers, e.g. 0,3,10-20 '
+                 '(default: $ROS_DOMAIN_ID or 0)')
 
     def main(self, *, args):
-        success = create_keystore(args.ROOT)
+        success = create_keystore(args.ROOT, curve=args.curve, domains=args.domains)
         return 0 if success else 1
@@ -0,0 +1,36 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from argcomplete.completers import FilesCompleter
+except ImportError:
+    def FilesCompleter(*, allowednames, directories):
+        return None
+
+from sros2.api import diff_policy
+from sros2.verb import VerbExtension
+
+
+class DiffPolicyVerb(VerbExtension):
+    """Show the profiles and rules added and removed between two policy files."""
+
+    def add_arguments(self, parser, cli_name):
+        for name in ('OLD_POLICY_FILE_PATH', 'NEW_POLICY_FILE_PATH'):
+            arg = parser.add_argument(name, help='path of the policy xml file')
+            arg.completer = FilesCompleter(allowednames=('xml'), directories=False)
+
+    def main(self, *, args):
+        # as diff does, fail when the policies differ
+        same = diff_policy(args.OLD_POLICY_FILE_PATH, args.NEW_POLICY_FILE_PATH)
+        return 0 if same else 1
@@ -19,18 +19,31 @@ except ImportError:
         return None
 
 from sros2.api import distribute_key
+from sros2.api.distribute import COMPRESSIONS
 from sros2.verb import VerbExtension
 
 
 class DistributeKeyVerb(VerbExtension):
-    """Distribute key."""
+    """Export identities with the public CA material to a keystore or an archive."""
 
     def add_arguments(self, parser, cli_name):
         arg = parser.add_argument('ROOT', help='root path of keystore')
         arg.completer = DirectoriesCompleter()
-        parser.add_argument('TARGET', help='target keystore path')
+        arg = parser.add_argument(
+            'TARGET',
+            help='target keystore path, tar archive path, or - to write the archive to stdout')
         arg.completer = DirectoriesCompleter()
+        parser.add_argument(
+            '-n', '--node-names', nargs='*', default=[], help='identities to export')
+        parser.add_argument(
+            '-p', '--prefix', nargs='*', default=[],
+            help='namespaces of the identities to export (default: all the identities)')
+        parser.add_argument(
+            '--compression', choices=COMPRESSIONS,
+            help='compression of the archive (default: from the suffix of TARGET, or gz)')
 
     def main(self, *, args):
-        success = distribute_key(args.ROOT, args.TARGET)
+        success = distribute_key(
+            args.ROOT, args.TARGET, identities=args.node_names, prefixes=args.prefix,
+            compression=args.compression)
         return 0 if success else 1
@@ -24,6 +24,7 @@ except ImportError:
         return None
 
 from sros2.api import generate_artifacts
+from sros2.api.shared_artifacts import LINK_MODES
 from sros2.verb import VerbExtension
 
 
@@ -41,11 +42,29 @@ class GenerateArtifactsVerb(VerbExtension):
             help='list of policy xml file paths')
         arg.completer = FilesCompleter(
             allowednames=('xml'), directories=False)
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=1,
+            help='number of identities to provision in parallel')
+        parser.add_argument(
+            '-f', '--force', action='store_true',
+            help='regenerate the permissions of all identities, even if unchanged')
+        parser.add_argument(
+            '-s', '--stream', action='store_true',
+            help='provision the profiles of the policy files as they are being read')
+        parser.add_argument(
+            '--link-mode', choices=LINK_MODES,
+            help='how the keystore CA certificate and governance are shared with the '
+                 'identities (default: $SROS2_LINK_MODE or copy)')
+        parser.add_argument(
+            '--domains', metavar='DOMAINS',
+            help='DDS domains of the permissions of the profiles without a domains attribute, '
+                 'e.g. 0,3,10-20 (default: $ROS_DOMAIN_ID or the domains of the keystore)')
 
     def main(self, *, args):
         try:
             success = generate_artifacts(
-                args.keystore_root_path, args.node_names, args.policy_files)
+                args.keystore_root_path, args.node_names, args.policy_files, args.jobs,
+                args.force, args.stream, args.link_mode, args.domains)
         except FileNotFoundError as e:
             raise RuntimeError(str(e))
         return 0 if success else 1
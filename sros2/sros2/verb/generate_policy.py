@@ -12,8 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import OrderedDict
+import copy
+import io
 import os
 import sys
+import time
 
 try:
     from argcomplete.completers import DirectoriesCompleter
@@ -26,32 +30,24 @@ except ImportError:
     def FilesCompleter(*, allowednames, directories):
         return None
 
-from lxml import etree
-
 from ros2cli.node.direct import DirectNode
-from ros2cli.node.strategy import NodeStrategy
 
 from sros2.api import (
+    compact_policy_tree,
+    get_graph_snapshot,
     get_node_names,
-    get_publisher_info,
-    get_service_info,
-    get_subscriber_info
 )
+from sros2.api.atomic import atomic_write
 
 from sros2.policy import (
     dump_policy,
     load_policy,
-    POLICY_VERSION,
 )
+from sros2.policy.model import PolicyModel
 
 from sros2.verb import VerbExtension
 
 
-def formatTopics(topic_list, permission, topic_map):
-    for topic in topic_list:
-        topic_map[topic.name].append(permission)
-
-
 class GeneratePolicyVerb(VerbExtension):
     """Generate XML policy file from ROS graph data."""
 
@@ -61,83 +57,179 @@ class GeneratePolicyVerb(VerbExtension):
             'POLICY_FILE_PATH', help='path of the policy xml file')
         arg.completer = FilesCompleter(
             allowednames=('xml'), directories=False)
+        parser.add_argument(
+            '-v', '--verbose', action='store_true',
+            help='print a breakdown of the time spent in each step')
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='keep recording the nodes and endpoints appearing in the graph until '
+                 'interrupted, or for --duration')
+        parser.add_argument(
+            '--duration', type=float, metavar='SECONDS',
+            help='record the graph for this number of seconds, implies --watch')
+        parser.add_argument(
+            '--interval', type=float, default=1.0, metavar='SECONDS',
+            help='time between two observations of the graph when recording '
+                 '(default: %(default)s)')
+        parser.add_argument(
+            '--flush-interval', type=float, default=30.0, metavar='SECONDS',
+            help='time between two writes of the policy file when recording '
+                 '(default: %(default)s)')
+        parser.add_argument(
+            '--compact', action='store_true',
+            help='merge the expressions of the written policy into wildcard expressions '
+                 'granting the same names, see compact_policy')
 
     def get_policy(self, policy_file_path):
         if os.path.isfile(policy_file_path):
-            return load_policy(policy_file_path)
+            return PolicyModel(load_policy(policy_file_path))
         else:
-            profiles = etree.Element('profiles')
-            policy = etree.Element('policy')
-            policy.attrib['version'] = POLICY_VERSION
-            policy.append(profiles)
-            return policy
+            return PolicyModel()
 
     def get_profile(self, policy, node_name):
-        profile = policy.find(
-            path='profiles/profile[@ns="{ns}"][@node="{node}"]'.format(
-                ns=node_name.ns,
-                node=node_name.node))
-        if profile is None:
-            profile = etree.Element('profile')
-            profile.attrib['ns'] = node_name.ns
-            profile.attrib['node'] = node_name.node
-            profiles = policy.find('profiles')
-            profiles.append(profile)
-        return profile
-
-    def get_permissions(self, profile, permission_type, rule_type, rule_qualifier):
-        permissions = profile.find(
-            path='{permission_type}s[@{rule_type}="{rule_qualifier}"]'.format(
-                permission_type=permission_type,
-                rule_type=rule_type,
-                rule_qualifier=rule_qualifier))
-        if permissions is None:
-            permissions = etree.Element(permission_type + 's')
-            permissions.attrib[rule_type] = rule_qualifier
-            profile.append(permissions)
-        return permissions
+        return policy.add_profile(node_name.ns, node_name.node)
 
     def add_permission(
-            self, profile, permission_type, rule_type, rule_qualifier, expressions, node_name):
-        permissions = self.get_permissions(profile, permission_type, rule_type, rule_qualifier)
+            self, policy, permission_type, rule_type, rule_qualifier, expressions, node_name):
+        """Add the expressions the profile does not have yet, returns how many were added."""
+        added_count = 0
         for expression in expressions:
-            permission = etree.Element(permission_type)
             if expression.fqn.startswith(node_name.fqn + '/'):
-                permission.text = '~' + expression.fqn[len(node_name.fqn + '/'):]
+                text = '~' + expression.fqn[len(node_name.fqn + '/'):]
             elif expression.fqn.startswith(node_name.ns + '/'):
-                permission.text = expression.fqn[len(node_name.ns + '/'):]
+                text = expression.fqn[len(node_name.ns + '/'):]
             elif expression.fqn.count('/') == 1 and node_name.ns == '/':
-                permission.text = expression.fqn[len('/'):]
+                text = expression.fqn[len('/'):]
             else:
-                permission.text = expression.fqn
-            permissions.append(permission)
+                text = expression.fqn
+            added_count += policy.add_expression(
+                node_name.ns, node_name.node, permission_type, rule_type, rule_qualifier, text)
+        return added_count
+
+    def add_snapshot(self, policy, snapshot):
+        """Add the profiles and permissions the policy does not have yet, returns their counts."""
+        profile_count = 0
+        permission_count = 0
+        for node_name, endpoints in snapshot.items():
+            if (node_name.ns, node_name.node) not in policy:
+                self.get_profile(policy, node_name)
+                profile_count += 1
+            if endpoints.subscribers:
+                permission_count += self.add_permission(
+                    policy, 'topic', 'subscribe', 'ALLOW', endpoints.subscribers, node_name)
+            if endpoints.publishers:
+                permission_count += self.add_permission(
+                    policy, 'topic', 'publish', 'ALLOW', endpoints.publishers, node_name)
+            if endpoints.services:
+                permission_count += self.add_permission(
+                    policy, 'service', 'reply', 'ALLOW', endpoints.services, node_name)
+        return profile_count, permission_count
+
+    def write_policy(self, policy, policy_file_path, compact=False):
+        policy_tree = policy.policy
+        if compact:
+            # the model keeps the expressions as observed, for recording to go on
+            policy_tree = copy.deepcopy(policy_tree)
+            compact_policy_tree(policy_tree, file=sys.stderr)
+        # never leave a truncated policy behind, even when interrupted while recording
+        stream = io.StringIO()
+        dump_policy(policy_tree, stream)
+        atomic_write(policy_file_path, stream.getvalue())
+
+    def record(self, node, policy, args):
+        """
+        Poll the graph and add what appears in it to the policy, until the duration elapses.
+
+        Each observation costs the same whatever the time spent recording, and the policy only
+        grows with the permissions it does not have yet. The policy file is written whenever
+        it changed and the flush interval elapsed, and when recording stops. As for a single
+        snapshot, nothing is written and 1 is returned if no node was ever observed.
+        """
+        start = time.monotonic()
+        deadline = None if args.duration is None else start + args.duration
+        last_flush = start
+        observation_count = 0
+        observed_count = 0
+        profile_count = 0
+        permission_count = 0
+        # a new profile changes the policy even without permissions, it has to be written too
+        pending = False
+        try:
+            while True:
+                node_names = get_node_names(node=node, include_hidden_nodes=False)
+                snapshot = get_graph_snapshot(node, node_names)
+                observation_count += 1
+                observed_count = max(observed_count, len(snapshot))
+                added_profile_count, added_permission_count = self.add_snapshot(
+                    policy, snapshot)
+                profile_count += added_profile_count
+                permission_count += added_permission_count
+                if added_profile_count or added_permission_count:
+                    pending = True
+                    if args.verbose:
+                        print('%d profiles and %d permissions added from %d nodes' % (
+                            added_profile_count, added_permission_count, len(snapshot)),
+                            file=sys.stderr)
+
+                now = time.monotonic()
+                if pending and now - last_flush >= args.flush_interval:
+                    self.write_policy(policy, args.POLICY_FILE_PATH, args.compact)
+                    last_flush = now
+                    pending = False
+                if deadline is not None and now >= deadline:
+                    break
+                sleep_time = args.interval
+                if deadline is not None:
+                    sleep_time = min(sleep_time, deadline - now)
+                time.sleep(sleep_time)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pending:
+                self.write_policy(policy, args.POLICY_FILE_PATH, args.compact)
+        if not observed_count:
+            print('No nodes detected in the ROS graph. No policy file was generated.',
+                  file=sys.stderr)
+            return 1
+        print('%d profiles and %d permissions recorded in %d observations over %.0fs' % (
+            profile_count, permission_count, observation_count, time.monotonic() - start),
+            file=sys.stderr)
+        return 0
 
     def main(self, *, args):
+        timings = OrderedDict()
+        start = time.monotonic()
         policy = self.get_policy(args.POLICY_FILE_PATH)
-        node_names = []
-        with NodeStrategy(args) as node:
-            node_names = get_node_names(node=node, include_hidden_nodes=False)
+        timings['load policy'] = time.monotonic() - start
 
-        if not len(node_names):
-            print('No nodes detected in the ROS graph. No policy file was generated.',
-                  file=sys.stderr)
-            return 1
+        if args.watch or args.duration is not None:
+            with DirectNode(args) as node:
+                return self.record(node, policy, args)
 
+        # node names and endpoints are queried from the same node to get a consistent view
         with DirectNode(args) as node:
-            for node_name in node_names:
-                profile = self.get_profile(policy, node_name)
-                subscribe_topics = get_subscriber_info(node=node, node_name=node_name)
-                if subscribe_topics:
-                    self.add_permission(
-                        profile, 'topic', 'subscribe', 'ALLOW', subscribe_topics, node_name)
-                publish_topics = get_publisher_info(node=node, node_name=node_name)
-                if publish_topics:
-                    self.add_permission(
-                        profile, 'topic', 'publish', 'ALLOW', publish_topics, node_name)
-                reply_services = get_service_info(node=node, node_name=node_name)
-                if reply_services:
-                    self.add_permission(
-                        profile, 'service', 'reply', 'ALLOW', reply_services, node_name)
-
-        with open(args.POLICY_FILE_PATH, 'w') as stream:
-            dump_policy(policy, stream)
+            start = time.monotonic()
+            node_names = get_node_names(node=node, include_hidden_nodes=False)
+            timings['list nodes'] = time.monotonic() - start
+
+            if not len(node_names):
+                print('No nodes detected in the ROS graph. No policy file was generated.',
+                      file=sys.stderr)
+                return 1
+
+            start = time.monotonic()
+            snapshot = get_graph_snapshot(node, node_names)
+            timings['query endpoints'] = time.monotonic() - start
+
+        start = time.monotonic()
+        self.add_snapshot(policy, snapshot)
+        timings['build policy'] = time.monotonic() - start
+
+        start = time.monotonic()
+        self.write_policy(policy, args.POLICY_FILE_PATH, args.compact)
+        timings['write policy'] = time.monotonic() - start
+
+        if args.verbose:
+            print('%d nodes, %d queried' % (len(node_names), len(snapshot)), file=sys.stderr)
+            for step, duration in timings.items():
+                print('%-16s %8.3fs' % (step, duration), file=sys.stderr)
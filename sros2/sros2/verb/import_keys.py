@@ -0,0 +1,35 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from argcomplete.completers import DirectoriesCompleter
+except ImportError:
+    def DirectoriesCompleter():
+        return None
+
+from sros2.api import import_keys
+from sros2.verb import VerbExtension
+
+
+class ImportKeysVerb(VerbExtension):
+    """Install the identities of an archive exported by distribute_key into a keystore."""
+
+    def add_arguments(self, parser, cli_name):
+        arg = parser.add_argument('ROOT', help='root path of keystore')
+        arg.completer = DirectoriesCompleter()
+        parser.add_argument('ARCHIVE', help='path of the archive, or - to read it from stdin')
+
+    def main(self, *, args):
+        success = import_keys(args.ROOT, args.ARCHIVE)
+        return 0 if success else 1
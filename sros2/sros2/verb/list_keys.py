@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
+from datetime import datetime
+
 try:
     from argcomplete.completers import DirectoriesCompleter
 except ImportError:
@@ -28,7 +31,33 @@ class ListKeysVerb(VerbExtension):
     def add_arguments(self, parser, cli_name):
         arg = parser.add_argument('ROOT', help='root path of keystore')
         arg.completer = DirectoriesCompleter()
+        parser.add_argument(
+            '--prefix', help='only list the identities in this namespace, e.g. /fleet/robot42')
+        parser.add_argument(
+            '--expiring-before', type=iso_date,
+            help='only list the identities whose certificate expires before this UTC date, '
+                 'e.g. 2020-01-31 or 2020-01-31T12:00:00')
+        parser.add_argument(
+            '--rebuild-index', action='store_true',
+            help='re-scan the keystore to rebuild its index before listing')
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=None,
+            help='number of certificates to read in parallel when rebuilding the index')
+        parser.add_argument(
+            '-l', '--long', action='store_true',
+            help='also print the certificate serial and expiry of each identity')
 
     def main(self, *, args):
-        success = list_keys(args.ROOT)
+        success = list_keys(
+            args.ROOT, prefix=args.prefix, expiring_before=args.expiring_before,
+            rebuild_index=args.rebuild_index, jobs=args.jobs, long=args.long)
         return 0 if success else 1
+
+
+def iso_date(value):
+    for date_format in ('%Y-%m-%d', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(value, date_format).strftime('%Y-%m-%dT%H:%M:%S')
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError("invalid date: '%s'" % value)
@@ -0,0 +1,43 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from argcomplete.completers import FilesCompleter
+except ImportError:
+    def FilesCompleter(*, allowednames, directories):
+        return None
+
+from sros2.api import merge_policy
+from sros2.verb import VerbExtension
+
+
+class MergePolicyVerb(VerbExtension):
+    """Merge policy files into one, without duplicate profiles or rules."""
+
+    def add_arguments(self, parser, cli_name):
+        arg = parser.add_argument(
+            'POLICY_FILE_PATHS', nargs='+', help='paths of the policy xml files to merge')
+        arg.completer = FilesCompleter(allowednames=('xml'), directories=False)
+        parser.add_argument(
+            '-o', '--output', default='-', metavar='PATH',
+            help='path of the merged policy xml file, may be one of the merged files '
+                 '(default: the standard output)')
+        parser.add_argument(
+            '--compact', action='store_true',
+            help='merge the expressions of the merged policy into wildcard expressions '
+                 'granting the same names, see compact_policy')
+
+    def main(self, *, args):
+        success = merge_policy(args.POLICY_FILE_PATHS, args.output, compact=args.compact)
+        return 0 if success else 1
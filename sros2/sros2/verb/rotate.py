@@ -0,0 +1,55 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from argcomplete.completers import DirectoriesCompleter
+except ImportError:
+    def DirectoriesCompleter():
+        return None
+
+from sros2.api import rotate
+from sros2.verb import VerbExtension
+
+
+class RotateVerb(VerbExtension):
+    """Renew the certificates and permissions of the identities nearing expiry."""
+
+    def add_arguments(self, parser, cli_name):
+        arg = parser.add_argument('ROOT', help='root path of keystore')
+        arg.completer = DirectoriesCompleter()
+        parser.add_argument(
+            '-n', '--node-names', nargs='*', default=[],
+            help='identities to renew, instead of the ones expiring soon')
+        parser.add_argument(
+            '--within', type=int, default=30, metavar='DAYS',
+            help='renew the identities expiring within this number of days '
+                 '(default: %(default)s)')
+        parser.add_argument(
+            '--validity-days', type=int, default=None,
+            help='validity of the new certificates (default: $SROS2_CERT_VALIDITY_DAYS or '
+                 '3650)')
+        parser.add_argument(
+            '--rekey', action='store_true',
+            help='generate new keys instead of certifying the existing ones again')
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=1,
+            help='number of identities to renew in parallel')
+        parser.add_argument(
+            '--dry-run', action='store_true', help='only list the identities to renew')
+
+    def main(self, *, args):
+        success = rotate(
+            args.ROOT, within_days=args.within, identities=args.node_names, rekey=args.rekey,
+            validity_days=args.validity_days, jobs=args.jobs, dry_run=args.dry_run)
+        return 0 if success else 1
@@ -0,0 +1,47 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from argcomplete.completers import DirectoriesCompleter
+except ImportError:
+    def DirectoriesCompleter():
+        return None
+
+from sros2.api import verify
+from sros2.api.verify import DEFAULT_EXPIRY_WINDOW_DAYS
+from sros2.verb import VerbExtension
+
+
+class VerifyVerb(VerbExtension):
+    """Verify the certificates, keys and signed permissions of all identities of a keystore."""
+
+    def add_arguments(self, parser, cli_name):
+        arg = parser.add_argument('ROOT', help='root path of keystore')
+        arg.completer = DirectoriesCompleter()
+        parser.add_argument(
+            '--expiry-window', type=int, default=DEFAULT_EXPIRY_WINDOW_DAYS, metavar='DAYS',
+            help='report certificates expiring within this number of days '
+                 '(default: %(default)s)')
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=None,
+            help='number of identities to verify in parallel')
+        parser.add_argument(
+            '-o', '--report', metavar='PATH',
+            help='write a JSON report to this file, - for the standard output')
+
+    def main(self, *, args):
+        success = verify(
+            args.ROOT, expiry_window_days=args.expiry_window, jobs=args.jobs,
+            report_path=args.report)
+        return 0 if success else 1
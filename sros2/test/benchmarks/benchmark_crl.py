@@ -0,0 +1,85 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Time the revocation of certificates and the issuance of CRLs on a synthetic CA database.
+
+The CA database of a temporary keystore is filled with certificate entries without issuing
+the certificates, most of them revoked. The results can be written as a JSON report.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import tempfile
+
+from sros2.api import create_keystore
+from sros2.api.crl import revoke_certificates, write_crl
+from sros2.api.crypto import format_serial
+
+from timing import print_header, Timer, write_report
+
+
+def write_synthetic_database(keystore_path, size, first_serial=0x1000):
+    not_after = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=3650)
+    with open(os.path.join(keystore_path, 'index.txt'), 'w') as f:
+        for i in range(size):
+            f.write('V\t%s\t\t%s\tunknown\t/CN=\\/robot_%d\\/node_%d\n' % (
+                not_after.strftime('%y%m%d%H%M%SZ'), format_serial(first_serial + i),
+                i // 100, i))
+    return [format_serial(first_serial + i) for i in range(size)]
+
+
+def run_benchmarks(timer, size, appended):
+    with tempfile.TemporaryDirectory() as directory:
+        keystore_path = os.path.join(directory, 'keystore')
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_keystore(keystore_path)
+        serials = write_synthetic_database(keystore_path, size + appended)
+
+        with timer.measure('revoke_certificates', size, 1):
+            revoke_certificates(keystore_path, serials[:size])
+        with timer.measure('write_crl (full)', size, 1):
+            write_crl(keystore_path)
+        with timer.measure('write_crl (refresh)', size, 1):
+            write_crl(keystore_path, revoked=[])
+        with timer.measure('revoke + write_crl (append)', size, appended):
+            for serial in serials[size:]:
+                write_crl(keystore_path, revoked=revoke_certificates(keystore_path, [serial]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-s', '--sizes', type=int, nargs='*', default=[1000, 10000, 100000],
+        help='numbers of revoked certificates of the synthetic CA databases')
+    parser.add_argument(
+        '--appended', type=int, default=10,
+        help='number of certificates revoked one at a time on top of the CRL')
+    parser.add_argument('-o', '--output', help='path of the JSON report to write')
+    args = parser.parse_args()
+
+    timer = Timer()
+    print_header()
+    for size in args.sizes:
+        run_benchmarks(timer, size, args.appended)
+
+    if args.output:
+        write_report(args.output, timer)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare the identity provisioning throughput of the available crypto backends."""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from sros2.api import create_ca_conf_file, create_request_file
+from sros2.api.crypto import get_crypto_backend, get_crypto_backend_names
+
+
+def provision_identities(backend, keystore_path, count):
+    ca_conf_path = os.path.join(keystore_path, 'ca_conf.cnf')
+    ecdsa_param_path = os.path.join(keystore_path, 'ecdsaparam')
+    ca_key_path = os.path.join(keystore_path, 'ca.key.pem')
+    ca_cert_path = os.path.join(keystore_path, 'ca.cert.pem')
+    create_ca_conf_file(ca_conf_path)
+    backend.create_ecdsa_param_file(ecdsa_param_path)
+    backend.create_ca_key_cert(ecdsa_param_path, ca_conf_path, ca_key_path, ca_cert_path)
+    open(os.path.join(keystore_path, 'index.txt'), 'a').close()
+    with open(os.path.join(keystore_path, 'serial'), 'w') as f:
+        f.write('1000')
+
+    start = time.perf_counter()
+    for i in range(count):
+        relative_path = 'node_%d' % i
+        key_dir = os.path.join(keystore_path, relative_path)
+        os.makedirs(key_dir)
+        cnf_path = os.path.join(key_dir, 'request.cnf')
+        create_request_file(cnf_path, '/' + relative_path)
+        backend.create_key_and_cert_req(
+            keystore_path, relative_path, cnf_path, ecdsa_param_path,
+            os.path.join(key_dir, 'key.pem'), os.path.join(key_dir, 'req.pem'))
+        backend.create_cert(keystore_path, relative_path)
+        backend.create_signed_file(
+            os.path.join(key_dir, 'permissions.p7s'), cnf_path, ca_cert_path, ca_key_path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--count', type=int, default=50, help='number of identities per backend')
+    parser.add_argument(
+        '-b', '--backends', nargs='*', default=get_crypto_backend_names(),
+        help='crypto backends to compare')
+    args = parser.parse_args()
+
+    for name in args.backends:
+        try:
+            backend = get_crypto_backend(name)
+        except RuntimeError as e:
+            print('%-14s skipped: %s' % (name, e))
+            continue
+        with tempfile.TemporaryDirectory() as keystore_path:
+            # silence the per-command logging of the openssl backend
+            with contextlib.redirect_stdout(io.StringIO()):
+                elapsed = provision_identities(backend, keystore_path, args.count)
+        print('%-14s %6d identities in %8.3fs: %8.1f keys/s' % (
+            name, args.count, elapsed, args.count / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Time exporting identities of a synthetic keystore and importing them into another keystore.
+
+Everything runs offline in temporary directories. The results can be written as a JSON
+report.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+
+from sros2.api import distribute_key, generate_artifacts
+from sros2.api.distribute import export_keystore, import_keystore
+
+from timing import print_header, Timer, write_report
+
+
+def get_identities(count):
+    return ['/robot_%d/node_%d' % (i // 100, i) for i in range(count)]
+
+
+def run_benchmarks(timer, size, compressions):
+    identities = get_identities(size)
+    with tempfile.TemporaryDirectory() as directory:
+        keystore_path = os.path.join(directory, 'keystore')
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_artifacts(keystore_path, identities)
+
+        for compression in compressions:
+            label = compression or 'none'
+            archive = io.BytesIO()
+            with timer.measure(
+                'export (%s)' % label, size, size, lambda: len(archive.getvalue())
+            ):
+                export_keystore(keystore_path, archive, compression=compression)
+
+            target_path = os.path.join(directory, 'target_' + label)
+            archive.seek(0)
+            with timer.measure(
+                'import (%s)' % label, size, size, lambda: len(archive.getvalue())
+            ):
+                import_keystore(target_path, archive)
+            archive.seek(0)
+            with timer.measure(
+                'import unchanged (%s)' % label, size, size, lambda: len(archive.getvalue())
+            ):
+                import_keystore(target_path, archive)
+
+        with timer.measure('distribute_key (keystore)', size, size):
+            distribute_key(keystore_path, os.path.join(directory, 'target'))
+        # a single namespace out of a large keystore
+        with timer.measure('distribute_key (prefix)', size, min(size, 100)):
+            distribute_key(
+                keystore_path, os.path.join(directory, 'prefix.tar.gz'), prefixes=['/robot_0'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-s', '--sizes', type=int, nargs='*', default=[100, 1000],
+        help='numbers of identities of the synthetic keystores')
+    parser.add_argument(
+        '-c', '--compressions', nargs='*', default=['', 'gz', 'xz'],
+        help='compressions of the archives to time')
+    parser.add_argument('-o', '--output', help='path of the JSON report to write')
+    args = parser.parse_args()
+
+    timer = Timer()
+    print_header()
+    for size in args.sizes:
+        run_benchmarks(timer, size, args.compressions)
+
+    if args.output:
+        write_report(args.output, timer)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure the cost of generating the permissions file of a single identity."""
+
+import argparse
+import copy
+import os
+import tempfile
+import time
+
+from sros2.api import create_permission_file, get_policy_from_tree
+from sros2.policy import clear_compiled_artifacts, get_policy_default, load_policy
+
+
+def time_permissions(policy_element, count, use_cache):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'permissions.xml')
+        start = time.perf_counter()
+        for _ in range(count):
+            if not use_cache:
+                clear_compiled_artifacts()
+            create_permission_file(path, '0', copy.deepcopy(policy_element))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--count', type=int, default=500, help='number of identities')
+    args = parser.parse_args()
+
+    policy_element = get_policy_from_tree(
+        '/default', load_policy(get_policy_default('policy.xml')))
+    for label, use_cache in (('recompiled', False), ('cached', True)):
+        elapsed = time_permissions(policy_element, args.count, use_cache)
+        print('%-10s %6d identities in %8.3fs: %8.3fms per identity' % (
+            label, args.count, elapsed, 1000 * elapsed / args.count))
+
+
+if __name__ == '__main__':
+    main()
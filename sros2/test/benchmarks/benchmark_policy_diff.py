@@ -0,0 +1,82 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Time diffing, merging and writing synthetic policies of growing numbers of rules.
+
+The rules are either spread over many profiles or all granted by a single profile, the
+worst case for pruning duplicate expressions. The results can be written as a JSON report.
+"""
+
+import argparse
+import io
+
+from sros2.policy import dump_policy
+from sros2.policy.diff import diff_policies
+from sros2.policy.diff import merge_policies
+from sros2.policy.model import PolicyModel
+
+from timing import print_header, Timer, write_report
+
+
+def create_synthetic_policy(size, rules_per_profile, offset=0):
+    policy = PolicyModel()
+    for i in range(offset, offset + size):
+        policy.add_expression(
+            '/robot_%d' % (i // rules_per_profile), 'node', 'topic', 'publish', 'ALLOW',
+            'topic_%d' % i)
+    return policy
+
+
+def run_benchmarks(timer, size, rules_per_profile):
+    if rules_per_profile:
+        layout = '%d per profile' % rules_per_profile
+    else:
+        layout = 'single profile'
+        rules_per_profile = size * 2
+    old_policy = create_synthetic_policy(size, rules_per_profile)
+    # a tenth of the rules replaced
+    new_policy = create_synthetic_policy(size, rules_per_profile, offset=size // 10)
+
+    with timer.measure('diff_policies', size, layout=layout):
+        diff_policies(old_policy, new_policy)
+    with timer.measure('merge_policies', size, layout=layout):
+        merged = merge_policies([old_policy, new_policy])
+    with timer.measure('dump_policy', size, layout=layout):
+        dump_policy(merged.policy, io.StringIO())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-s', '--sizes', type=int, nargs='*', default=[1000, 10000, 50000],
+        help='numbers of rules of the synthetic policies')
+    parser.add_argument(
+        '-r', '--rules-per-profile', type=int, nargs='*', default=[10, 0],
+        help='numbers of rules per profile, 0 for a single profile')
+    parser.add_argument('-o', '--output', help='path of the JSON report to write')
+    args = parser.parse_args()
+
+    timer = Timer()
+    print_header('layout')
+    for size in args.sizes:
+        for rules_per_profile in args.rules_per_profile:
+            run_benchmarks(timer, size, rules_per_profile)
+
+    if args.output:
+        write_report(args.output, timer)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare XPath profile lookups with the indexed lookups of the policy model."""
+
+import argparse
+import time
+
+from lxml import etree
+
+from sros2.policy import POLICY_VERSION
+from sros2.policy.model import PolicyModel
+
+
+def create_synthetic_policy(count):
+    policy = etree.Element('policy')
+    policy.attrib['version'] = POLICY_VERSION
+    profiles = etree.SubElement(policy, 'profiles')
+    for i in range(count):
+        profile = etree.SubElement(profiles, 'profile')
+        profile.attrib['ns'] = '/robot_%d' % (i // 100)
+        profile.attrib['node'] = 'node_%d' % i
+        topics = etree.SubElement(profile, 'topics')
+        topics.attrib['publish'] = 'ALLOW'
+        etree.SubElement(topics, 'topic').text = 'topic_%d' % i
+    return policy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--count', type=int, default=10000, help='number of profiles in the policy')
+    args = parser.parse_args()
+
+    policy = create_synthetic_policy(args.count)
+    keys = [(profile.get('ns'), profile.get('node')) for profile in policy.iter('profile')]
+
+    start = time.perf_counter()
+    for ns, node in keys:
+        profile = policy.find(
+            path='profiles/profile[@ns="{ns}"][@node="{node}"]'.format(ns=ns, node=node))
+        profile.find(path='topics[@publish="ALLOW"]')
+    xpath_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = PolicyModel(policy)
+    index_elapsed = time.perf_counter() - start
+    for ns, node in keys:
+        model.get_profile(ns, node)
+        model.get_permissions(ns, node, 'topic', 'publish', 'ALLOW')
+    model_elapsed = time.perf_counter() - start
+
+    print('%d profiles' % args.count)
+    print('xpath  %8.3fs' % xpath_elapsed)
+    print('model  %8.3fs (of which %.3fs indexing)' % (model_elapsed, index_elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Time the stages of the provisioning pipeline on synthetic keystores and policies.
+
+Everything runs offline in temporary directories. The results can be written as a JSON
+report, to track the provisioning throughput across releases.
+"""
+
+import argparse
+import io
+import os
+import tempfile
+
+from lxml import etree
+
+from sros2.api import create_key, create_keystore, create_permission, generate_artifacts
+from sros2.api.crypto import get_default_crypto_backend_name
+from sros2.policy import dump_policy, load_policy, POLICY_VERSION
+
+from timing import print_header, Timer, write_report
+
+
+def get_identities(count):
+    return ['/robot_%d/node_%d' % (i // 100, i) for i in range(count)]
+
+
+def write_synthetic_policy(path, identities):
+    policy = etree.Element('policy')
+    policy.attrib['version'] = POLICY_VERSION
+    profiles = etree.SubElement(policy, 'profiles')
+    for identity in identities:
+        ns, node = identity.rsplit('/', 1)
+        profile = etree.SubElement(profiles, 'profile')
+        profile.attrib['ns'] = ns
+        profile.attrib['node'] = node
+        topics = etree.SubElement(profile, 'topics')
+        topics.attrib['publish'] = 'ALLOW'
+        topics.attrib['subscribe'] = 'ALLOW'
+        etree.SubElement(topics, 'topic').text = 'topic_' + node
+        services = etree.SubElement(profile, 'services')
+        services.attrib['reply'] = 'ALLOW'
+        etree.SubElement(services, 'service').text = 'service_' + node
+    with open(path, 'wb') as f:
+        f.write(etree.tostring(policy, pretty_print=True))
+
+
+def run_benchmarks(timer, size, jobs, sample):
+    identities = get_identities(size)
+    with tempfile.TemporaryDirectory() as directory:
+        policy_path = os.path.join(directory, 'policy.xml')
+        write_synthetic_policy(policy_path, identities)
+
+        with timer.measure('load_policy', size, 1):
+            policy = load_policy(policy_path)
+        with timer.measure('dump_policy', size, 1):
+            dump_policy(policy, io.StringIO())
+
+        keystore_path = os.path.join(directory, 'keystore')
+        with timer.measure('create_keystore', size, 1):
+            create_keystore(keystore_path)
+        with timer.measure('create_key', size, size):
+            for identity in identities:
+                create_key(keystore_path, identity)
+        # every call loads the whole policy, only time a sample of the identities
+        sampled = identities[:sample]
+        with timer.measure('create_permission', size, len(sampled)):
+            for identity in sampled:
+                create_permission(keystore_path, identity, policy_path)
+
+        keystore_path = os.path.join(directory, 'generated')
+        with timer.measure('generate_artifacts', size, size):
+            generate_artifacts(keystore_path, policy_files=[policy_path], jobs=jobs)
+        with timer.measure('generate_artifacts (unchanged)', size, size):
+            generate_artifacts(keystore_path, policy_files=[policy_path], jobs=jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-s', '--sizes', type=int, nargs='*', default=[1, 100, 1000, 10000],
+        help='numbers of identities of the synthetic keystores and policies')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='number of identities generate_artifacts provisions in parallel')
+    parser.add_argument(
+        '--sample', type=int, default=100,
+        help='maximum number of identities to time create_permission on')
+    parser.add_argument('-o', '--output', help='path of the JSON report to write')
+    args = parser.parse_args()
+
+    timer = Timer()
+    print_header()
+    for size in args.sizes:
+        run_benchmarks(timer, size, args.jobs, args.sample)
+
+    if args.output:
+        write_report(
+            args.output, timer, crypto_backend=get_default_crypto_backend_name(),
+            jobs=args.jobs)
+
+
+if __name__ == '__main__':
+    main()
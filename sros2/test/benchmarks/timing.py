@@ -0,0 +1,81 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Timing and JSON reports shared by the benchmarks of this directory."""
+
+import contextlib
+import datetime
+import io
+import json
+import platform
+import sys
+import time
+
+REPORT_VERSION = 1
+
+
+class Timer:
+
+    def __init__(self):
+        self.results = []
+
+    @contextlib.contextmanager
+    def measure(self, benchmark, size, calls=1, get_bytes=None, **labels):
+        """
+        Time the body of the context as `calls` calls of `benchmark` on data of `size`.
+
+        The standard output of the body, e.g. the per-identity logging of the api, is
+        silenced. `get_bytes` gives the number of bytes processed once timed, if relevant.
+        `labels` are added to the result as is, e.g. the layout of the data.
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            yield
+            elapsed = time.perf_counter() - start
+        result = {'benchmark': benchmark, 'size': size}
+        result.update(labels)
+        result.update({
+            'calls': calls,
+            'seconds': elapsed,
+            'ms_per_call': 1000 * elapsed / calls,
+            'calls_per_second': calls / elapsed if elapsed else None,
+            'megabytes_per_second': None,
+        })
+        if get_bytes is not None and elapsed:
+            result['megabytes_per_second'] = get_bytes() / elapsed / 1e6
+        self.results.append(result)
+        print('%-30s %7d %-16s %6d calls in %9.3fs: %9.3fms per call%s' % (
+            benchmark, size, ' '.join(str(label) for label in labels.values()), calls,
+            elapsed, result['ms_per_call'],
+            '' if result['megabytes_per_second'] is None else
+            ', %7.1f MB/s' % result['megabytes_per_second']))
+        sys.stdout.flush()
+
+
+def print_header(*labels):
+    print('%-30s %7s %-16s' % ('benchmark', 'size', ' '.join(labels)))
+
+
+def write_report(path, timer, **fields):
+    """Write the results of `timer` as a JSON report, along with the platform and `fields`."""
+    report = {
+        'version': REPORT_VERSION,
+        'date': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+    report.update(fields)
+    report['results'] = timer.results
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
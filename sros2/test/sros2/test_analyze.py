@@ -0,0 +1,122 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+from lxml import etree
+
+from sros2.api import analyze
+from sros2.api.analyze import analyze_permissions
+
+PERMISSIONS = """\
+<dds>
+  <permissions>
+    <grant name="/talker">
+      <subject_name>CN=/talker</subject_name>
+      <deny_rule>
+        <domains><id>0</id></domains>
+        <publish>
+          <topics>
+            <topic>rt/secret/*</topic>
+          </topics>
+        </publish>
+      </deny_rule>
+      <allow_rule>
+        <domains><id_range><min>0</min><max>5</max></id_range></domains>
+        <publish>
+          <topics>
+            <topic>rt/chatter</topic>
+            <topic>rt/chatter</topic>
+            <topic>rt/secret/key</topic>
+            <topic>rt/status/*</topic>
+            <topic>rt/status/battery</topic>
+          </topics>
+        </publish>
+        <subscribe>
+          <topics>
+            <topic>rt/secret/key</topic>
+          </topics>
+        </subscribe>
+      </allow_rule>
+      <default>DENY</default>
+    </grant>
+    <grant name="/listener">
+      <subject_name>CN=/listener</subject_name>
+      <allow_rule>
+        <domains><id>0</id></domains>
+        <subscribe>
+          <topics>
+            <topic>rt/chatter</topic>
+          </topics>
+        </subscribe>
+      </allow_rule>
+      <deny_rule>
+        <domains><id>0</id></domains>
+        <subscribe>
+          <topics>
+            <topic>rt/*</topic>
+            <topic>rt/chatter</topic>
+          </topics>
+        </subscribe>
+      </deny_rule>
+      <default>DENY</default>
+    </grant>
+  </permissions>
+</dds>
+"""
+
+
+def test_analyze_permissions():
+    talker, listener = analyze_permissions(
+        etree.fromstring(PERMISSIONS), max_rules=6, max_redundant=0)
+    assert talker['grant'] == '/talker'
+    assert talker['publish_rule_count'] == 6
+    assert talker['subscribe_rule_count'] == 1
+    assert talker['duplicates'] == ["ALLOW publish 'rt/chatter'"]
+    assert talker['redundant'] == [
+        "ALLOW publish 'rt/status/battery', matched by ALLOW 'rt/status/*'"]
+    # the deny rule only covers domain 0 of the allow rule
+    assert talker['shadowed'] == []
+    assert len(talker['errors']) == 2
+
+    assert listener['shadowed'] == ["DENY subscribe 'rt/chatter', matched by ALLOW 'rt/chatter'"]
+    assert listener['redundant'] == []
+    assert listener['errors'] == ['1 duplicate, redundant or shadowed rules exceed 0']
+    assert 0 < listener['size'] < talker['size']
+
+
+def test_analyze_permissions_empty_expression():
+    permissions = etree.fromstring(PERMISSIONS)
+    etree.SubElement(permissions.find('permissions/grant/allow_rule/publish/topics'), 'topic')
+    assert analyze_permissions(permissions)[0]['publish_rule_count'] == 6
+
+
+def test_analyze(tmpdir, capsys):
+    permissions_path = str(tmpdir.join('permissions.xml'))
+    with open(permissions_path, 'w') as f:
+        f.write(PERMISSIONS)
+    policy_path = os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), 'policies', 'sample_policy.xml')
+    report_path = str(tmpdir.join('report.json'))
+
+    assert analyze([policy_path], max_redundant=0, report_path=report_path)
+    with open(report_path) as f:
+        report = json.load(f)
+    assert report['grant_count'] > 0
+    assert report['failed_grant_count'] == 0
+
+    assert not analyze([permissions_path, policy_path], max_size=1)
+    assert capsys.readouterr().out.splitlines()[-1].startswith(
+        '%d out of %d grants over budget' % ((report['grant_count'] + 2,) * 2))
@@ -12,7 +12,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from sros2.api import is_key_name_valid
+import os
+import tarfile
+
+from lxml import etree
+import pytest
+
+from sros2.api import (
+    check_shared_artifacts,
+    create_key,
+    distribute_key,
+    find_expiring_identities,
+    find_stale_shared_artifacts,
+    generate_artifacts,
+    get_graph_snapshot,
+    get_keystore_domains,
+    get_node_names,
+    import_keys,
+    is_key_name_valid,
+    list_keys,
+    rotate,
+)
+from sros2.api.atomic import AtomicWriteBatch
+from sros2.api.crypto import get_crypto_backend
+from sros2.api.domains import format_domains, get_domains, parse_domains
+from sros2.api.keystore_index import KEYSTORE_INDEX_FILENAME
+from sros2.api.manifest import JOURNAL_SUFFIX, KeystoreManifest, MANIFEST_FILENAME
 
 
 def test_is_key_name_valid():
@@ -30,3 +55,314 @@ def test_is_key_name_valid():
     assert not is_key_name_valid('foo/bar')
     assert not is_key_name_valid('/42foo')
     assert not is_key_name_valid('/foo/42bar')
+
+
+def test_generate_artifacts_in_parallel(tmpdir):
+    keystore_path = str(tmpdir.join('keystore'))
+    identities = ['/foo', '/invalid name', '/bar/baz', '/qux']
+    # a bad identity is reported without preventing the others from being provisioned
+    assert not generate_artifacts(keystore_path, identities, jobs=3)
+    for identity in ('foo', os.path.join('bar', 'baz'), 'qux'):
+        for name in ('cert.pem', 'key.pem', 'permissions.p7s'):
+            assert os.path.isfile(os.path.join(keystore_path, identity, name))
+    assert not os.path.exists(os.path.join(keystore_path, 'invalid name'))
+
+
+def test_generate_artifacts_incrementally(tmpdir, capsys):
+    keystore_path = str(tmpdir.join('keystore'))
+    assert generate_artifacts(keystore_path, ['/foo', '/bar'])
+    signed_permissions_path = os.path.join(keystore_path, 'foo', 'permissions.p7s')
+    mtime = os.path.getmtime(signed_permissions_path)
+    capsys.readouterr()
+
+    assert generate_artifacts(keystore_path, ['/foo', '/bar'])
+    assert '0 identities rebuilt, 2 up to date' in capsys.readouterr().out
+    assert os.path.getmtime(signed_permissions_path) == mtime
+
+    assert generate_artifacts(keystore_path, ['/foo', '/bar'], force=True)
+    assert '2 identities rebuilt, 0 up to date' in capsys.readouterr().out
+
+
+def test_create_key_only_journals_the_manifest(tmpdir, capsys):
+    keystore_path = str(tmpdir.join('keystore'))
+    manifest_path = os.path.join(keystore_path, MANIFEST_FILENAME)
+    assert generate_artifacts(keystore_path, ['/foo'])
+    with open(manifest_path) as f:
+        manifest_content = f.read()
+
+    # a single key neither loads nor rewrites the manifest of the keystore
+    assert create_key(keystore_path, '/bar')
+    with open(manifest_path) as f:
+        assert f.read() == manifest_content
+    with open(manifest_path + JOURNAL_SUFFIX) as f:
+        assert len(f.readlines()) == 1
+    capsys.readouterr()
+
+    assert generate_artifacts(keystore_path, ['/foo', '/bar'])
+    captured = capsys.readouterr()
+    assert '0 identities rebuilt, 2 up to date' in captured.out
+    assert 'resuming from' not in captured.err
+    assert not os.path.exists(manifest_path + JOURNAL_SUFFIX)
+
+
+class FakeGraphNode:
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def get_node_names_and_namespaces(self):
+        return list(self.graph.keys())
+
+    def _get_endpoints(self, kind, node, ns):
+        if (node, ns) not in self.graph:
+            raise RuntimeError('node left the graph')
+        return self.graph[(node, ns)].get(kind, [])
+
+    def get_subscriber_names_and_types_by_node(self, node, ns):
+        return self._get_endpoints('subscribers', node, ns)
+
+    def get_publisher_names_and_types_by_node(self, node, ns):
+        return self._get_endpoints('publishers', node, ns)
+
+    def get_service_names_and_types_by_node(self, node, ns):
+        return self._get_endpoints('services', node, ns)
+
+
+def test_get_graph_snapshot():
+    graph = {
+        ('talker', '/'): {'publishers': [('/chatter', ['std_msgs/msg/String'])]},
+        ('listener', '/ns'): {'subscribers': [('/chatter', ['std_msgs/msg/String'])]},
+        ('_hidden', '/'): {},
+    }
+    node = FakeGraphNode(graph)
+    node_names = get_node_names(node=node)
+    assert [node_name.fqn for node_name in node_names] == ['/talker', '/ns/listener']
+
+    # nodes leaving the graph are skipped
+    del graph[('listener', '/ns')]
+    snapshot = get_graph_snapshot(node, node_names)
+    assert [node_name.fqn for node_name in snapshot] == ['/talker']
+    endpoints = snapshot[node_names[0]]
+    assert [topic.fqn for topic in endpoints.publishers] == ['/chatter']
+    assert endpoints.subscribers == []
+    assert endpoints.services == []
+
+
+def test_generate_artifacts_streamed(tmpdir):
+    keystore_path = str(tmpdir.join('keystore'))
+    policy_file = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'policies', 'talker_listener.xml')
+    assert generate_artifacts(
+        keystore_path, ['/talker', '/other'], [policy_file], jobs=2, stream=True)
+    for identity in ('talker', 'listener', 'other'):
+        assert os.path.isfile(os.path.join(keystore_path, identity, 'permissions.p7s'))
+    with open(os.path.join(keystore_path, 'talker', 'permissions.xml')) as f:
+        assert 'rt/chatter' in f.read()
+    with open(os.path.join(keystore_path, 'other', 'permissions.xml')) as f:
+        assert 'rt/*' in f.read()
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_generate_artifacts_duplicate_profiles(tmpdir, stream):
+    policy_file = str(tmpdir.join('policy.xml'))
+    with open(policy_file, 'w') as f:
+        f.write(
+            '<policy version="0.1.0"><profiles>' + ''.join(
+                '<profile ns="/" node="talker">'
+                '<topics publish="ALLOW"><topic>%s</topic></topics>'
+                '</profile>' % topic for topic in ('first', 'second')) +
+            '</profiles></policy>')
+    keystore_path = str(tmpdir.join('keystore'))
+    assert generate_artifacts(keystore_path, policy_files=[policy_file], stream=stream)
+    # the first profile wins, as when looking the profile up in the policy
+    with open(os.path.join(keystore_path, 'talker', 'permissions.xml')) as f:
+        content = f.read()
+    assert 'rt/first' in content
+    assert 'rt/second' not in content
+
+
+def test_list_keys_from_index(tmpdir, capsys):
+    keystore_path = str(tmpdir.join('keystore'))
+    identities = ['/fleet/robot4/talker', '/fleet/robot42/talker', '/fleet/robot42', '/qux']
+    assert generate_artifacts(keystore_path, identities, jobs=2)
+    capsys.readouterr()
+
+    assert list_keys(keystore_path, prefix='/fleet/robot42/')
+    assert capsys.readouterr().out.splitlines() == ['/fleet/robot42', '/fleet/robot42/talker']
+    assert list_keys(keystore_path, expiring_before='2000-01-01')
+    assert capsys.readouterr().out == ''
+    assert list_keys(keystore_path, expiring_before='9999-01-01', long=True)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[0] for line in lines] == sorted(identities)
+    assert all(len(line.split()) == 3 for line in lines)
+
+    os.remove(os.path.join(keystore_path, KEYSTORE_INDEX_FILENAME))
+    assert list_keys(keystore_path, prefix='/fleet', rebuild_index=True, jobs=2)
+    assert capsys.readouterr().out.splitlines() == sorted(identities)[:3]
+
+
+def test_shared_artifacts_links(tmpdir, capsys):
+    keystore_path = str(tmpdir.join('keystore'))
+    assert generate_artifacts(keystore_path, ['/foo', '/bar'], link_mode='hardlink')
+    assert generate_artifacts(keystore_path, ['/baz'], link_mode='symlink')
+    assert os.path.samefile(
+        os.path.join(keystore_path, 'foo', 'identity_ca.cert.pem'),
+        os.path.join(keystore_path, 'ca.cert.pem'))
+    assert os.path.islink(os.path.join(keystore_path, 'baz', 'governance.p7s'))
+    assert check_shared_artifacts(keystore_path)
+
+    # rotating the governance by replacing the file breaks the hard links, not the symlinks
+    governance_path = os.path.join(keystore_path, 'governance.p7s')
+    with open(governance_path + '.new', 'w') as f:
+        f.write('rotated')
+    os.replace(governance_path + '.new', governance_path)
+    assert find_stale_shared_artifacts(keystore_path) == [
+        ('/bar', 'governance.p7s', 'stale'), ('/foo', 'governance.p7s', 'stale')]
+
+    capsys.readouterr()
+    assert check_shared_artifacts(keystore_path, fix=True, link_mode='copy')
+    assert capsys.readouterr().out.splitlines() == [
+        '/bar: governance.p7s is stale', '/foo: governance.p7s is stale', '2 files fixed']
+    assert find_stale_shared_artifacts(keystore_path) == []
+
+
+def test_generate_artifacts_resumes_from_journal(tmpdir, capsys, monkeypatch):
+    keystore_path = str(tmpdir.join('keystore'))
+    manifest_path = os.path.join(keystore_path, MANIFEST_FILENAME)
+    # interrupted before the manifest could be saved
+    with monkeypatch.context() as m:
+        m.setattr(KeystoreManifest, 'save', lambda self: None)
+        assert generate_artifacts(keystore_path, ['/foo', '/bar'])
+    assert os.path.isfile(manifest_path + JOURNAL_SUFFIX)
+    assert not os.path.isfile(manifest_path)
+    capsys.readouterr()
+
+    assert generate_artifacts(keystore_path, ['/foo', '/bar'])
+    captured = capsys.readouterr()
+    assert 'resuming from' in captured.err
+    assert '0 identities rebuilt, 2 up to date' in captured.out
+    assert os.path.isfile(manifest_path)
+    assert not os.path.exists(manifest_path + JOURNAL_SUFFIX)
+
+
+def test_atomic_write_batch(tmpdir):
+    path = str(tmpdir.join('permissions.xml'))
+    with pytest.raises(RuntimeError):
+        with AtomicWriteBatch() as batch:
+            batch.write(path, b'<dds/>')
+            raise RuntimeError('interrupted')
+    assert tmpdir.listdir() == []
+
+    with AtomicWriteBatch() as batch:
+        batch.write(path, b'<dds/>')
+        assert not os.path.exists(path)
+        with open(batch.get_path(path), 'rb') as f:
+            assert f.read() == b'<dds/>'
+    assert [p.basename for p in tmpdir.listdir()] == ['permissions.xml']
+
+
+def test_rotate_expiring_identities(tmpdir, capsys, monkeypatch):
+    keystore_path = str(tmpdir.join('keystore'))
+    monkeypatch.setenv('SROS2_CERT_VALIDITY_DAYS', '10')
+    assert generate_artifacts(keystore_path, ['/foo', '/bar'])
+    monkeypatch.setenv('SROS2_CERT_VALIDITY_DAYS', '100')
+    assert generate_artifacts(keystore_path, ['/baz'])
+
+    def read(identity, name):
+        with open(os.path.join(keystore_path, identity, name), 'rb') as f:
+            return f.read()
+
+    foo_key = read('foo', 'key.pem')
+    foo_cert = read('foo', 'cert.pem')
+    baz_cert = read('baz', 'cert.pem')
+    capsys.readouterr()
+    assert rotate(keystore_path, within_days=30, dry_run=True)
+    assert capsys.readouterr().out.splitlines() == ['2 identities to renew', '/bar', '/foo']
+
+    assert rotate(keystore_path, within_days=30, validity_days=365, jobs=2)
+    assert read('foo', 'key.pem') == foo_key
+    assert read('foo', 'cert.pem') != foo_cert
+    assert read('baz', 'cert.pem') == baz_cert
+    assert find_expiring_identities(keystore_path, 30) == []
+    assert find_expiring_identities(keystore_path, 300) == ['/baz']
+
+    # the permissions follow the validity of the new certificate
+    cert_info = get_crypto_backend().get_certificate_info(
+        os.path.join(keystore_path, 'foo', 'cert.pem'))
+    assert cert_info.not_after.strftime('%Y-%m-%dT%H:%M:%S').encode() in read(
+        'foo', 'permissions.xml')
+
+
+def test_distribute_key(tmpdir, capsys):
+    keystore_path = str(tmpdir.join('keystore'))
+    assert generate_artifacts(keystore_path, ['/fleet/a/talker', '/fleet/b/listener', '/other'])
+
+    # straight into another keystore
+    target_path = str(tmpdir.join('target'))
+    assert distribute_key(keystore_path, target_path, prefixes=['/fleet/a'])
+    assert sorted(os.listdir(target_path)) == [
+        'ca.cert.pem', 'fleet', 'governance.p7s', 'governance.xml']
+    assert os.listdir(os.path.join(target_path, 'fleet')) == ['a']
+    key_dir = os.path.join(target_path, 'fleet', 'a', 'talker')
+    assert 'key.pem' in os.listdir(key_dir)
+    assert 'req.pem' not in os.listdir(key_dir)
+    with open(os.path.join(keystore_path, 'fleet', 'a', 'talker', 'cert.pem')) as f:
+        with open(os.path.join(key_dir, 'cert.pem')) as g:
+            assert f.read() == g.read()
+
+    # through an archive, only writing what changed
+    archive_path = str(tmpdir.join('fleet.tar.gz'))
+    assert distribute_key(
+        keystore_path, archive_path, identities=['/fleet/b/listener'], prefixes=['/fleet/a'])
+    capsys.readouterr()
+    assert import_keys(target_path, archive_path)
+    assert capsys.readouterr().out == '7 files written, 10 unchanged\n'
+    assert os.path.isfile(os.path.join(target_path, 'fleet', 'b', 'listener', 'cert.pem'))
+    assert not os.path.exists(os.path.join(target_path, 'other'))
+    with tarfile.open(archive_path) as tar:
+        assert 'ca.key.pem' not in [os.path.basename(name) for name in tar.getnames()]
+
+
+def test_parse_domains():
+    assert parse_domains('0') == [(0, 0)]
+    assert parse_domains('10-20, 3,0,12-21,4') == [(0, 0), (3, 4), (10, 21)]
+    assert format_domains(parse_domains('10-20,3,0,4')) == '0,3-4,10-20'
+    # no upper bound other than the one of the schemas, as before sets of domains
+    assert parse_domains('233,1000') == [(233, 233), (1000, 1000)]
+    for spec in ('', 'a', '3-1', '1-2-3', '-1'):
+        with pytest.raises(RuntimeError):
+            parse_domains(spec)
+    # ranges without max are open-ended
+    assert get_domains(etree.fromstring(
+        '<domains><id_range><min>5</min></id_range></domains>')) == [(5, 2 ** 31 - 1)]
+
+
+def test_generate_artifacts_multiple_domains(tmpdir, monkeypatch):
+    monkeypatch.delenv('ROS_DOMAIN_ID', raising=False)
+    policy_path = str(tmpdir.join('policy.xml'))
+    with open(policy_path, 'w') as f:
+        f.write("""\
+<policy version="0.1.0">
+  <profiles>
+    <profile ns="/" node="talker" domains="42">
+      <topics publish="ALLOW"><topic>chatter</topic></topics>
+    </profile>
+    <profile ns="/" node="listener">
+      <topics subscribe="ALLOW"><topic>chatter</topic></topics>
+    </profile>
+  </profiles>
+</policy>
+""")
+    keystore_path = str(tmpdir.join('keystore'))
+    assert generate_artifacts(keystore_path, ['/admin'], [policy_path], domains='0,3,10-20')
+    assert get_keystore_domains(keystore_path) == '0,3,10-20'
+
+    def get_domain_specs(path):
+        tree = etree.parse(os.path.join(keystore_path, path))
+        return [format_domains(get_domains(element)) for element in tree.iter('domains')]
+
+    assert get_domain_specs('governance.xml') == ['0,3,10-20']
+    assert get_domain_specs('listener/permissions.xml') == ['0,3,10-20']
+    assert get_domain_specs('admin/permissions.xml') == ['0,3,10-20']
+    assert get_domain_specs('talker/permissions.xml') == ['42']
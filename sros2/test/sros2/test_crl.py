@@ -0,0 +1,113 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from sros2.api import create_crl, generate_artifacts, revoke
+from sros2.api.crl import (
+    read_revoked_certificates,
+    REVOCATION_JOURNAL_FILENAME,
+    revoke_certificates,
+)
+from sros2.api.crypto import CRYPTO_BACKEND_ENV, get_crypto_backend, get_crypto_backend_names
+
+x509 = pytest.importorskip('cryptography.x509')
+
+
+@pytest.mark.parametrize('backend_name', get_crypto_backend_names())
+def test_revoke_and_create_crl(tmpdir, monkeypatch, backend_name):
+    try:
+        backend = get_crypto_backend(backend_name)
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    monkeypatch.setenv(CRYPTO_BACKEND_ENV, backend_name)
+    keystore_path = str(tmpdir.join('keystore'))
+    assert generate_artifacts(keystore_path, ['/foo', '/bar', '/baz'])
+    with open(os.path.join(keystore_path, 'ca.cert.pem'), 'rb') as f:
+        ca_cert = x509.load_pem_x509_certificate(f.read())
+
+    def serial(identity):
+        return int(backend.get_certificate_info(
+            os.path.join(keystore_path, identity, 'cert.pem')).serial, 16)
+
+    def load_crl(identity=''):
+        with open(os.path.join(keystore_path, identity, 'crl.pem'), 'rb') as f:
+            crl = x509.load_pem_x509_crl(f.read())
+        assert crl.is_signature_valid(ca_cert.public_key())
+        assert crl.issuer == ca_cert.subject
+        return crl
+
+    def crl_number(crl):
+        return crl.extensions.get_extension_for_class(x509.CRLNumber).value.crl_number
+
+    assert revoke(keystore_path, ['/foo'])
+    crl = load_crl()
+    assert [entry.serial_number for entry in crl] == [serial('foo')]
+    assert crl_number(crl) == 1
+    for identity in ('foo', 'bar', 'baz'):
+        assert load_crl(identity) == crl
+
+    # appended to the current CRL
+    assert revoke(keystore_path, ['/bar', '/foo'])
+    crl = load_crl()
+    assert [entry.serial_number for entry in crl] == [serial('foo'), serial('bar')]
+    assert crl_number(crl) == 2
+    # the first CRL was issued out of the CA database, the next revocations are journaled
+    with open(os.path.join(keystore_path, 'index.txt')) as f:
+        assert [line[0] for line in f] == ['R', 'V', 'V']
+    assert [entry.serial for entry in read_revoked_certificates(keystore_path)] == [
+        serial('foo'), serial('bar')]
+
+    # listed again out of the CA database, which the journal is applied to
+    os.remove(os.path.join(keystore_path, 'crl.pem'))
+    assert create_crl(keystore_path)
+    with open(os.path.join(keystore_path, 'index.txt')) as f:
+        assert [line[0] for line in f] == ['R', 'R', 'V']
+    assert not os.path.exists(os.path.join(keystore_path, REVOCATION_JOURNAL_FILENAME))
+    crl = load_crl('baz')
+    assert sorted(entry.serial_number for entry in crl) == sorted([serial('foo'), serial('bar')])
+    assert crl_number(crl) == 3
+
+    # new identities get the CRL as well
+    assert generate_artifacts(keystore_path, ['/qux'])
+    assert load_crl('qux') == crl
+
+    openssl = shutil.which('openssl')
+    if openssl:
+        subprocess.check_call(
+            [openssl, 'crl', '-noout', '-CAfile', 'ca.cert.pem', '-in', 'crl.pem'],
+            cwd=keystore_path)
+
+
+@pytest.mark.parametrize('count', [3, 100])
+def test_revoke_certificates_lookup(tmpdir, count):
+    # looked up one by one, or by parsing the whole database for many or unusual serials
+    serials = ['%X' % (0x1000 + i) for i in range(200)]
+    with open(str(tmpdir.join('index.txt')), 'w') as f:
+        f.write('R\t301231000000Z\t200101000000Z,keyCompromise\t0fff\tunknown\t/CN=\\/old\n')
+        for serial in serials:
+            f.write('V\t301231000000Z\t\t%s\tunknown\t/CN=\\/node_%s\n' % (serial, serial))
+    root_path = str(tmpdir)
+
+    revoked = revoke_certificates(root_path, serials[:count] + ['fff'])
+    assert ['%X' % entry.serial for entry in revoked] == serials[:count]
+    assert revoke_certificates(root_path, serials[:count]) == []
+    assert len(read_revoked_certificates(root_path)) == count + 1
+    with pytest.raises(RuntimeError) as e:
+        revoke_certificates(root_path, [serials[-1], '2000'])
+    assert str(e.value) == 'certificates not issued by the keystore CA: 2000'
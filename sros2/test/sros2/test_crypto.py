@@ -0,0 +1,103 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+from sros2.api import create_ca_conf_file, create_key, create_keystore, create_request_file
+from sros2.api.crypto import (
+    CRYPTO_BACKEND_ENV, get_crypto_backend, get_crypto_backend_names,
+    get_default_crypto_backend_name)
+
+x509 = pytest.importorskip('cryptography.x509')
+
+
+def test_cryptography_backend(tmpdir):
+    keystore_path = str(tmpdir)
+    backend = get_crypto_backend('cryptography')
+    ca_conf_path = os.path.join(keystore_path, 'ca_conf.cnf')
+    ecdsa_param_path = os.path.join(keystore_path, 'ecdsaparam')
+    ca_key_path = os.path.join(keystore_path, 'ca.key.pem')
+    ca_cert_path = os.path.join(keystore_path, 'ca.cert.pem')
+    create_ca_conf_file(ca_conf_path)
+    backend.create_ecdsa_param_file(ecdsa_param_path)
+    backend.create_ca_key_cert(ecdsa_param_path, ca_conf_path, ca_key_path, ca_cert_path)
+    open(os.path.join(keystore_path, 'index.txt'), 'a').close()
+    with open(os.path.join(keystore_path, 'serial'), 'w') as f:
+        f.write('1000')
+
+    key_dir = os.path.join(keystore_path, 'foo', 'bar')
+    os.makedirs(key_dir)
+    cnf_path = os.path.join(key_dir, 'request.cnf')
+    create_request_file(cnf_path, '/foo/bar')
+    backend.create_key_and_cert_req(
+        keystore_path, os.path.join('foo', 'bar'), cnf_path, ecdsa_param_path,
+        os.path.join(key_dir, 'key.pem'), os.path.join(key_dir, 'req.pem'))
+    backend.create_cert(keystore_path, os.path.join('foo', 'bar'))
+
+    with open(ca_cert_path, 'rb') as f:
+        ca_cert = x509.load_pem_x509_certificate(f.read())
+    with open(os.path.join(key_dir, 'cert.pem'), 'rb') as f:
+        cert = x509.load_pem_x509_certificate(f.read())
+    assert cert.issuer == ca_cert.subject
+    assert cert.subject.rfc4514_string() == 'CN=/foo/bar'
+    assert cert.serial_number == 0x1000
+
+    # the CA database is maintained the same way `openssl ca` does
+    with open(os.path.join(keystore_path, 'serial')) as f:
+        assert f.read().strip() == '1001'
+    with open(os.path.join(keystore_path, 'index.txt')) as f:
+        entries = [line.rstrip('\n').split('\t') for line in f]
+    assert len(entries) == 1
+    assert entries[0][0] == 'V'
+    assert entries[0][3] == '1000'
+    assert entries[0][5] == '/CN=\\/foo\\/bar'
+
+    signed_path = os.path.join(key_dir, 'request.p7s')
+    backend.create_signed_file(signed_path, cnf_path, ca_cert_path, ca_key_path)
+    with open(signed_path) as f:
+        signed_content = f.read()
+    assert 'multipart/signed' in signed_content
+    assert 'commonName = /foo/bar' in signed_content
+
+
+def test_default_crypto_backend(monkeypatch):
+    monkeypatch.delenv(CRYPTO_BACKEND_ENV, raising=False)
+    assert get_default_crypto_backend_name() == 'openssl'
+    monkeypatch.setenv(CRYPTO_BACKEND_ENV, 'cryptography')
+    assert get_default_crypto_backend_name() == 'cryptography'
+
+
+@pytest.mark.parametrize('backend_name', get_crypto_backend_names())
+def test_keys_share_keystore_curve(tmpdir, monkeypatch, backend_name):
+    try:
+        get_crypto_backend(backend_name)
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    monkeypatch.setenv(CRYPTO_BACKEND_ENV, backend_name)
+    keystore_path = str(tmpdir.join('keystore'))
+    assert create_keystore(keystore_path, curve='secp384r1')
+    assert create_key(keystore_path, '/foo/bar')
+
+    key_dir = os.path.join(keystore_path, 'foo', 'bar')
+    assert not os.path.exists(os.path.join(key_dir, 'ecdsaparam'))
+    ca_cert_path = os.path.join(keystore_path, 'ca.cert.pem')
+    for cert_path in (ca_cert_path, os.path.join(key_dir, 'cert.pem')):
+        with open(cert_path, 'rb') as f:
+            cert = x509.load_pem_x509_certificate(f.read())
+        assert cert.public_key().curve.name == 'secp384r1'
+
+    with pytest.raises(RuntimeError):
+        create_keystore(str(tmpdir.join('ed25519')), curve='ed25519')
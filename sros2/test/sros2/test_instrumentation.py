@@ -0,0 +1,41 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+
+from sros2.api import generate_artifacts
+from sros2.api.instrumentation import JsonEventWriter, listening, stage, StageStatistics
+
+
+def test_stage_statistics(tmpdir):
+    keystore_path = str(tmpdir.join('keystore'))
+    events = io.StringIO()
+    with listening(StageStatistics()) as statistics, listening(JsonEventWriter(events)):
+        assert generate_artifacts(keystore_path, ['/foo', '/bar'], jobs=2)
+    # events are no longer recorded once the listeners are removed
+    with stage('sign'):
+        pass
+
+    summary = statistics.summary()
+    for name in ('ca', 'csr', 'cert', 'xslt', 'xsd', 'write'):
+        assert name in summary
+    assert summary['sign']['count'] == 3  # governance, then permissions of each identity
+    assert summary['cert']['count'] == 2
+    for stats in summary.values():
+        assert 0 <= stats['p50'] <= stats['p99'] <= stats['total']
+
+    lines = [json.loads(line) for line in events.getvalue().splitlines()]
+    assert len(lines) == sum(stats['count'] for stats in summary.values())
+    assert set(lines[0]) == {'stage', 'start', 'duration', 'thread'}
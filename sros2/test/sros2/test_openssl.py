@@ -0,0 +1,85 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from sros2.api import create_key, create_keystore, openssl
+from sros2.api.crypto import CRYPTO_BACKEND_ENV
+
+
+class FakeCompletedProcess:
+
+    def __init__(self, stdout):
+        self.returncode = 0
+        self.stdout = stdout
+        self.stderr = b''
+
+
+def test_openssl_toolchain_is_probed_once(monkeypatch):
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return FakeCompletedProcess(b'OpenSSL 1.1.1c  28 May 2019\n')
+
+    monkeypatch.setattr(openssl.platform, 'system', lambda: 'Linux')
+    monkeypatch.setattr(subprocess, 'run', fake_run)
+    openssl.clear_openssl_toolchain_cache()
+    try:
+        toolchain = openssl.get_openssl_toolchain()
+        assert toolchain.executable == 'openssl'
+        assert toolchain.version == (1, 1, '1c')
+        assert openssl.get_openssl_toolchain() is toolchain
+        assert len(calls) == 1
+
+        openssl.clear_openssl_toolchain_cache()
+        openssl.get_openssl_toolchain()
+        assert len(calls) == 2
+    finally:
+        openssl.clear_openssl_toolchain_cache()
+
+
+def test_run_command_errors():
+    assert openssl.run_command([sys.executable, '-c', 'print("a b")']) == b'a b\n'
+    with pytest.raises(openssl.CommandError) as e:
+        openssl.run_command([sys.executable, '-c', 'import sys; sys.exit("failed")'])
+    assert e.value.returncode == 1
+    assert e.value.stderr.strip() == 'failed'
+    assert str(e.value).endswith('\nfailed')
+    with pytest.raises(openssl.CommandError) as e:
+        openssl.run_command(['sros2-no-such-command'])
+    assert e.value.returncode is None
+
+
+def test_max_processes(monkeypatch):
+    monkeypatch.setenv(openssl.MAX_PROCESSES_ENV, '3')
+    assert openssl.get_max_processes() == 3
+    monkeypatch.setenv(openssl.MAX_PROCESSES_ENV, '0')
+    with pytest.raises(RuntimeError):
+        openssl.get_max_processes()
+
+
+@pytest.mark.skipif(shutil.which('openssl') is None, reason='requires the openssl executable')
+def test_openssl_backend_paths_with_spaces(tmpdir, monkeypatch):
+    monkeypatch.setenv(CRYPTO_BACKEND_ENV, 'openssl')
+    keystore_path = str(tmpdir.join('key store'))
+    assert create_keystore(keystore_path)
+    assert create_key(keystore_path, '/foo')
+    for filename in ('cert.pem', 'key.pem', 'permissions.p7s'):
+        assert os.path.getsize(os.path.join(keystore_path, 'foo', filename))
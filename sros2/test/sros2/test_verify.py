@@ -0,0 +1,126 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import json
+import os
+import shutil
+
+import pytest
+
+from sros2.api import generate_artifacts, verify
+from sros2.api.crypto import CRYPTO_BACKEND_ENV, get_crypto_backend, get_crypto_backend_names
+from sros2.api.verify import _load_cert, _split_smime, verify_keystore, verify_smime
+
+pytest.importorskip('cryptography.x509')
+
+
+@pytest.mark.parametrize('backend_name', get_crypto_backend_names())
+def test_verify_keystore(tmpdir, monkeypatch, backend_name):
+    try:
+        get_crypto_backend(backend_name)
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    monkeypatch.setenv(CRYPTO_BACKEND_ENV, backend_name)
+    keystore_path = str(tmpdir.join('keystore'))
+    assert generate_artifacts(keystore_path, ['/foo', '/bar', '/baz/qux'], jobs=2)
+
+    report = verify_keystore(keystore_path, jobs=2)
+    assert report['errors'] == []
+    assert report['identity_count'] == 3
+    assert report['failed_identity_count'] == 0
+
+    # tamper with the artifacts of two identities
+    with open(os.path.join(keystore_path, 'foo', 'permissions.xml'), 'ab') as f:
+        f.write(b'<!-- tampered -->\n')
+    shutil.copyfile(
+        os.path.join(keystore_path, 'foo', 'key.pem'),
+        os.path.join(keystore_path, 'bar', 'key.pem'))
+    report = verify_keystore(keystore_path, expiry_window_days=100000)
+    errors = {entry['identity']: entry['errors'] for entry in report['identities']}
+    assert errors['/foo'][1] == 'signed content of permissions.p7s differs from permissions.xml'
+    assert errors['/bar'][1] == 'private key does not match the certificate'
+    assert len(errors['/baz/qux']) == 1
+    for entry_errors in errors.values():
+        assert entry_errors[0].startswith('certificate expires on')
+    assert report['errors'][0].startswith('CA certificate expires on')
+
+    report_path = str(tmpdir.join('report.json'))
+    assert not verify(keystore_path, report_path=report_path)
+    with open(report_path) as f:
+        assert json.load(f)['failed_identity_count'] == 2
+
+
+def test_verify_keystore_shared_artifacts(tmpdir):
+    keystore_path = str(tmpdir.join('keystore'))
+    assert generate_artifacts(keystore_path, ['/foo', '/bar'])
+
+    # a governance signed by the keystore CA, but not the keystore governance, and foreign CA
+    key_dir = os.path.join(keystore_path, 'foo')
+    shutil.copyfile(
+        os.path.join(key_dir, 'permissions.p7s'), os.path.join(key_dir, 'governance.p7s'))
+    shutil.copyfile(
+        os.path.join(key_dir, 'cert.pem'), os.path.join(key_dir, 'identity_ca.cert.pem'))
+    report = verify_keystore(keystore_path, expiry_window_days=0)
+    errors = {entry['identity']: entry['errors'] for entry in report['identities']}
+    assert errors == {
+        '/foo': [
+            'signed content of governance.p7s differs from governance.xml',
+            'identity_ca.cert.pem is stale',
+            'governance.p7s is stale',
+        ],
+        '/bar': [],
+    }
+
+
+def _join_smime(signed_part, signature_der):
+    return (
+        b'MIME-Version: 1.0\n'
+        b'Content-Type: multipart/signed; protocol="application/x-pkcs7-signature"; '
+        b'micalg="sha-256"; boundary="----BOUNDARY"\n\n'
+        b'This is an S/MIME signed message\n\n'
+        b'------BOUNDARY\n' + signed_part + b'\n'
+        b'------BOUNDARY\n'
+        b'Content-Type: application/x-pkcs7-signature; name="smime.p7s"\n'
+        b'Content-Transfer-Encoding: base64\n\n' + base64.encodebytes(signature_der) + b'\n'
+        b'------BOUNDARY--\n')
+
+
+def test_verify_smime_malformed(tmpdir):
+    keystore_path = str(tmpdir.join('keystore'))
+    assert generate_artifacts(keystore_path, [])
+    ca_cert = _load_cert(os.path.join(keystore_path, 'ca.cert.pem'))
+    with open(os.path.join(keystore_path, 'governance.p7s'), 'rb') as f:
+        signed_content = f.read()
+    content = verify_smime(signed_content, ca_cert)
+    signed_part, signature_der = _split_smime(signed_content)
+    assert verify_smime(_join_smime(signed_part, signature_der), ca_cert) == content
+
+    with pytest.raises(ValueError):
+        verify_smime(signed_content[:len(signed_content) // 2], ca_cert)
+    with pytest.raises(ValueError):
+        verify_smime(_join_smime(signed_part.replace(b'ENCRYPT', b'NONE'), signature_der), ca_cert)
+    # truncated signatures are rejected
+    for length in range(len(signature_der)):
+        with pytest.raises(ValueError):
+            verify_smime(_join_smime(signed_part, signature_der[:length]), ca_cert)
+    # altered signatures are rejected, unless the bytes altered are not part of the signature,
+    # e.g. the certificates embedded in it, in which case the signed content is unchanged
+    for offset in range(len(signature_der)):
+        for value in (0x00, 0x80, 0xff, signature_der[offset] ^ 0x01):
+            altered_der = signature_der[:offset] + bytes((value,)) + signature_der[offset + 1:]
+            try:
+                assert verify_smime(_join_smime(signed_part, altered_der), ca_cert) == content
+            except ValueError:
+                pass
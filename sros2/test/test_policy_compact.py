@@ -0,0 +1,85 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fnmatch
+import itertools
+
+from lxml import etree
+
+from sros2.policy.compact import compact_expressions
+from sros2.policy.compact import compact_policy_expressions
+
+
+def test_compact_expressions():
+    assert compact_expressions(['~get_parameters', '~set_parameters', '~list_parameters']) == [
+        '~[gs]et_parameters', '~list_parameters']
+    assert compact_expressions(['/robot_%d/cmd' % i for i in range(12)]) == [
+        '/robot_1[01]/cmd', '/robot_[0-9]/cmd']
+    # existing wildcards and duplicates
+    assert compact_expressions(['/a/*', 'chatter', 'chatter']) == ['/a/*', 'chatter']
+    # `/` and `~` are never merged
+    assert compact_expressions(['~a', '/a']) == ['/a', '~a']
+
+
+def test_compact_expressions_exact():
+    # the compacted expressions match exactly the names they replace
+    universe = [
+        ''.join(name) for length in range(1, 4)
+        for name in itertools.product('ab1/_', repeat=length)]
+    for i in range(0, len(universe), 7):
+        names = set(universe[i::len(universe) // 11 + i % 5])
+        expressions = compact_expressions(names)
+        assert {
+            name for name in universe
+            if any(fnmatch.fnmatchcase(name, e) for e in expressions)} == names
+
+
+def test_compact_policy_expressions():
+    policy = etree.fromstring("""\
+<policy version="0.1.0">
+  <profiles>
+    <profile ns="/" node="talker">
+      <topics publish="ALLOW" subscribe="ALLOW">
+        <topic>chatter_a</topic>
+        <topic>chatter_b</topic>
+      </topics>
+      <services reply="ALLOW">
+        <service>~get_parameters</service>
+      </services>
+    </profile>
+  </profiles>
+</policy>
+""")
+    assert compact_policy_expressions(policy) == (3, 2)
+    assert [e.text for e in policy.iterfind('profiles/profile/topics/topic')] == [
+        'chatter_[ab]']
+    assert [e.text for e in policy.iterfind('profiles/profile/services/service')] == [
+        '~get_parameters']
+
+
+def test_compact_policy_expressions_empty_expression():
+    policy = etree.fromstring("""\
+<policy version="0.1.0">
+  <profiles>
+    <profile ns="/" node="talker">
+      <topics publish="ALLOW">
+        <topic/>
+        <topic>chatter</topic>
+      </topics>
+    </profile>
+  </profiles>
+</policy>
+""")
+    assert compact_policy_expressions(policy) == (1, 1)
+    assert [e.text for e in policy.iterfind('profiles/profile/topics/topic')] == ['chatter']
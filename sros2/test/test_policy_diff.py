@@ -0,0 +1,129 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from lxml import etree
+import pytest
+
+from sros2.policy.diff import diff_policies
+from sros2.policy.diff import get_policy_rules
+from sros2.policy.diff import merge_policies
+from sros2.policy.diff import Rule
+
+OLD_POLICY = """\
+<policy version="0.1.0">
+  <profiles>
+    <profile ns="/" node="talker">
+      <topics publish="ALLOW" subscribe="ALLOW">
+        <topic>chatter</topic>
+      </topics>
+      <topics publish="ALLOW">
+        <topic>chatter</topic>
+        <topic>rosout</topic>
+      </topics>
+    </profile>
+    <profile ns="/" node="listener">
+      <topics subscribe="ALLOW">
+        <topic>chatter</topic>
+      </topics>
+    </profile>
+  </profiles>
+</policy>
+"""
+
+NEW_POLICY = """\
+<policy version="0.1.0">
+  <profiles>
+    <profile ns="/" node="talker">
+      <topics publish="ALLOW">
+        <topic>chatter</topic>
+        <topic>rosout</topic>
+      </topics>
+    </profile>
+    <profile ns="/ns" node="admin">
+      <services reply="ALLOW">
+        <service>~get_parameters</service>
+      </services>
+    </profile>
+  </profiles>
+</policy>
+"""
+
+
+def test_get_policy_rules():
+    rules = get_policy_rules(etree.fromstring(OLD_POLICY))
+    assert rules == {
+        ('/', 'talker'): {
+            Rule('topic', 'publish', 'ALLOW', 'chatter'),
+            Rule('topic', 'subscribe', 'ALLOW', 'chatter'),
+            Rule('topic', 'publish', 'ALLOW', 'rosout'),
+        },
+        ('/', 'listener'): {Rule('topic', 'subscribe', 'ALLOW', 'chatter')},
+    }
+
+
+def test_get_policy_rules_empty_expression():
+    policy = etree.fromstring(OLD_POLICY)
+    etree.SubElement(policy.find('profiles/profile/topics'), 'topic')
+    assert get_policy_rules(policy) == get_policy_rules(etree.fromstring(OLD_POLICY))
+
+
+def test_diff_policies():
+    old_policy = etree.fromstring(OLD_POLICY)
+    new_policy = etree.fromstring(NEW_POLICY)
+    diff = diff_policies(old_policy, new_policy)
+    assert diff.added_profiles == [('/ns', 'admin')]
+    assert diff.removed_profiles == [('/', 'listener')]
+    assert diff.added_rules == {
+        ('/ns', 'admin'): {Rule('service', 'reply', 'ALLOW', '~get_parameters')}}
+    assert diff.removed_rules == {
+        ('/', 'talker'): {Rule('topic', 'subscribe', 'ALLOW', 'chatter')},
+        ('/', 'listener'): {Rule('topic', 'subscribe', 'ALLOW', 'chatter')},
+    }
+    assert not any(diff_policies(old_policy, old_policy))
+
+
+def test_merge_policies():
+    old_policy = etree.fromstring(OLD_POLICY)
+    new_policy = etree.fromstring(NEW_POLICY)
+    merged = merge_policies([old_policy, new_policy, new_policy])
+    assert len(merged) == 3
+    rules = get_policy_rules(old_policy)
+    for key, profile_rules in get_policy_rules(new_policy).items():
+        rules.setdefault(key, set()).update(profile_rules)
+    assert get_policy_rules(merged) == rules
+    # each expression is listed once per rule
+    assert len(merged.policy.findall('profiles/profile/*/*')) == 5
+
+
+def test_diff_policies_domains():
+    old_policy = etree.fromstring(OLD_POLICY)
+    new_policy = etree.fromstring(OLD_POLICY)
+    new_policy.find('profiles/profile').attrib['domains'] = '5, 7'
+    diff = diff_policies(old_policy, new_policy)
+    assert diff.added_rules == {('/', 'talker'): {Rule('domains', None, None, '5,7')}}
+    assert not diff.removed_rules and not diff.added_profiles and not diff.removed_profiles
+
+
+def test_merge_policies_domains():
+    policy = etree.fromstring(OLD_POLICY)
+    policy.find('profiles/profile').attrib['domains'] = '5,7'
+    merged = merge_policies([etree.fromstring(NEW_POLICY), policy])
+    assert merged.get_profile('/', 'talker').get('domains') == '5,7'
+    assert merged.get_profile('/', 'listener').get('domains') is None
+    assert not any(diff_policies(merged, merge_policies([policy, etree.fromstring(NEW_POLICY)])))
+
+    conflicting_policy = etree.fromstring(OLD_POLICY)
+    conflicting_policy.find('profiles/profile').attrib['domains'] = '3'
+    with pytest.raises(RuntimeError, match='conflicting domains'):
+        merge_policies([policy, conflicting_policy])
@@ -0,0 +1,66 @@
+# Copyright 2019 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from lxml import etree
+
+from sros2.policy.model import PolicyModel
+
+
+def test_policy_model():
+    policy = etree.fromstring("""\
+<policy version="0.1.0">
+  <profiles>
+    <profile ns="/" node="talker">
+      <topics publish="ALLOW" subscribe="ALLOW">
+        <topic>chatter</topic>
+      </topics>
+    </profile>
+    <profile ns="/" node="listener">
+      <topics subscribe="ALLOW">
+        <topic>chatter</topic>
+      </topics>
+    </profile>
+  </profiles>
+</policy>
+""")
+    model = PolicyModel(policy)
+    assert len(model) == 2
+    assert [key for key, _ in model.profiles()] == [('/', 'talker'), ('/', 'listener')]
+
+    talker = model.get_profile('/', 'talker')
+    topics = model.get_permissions('/', 'talker', 'topic', 'publish', 'ALLOW')
+    assert topics.getparent() is talker
+    assert model.get_permissions('/', 'talker', 'topic', 'subscribe', 'ALLOW') is topics
+    assert model.get_permissions('/', 'talker', 'topic', 'publish', 'DENY') is None
+    assert model.get_profile('/', 'admin') is None
+
+    # edits made through the model are reflected in the tree and the indexes
+    services = model.get_permissions('/ns', 'admin', 'service', 'reply', 'ALLOW', create=True)
+    assert services.tag == 'services'
+    assert services.getparent() is model.get_profile('/ns', 'admin')
+    assert policy.find('profiles/profile[@ns="/ns"][@node="admin"]/services') is services
+    assert model.add_profile('/ns', 'admin') is services.getparent()
+
+    model.remove_profile('/', 'talker')
+    assert ('/', 'talker') not in model
+    assert model.get_permissions('/', 'talker', 'topic', 'publish', 'ALLOW') is None
+    assert len(policy.findall('profiles/profile')) == 2
+
+    # expressions are only added once
+    assert not model.add_expression('/', 'listener', 'topic', 'subscribe', 'ALLOW', 'chatter')
+    assert model.add_expression('/', 'listener', 'topic', 'subscribe', 'ALLOW', 'rosout')
+    assert not model.add_expression('/', 'listener', 'topic', 'subscribe', 'ALLOW', 'rosout')
+    assert model.add_expression('/', 'listener', 'topic', 'publish', 'ALLOW', 'rosout')
+    assert [topic.text for topic in policy.iterfind(
+        'profiles/profile[@node="listener"]/topics/topic')] == ['chatter', 'rosout', 'rosout']
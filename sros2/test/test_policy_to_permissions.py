@@ -12,16 +12,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
 import os
 
 from lxml import etree
+import pytest
 
+from sros2.api import (
+    get_permissions_xml,
+    get_permissions_xml_per_identity,
+    get_policy_from_tree,
+)
 from sros2.policy import (
     get_policy_schema,
     get_transport_schema,
     get_transport_template,
+    iter_policy,
+    load_policy,
 )
 
+# for the permissions of separate transforms to be comparable
+VALIDITY = (datetime.datetime(2019, 1, 1), datetime.datetime(2029, 1, 1))
+
 
 def test_policy_to_permissions():
     # Get paths
@@ -55,3 +67,61 @@ def test_policy_to_permissions():
         expected = f.read()
         actual = etree.tostring(permissions_xml, pretty_print=True).decode()
         assert actual == expected
+
+
+def test_policy_to_permissions_per_identity():
+    test_dir = os.path.dirname(os.path.abspath(__file__))
+    policy_xml_path = os.path.join(test_dir, 'policies', 'sample_policy.xml')
+
+    # a single transform of the whole policy matches the transforms of each profile
+    permissions_xmls = get_permissions_xml_per_identity(
+        '0', load_policy(policy_xml_path), VALIDITY)
+    policy_xml = load_policy(policy_xml_path)
+    profiles = policy_xml.findall('profiles/profile')
+    assert list(permissions_xmls.keys()) == [
+        profile.get('ns').rstrip('/') + '/' + profile.get('node') for profile in profiles]
+    for identity, permissions_xml in permissions_xmls.items():
+        expected = etree.tostring(
+            get_permissions_xml('0', get_policy_from_tree(identity, policy_xml), VALIDITY),
+            pretty_print=True)
+        actual = etree.tostring(permissions_xml, pretty_print=True)
+        assert actual == expected
+
+
+def test_policy_to_permissions_streamed():
+    test_dir = os.path.dirname(os.path.abspath(__file__))
+    policy_xml_path = os.path.join(test_dir, 'policies', 'sample_policy.xml')
+
+    # streaming the profiles one at a time yields the same permissions
+    expected = get_permissions_xml_per_identity(
+        '0', load_policy(policy_xml_path), VALIDITY)
+    identities = []
+    for policy_xml in iter_policy(policy_xml_path):
+        for identity, permissions_xml in get_permissions_xml_per_identity(
+                '0', policy_xml, VALIDITY).items():
+            identities.append(identity)
+            assert etree.tostring(permissions_xml) == etree.tostring(expected[identity])
+    assert identities == list(expected.keys())
+
+
+def test_iter_policy_without_version(tmpdir):
+    policy_xml_path = str(tmpdir.join('policy.xml'))
+    with open(policy_xml_path, 'w') as f:
+        f.write(
+            '<policy><profiles><profile ns="/" node="talker">'
+            '<topics publish="ALLOW"><topic>chatter</topic></topics>'
+            '</profile></profiles></policy>')
+    # rejected by the schema, as when loaded at once
+    with pytest.raises(RuntimeError, match="'version' is required"):
+        load_policy(policy_xml_path)
+    with pytest.raises(RuntimeError, match="'version' is required"):
+        list(iter_policy(policy_xml_path))
+
+
+def test_permissions_default_validity():
+    test_dir = os.path.dirname(os.path.abspath(__file__))
+    policy_xml_path = os.path.join(test_dir, 'policies', 'sample_policy.xml')
+    permissions_xml = get_permissions_xml('0', load_policy(policy_xml_path))
+    now = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+    for validity in permissions_xml.iterfind('permissions/grant/validity'):
+        assert validity.findtext('not_before') <= now < validity.findtext('not_after')